@@ -0,0 +1,56 @@
+"""Measures how long WriteBox takes to handle a keystroke in a big document.
+
+Run from the repository root:
+    python benchmarks/keystroke_latency.py [lines] [keystrokes]
+"""
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtTest import QTest
+from PyQt6.QtWidgets import QApplication
+
+import writebox
+
+def Main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    keystrokes = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    app = QApplication(sys.argv)
+    writebox.app = app
+    window = writebox.MainWindow(writebox.CreateArgParser().parse_args([]))
+    window.resize(1000, 700)
+    window.show()
+
+    text = "\n".join(f"Line {i} of the benchmark document, with a few words on it." for i in range(lines))
+    window.TextBox.setPlainText(text)
+    window.PushUndo()
+    cursor = window.TextBox.textCursor()
+    cursor.setPosition(len(text) // 2)
+    window.TextBox.setTextCursor(cursor)
+    app.processEvents()
+
+    # Each sample is one key press plus the event processing it causes, as when holding a key down
+    keys = [Qt.Key.Key_Return if i % 40 == 39 else Qt.Key.Key_A for i in range(keystrokes)]
+    samples = []
+    start = time.perf_counter()
+    for key in keys:
+        t = time.perf_counter()
+        QTest.keyClick(window.TextBox, key)
+        app.processEvents()
+        samples.append((time.perf_counter() - t) * 1000)
+    total = time.perf_counter() - start
+
+    samples.sort()
+    print(f"{lines:,} lines, {keystrokes} keystrokes in {total:.2f} s")
+    print(f"median {statistics.median(samples):.3f} ms, p95 {samples[int(len(samples) * 0.95)]:.3f} ms, max {samples[-1]:.3f} ms")
+
+    writebox.autosave_session.Close()
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,69 @@
+"""Measures opening a file that's one very long line, as minified files are, and moving the cursor through it.
+
+Run from the repository root:
+    python benchmarks/long_line.py [megabytes ...]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtTest import QTest
+from PyQt6.QtWidgets import QApplication
+
+import writebox
+
+def Main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100]
+    keystrokes = 200
+
+    app = QApplication(sys.argv)
+    writebox.app = app
+    window = writebox.MainWindow(writebox.CreateArgParser().parse_args([]))
+    window.resize(1000, 700)
+    window.show()
+
+    record = '{"id": 12345, "name": "benchmark", "tags": ["a", "b", "c"], "value": 3.25}, '
+    for megabytes in sizes:
+        with tempfile.NamedTemporaryFile("w", suffix=".json", encoding="utf-8", delete=False) as f:
+            f.write("[" + record * ((megabytes << 20) // len(record)) + "{}]")
+        try:
+            start = time.perf_counter()
+            window.OpenForwardedFile(f.name, None)
+            app.processEvents()
+            opened = time.perf_counter() - start
+            tab = window.OpenTabs[window.TabBar.currentIndex()]
+            tab.LargeFile.Thread.join()
+            indexed = time.perf_counter() - start
+            app.processEvents()
+
+            # Each sample is one key press plus the event processing it causes, as when holding a key down
+            view = window.LargeView
+            view.setFocus()
+            keys = [(Qt.Key.Key_PageDown if i % 20 == 19 else Qt.Key.Key_Down, Qt.KeyboardModifier.NoModifier) for i in range(keystrokes)]
+            keys += [(Qt.Key.Key_End, Qt.KeyboardModifier.ControlModifier), (Qt.Key.Key_Up, Qt.KeyboardModifier.NoModifier),
+                     (Qt.Key.Key_Home, Qt.KeyboardModifier.ControlModifier)]
+            samples = []
+            for key, modifiers in keys:
+                t = time.perf_counter()
+                QTest.keyClick(view, key, modifiers)
+                app.processEvents()
+                samples.append((time.perf_counter() - t) * 1000)
+
+            samples.sort()
+            print(f"{megabytes} MB line: shown in {opened:.2f} s, indexed in {indexed:.2f} s as {tab.LargeFile.LineCount():,} rows")
+            print(f"{len(samples)} cursor moves: median {statistics.median(samples):.3f} ms, "
+                  f"p95 {samples[int(len(samples) * 0.95)]:.3f} ms, max {samples[-1]:.3f} ms")
+            window.CloseTab(window.TabBar.currentIndex())
+        finally:
+            os.remove(f.name)
+
+    writebox.autosave_session.Close()
+
+if __name__ == "__main__":
+    Main()
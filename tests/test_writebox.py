@@ -0,0 +1,198 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import writebox
+from PyQt6.QtGui import QTextCursor, QTextDocument
+
+
+class FileWriter:
+    # Does what JournalWriter does, without the thread
+    def Append(self, path, data):
+        with open(path, 'ab') as f:
+            f.write(data)
+
+    def Delete(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def Compact(self, journal):
+        pass
+
+
+def test_utf16_length():
+    assert writebox.Utf16Length("abc") == 3
+    assert writebox.Utf16Length("a😀b") == 4
+    assert writebox.FromUtf16Units(writebox.ToUtf16Units("x😀𝄞y")) == "x😀𝄞y"
+    assert len(writebox.ToUtf16Units("x😀𝄞y")) == 6
+
+
+def test_journal_text_splices_in_utf16_units():
+    text = writebox.JournalText("😀 one\n")
+    text.Splice(3, 3, "two")
+    assert text.Text() == "😀 two\n"
+
+
+def test_journal_replays_edits_after_astral_characters(tmp_path):
+    base = tmp_path / "base.txt"
+    base.write_text("😀😀 one\ntwo\n", encoding='utf-8', newline='')
+    journal = writebox.AutosaveJournal(FileWriter(), str(tmp_path))
+    journal.Reset(str(base), 'utf-8')
+
+    # Qt positions: each emoji takes two units
+    journal.Record(9, 3, "TWO")
+    journal.Record(12, 0, "🎉")
+    journal.Record(14, 0, "x")  # Folded into the previous delta
+    journal.Record(14, 1, "")  # Backspacing it
+    journal.Flush()
+
+    header, text = writebox.ReplayJournal(journal.Path)
+    assert header["file"] == os.path.abspath(base)
+    assert text == "😀😀 one\nTWO🎉\n"
+
+
+def replace_in_file(path, find, replacement, regex=False):
+    file, count, size, seconds, error = writebox.ReplaceInFile((str(path), find, replacement, True, False, regex, 'utf-8'))
+    assert error is None
+    return count
+
+
+def test_replace_matches_across_chunk_boundaries(tmp_path):
+    path = tmp_path / "big.txt"
+    chunk = 1 << 22  # ReplaceInFile's ChunkSize
+    text = "a" * (chunk - 3) + "needle" + "b" * (chunk - 6) + "needle" + "c" * 5
+    path.write_text(text, encoding='utf-8', newline='')
+    assert replace_in_file(path, "needle", "N") == 2
+    assert path.read_text(encoding='utf-8') == text.replace("needle", "N")
+
+
+def test_replace_regex_across_chunk_boundary(tmp_path):
+    path = tmp_path / "big.txt"
+    text = "x" * ((1 << 22) - 2) + "key=1 key=22"
+    path.write_text(text, encoding='utf-8', newline='')
+    assert replace_in_file(path, r"key=(\d+)", r"\1", regex=True) == 2
+    assert path.read_text(encoding='utf-8') == "x" * ((1 << 22) - 2) + "1 22"
+
+
+def test_replace_keeps_crlf(tmp_path):
+    path = tmp_path / "crlf.txt"
+    path.write_bytes(b"one\r\ntwo\r\nthree two\r\n")
+    assert replace_in_file(path, "two", "2") == 2
+    assert path.read_bytes() == b"one\r\n2\r\nthree 2\r\n"
+    assert replace_in_file(path, r"\r\n", ";", regex=True) == 3
+    assert path.read_bytes() == b"one;2;three 2;"
+
+
+def test_replace_arguments_can_start_with_a_slash():
+    args = writebox.ParseArguments(writebox.CreateArgParser(), ["/replace", "/*", "/x", "/regex", "file.txt"])
+    assert args.replace == ["/*", "/x"]
+    assert args.regex
+    assert args.filename == ["file.txt"]
+
+
+def test_convert_reports_unencodable_characters(tmp_path):
+    path = tmp_path / "accents.txt"
+    path.write_bytes("ab\ncdé\n😀".encode('utf-8'))
+    file, source, size, seconds, error = writebox.ConvertFileEncoding((str(path), 'utf-8', 'ascii'))
+    assert error == ("2 characters can't be represented in ascii:\n"
+                     "  line 2, column 3: 'é' (U+00E9)\n"
+                     "  line 3, column 1: '😀' (U+1F600)")
+    assert path.read_bytes() == "ab\ncdé\n😀".encode('utf-8')  # Left alone
+
+
+def test_convert_columns_across_chunks(tmp_path):
+    path = tmp_path / "long.txt"
+    chunk = 1 << 22  # ConvertFileEncoding's ChunkSize, in bytes
+    # The first chunk ends in the middle of the é
+    path.write_bytes(b"a\n" + b"x" * (chunk - 3) + "é\n".encode('utf-8'))
+    error = writebox.ConvertFileEncoding((str(path), 'utf-8', 'ascii'))[4]
+    assert error.endswith(f"line 2, column {chunk - 2}: 'é' (U+00E9)")
+
+
+def test_convert_transcodes(tmp_path):
+    path = tmp_path / "text.txt"
+    path.write_bytes("é\r\n".encode('utf-8'))
+    assert writebox.ConvertFileEncoding((str(path), 'utf-8', 'utf-16-le'))[4] is None
+    assert path.read_bytes() == "é\r\n".encode('utf-16-le')
+
+
+def test_changed_line_ranges_count_utf16_units():
+    old = "😀 one\ntwo\nthree\n"
+    new = "😀 one\nTWO\nthree\n"
+    assert writebox.ChangedLineRanges(old, new) == [(7, 11, "TWO\n")]
+
+    # Splicing the ranges in at those positions, the way ReloadTab does, gives the new text
+    old = "a\n" + "𝄞\n" * 100 + "b\n" * 100
+    new = "A\n" + "𝄞\n" * 50 + "🎉\n" + "𝄞\n" * 50 + "b\n" * 99 + "c\n"
+    text = writebox.ToUtf16Units(old)
+    for start, end, replacement in reversed(writebox.ChangedLineRanges(old, new)):
+        text = text[:start] + writebox.ToUtf16Units(replacement) + text[end:]
+    assert writebox.FromUtf16Units(text) == new
+
+
+def apply_opcodes(a, b, opcodes):
+    result = []
+    for tag, a1, a2, b1, b2 in opcodes:
+        result += a[a1:a2] if tag == "equal" else b[b1:b2]
+    return result
+
+
+def test_diff_empty_and_identical():
+    assert writebox.DiffLines([], []) == []
+    assert writebox.GroupDiffHunks([]) == []
+    assert writebox.DiffLines([], ["x\n"]) == [("insert", 0, 0, 0, 1)]
+    assert writebox.DiffLines(["x\n"], []) == [("delete", 0, 1, 0, 0)]
+
+    lines = ["a\n", "b\n", "a\n"]
+    opcodes = writebox.DiffLines(lines, list(lines))
+    assert opcodes == [("equal", 0, 3, 0, 3)]
+    assert writebox.GroupDiffHunks(opcodes) == []
+
+
+def test_diff_opcodes_rebuild_the_new_lines():
+    a = [f"{i % 7}\n" for i in range(200)]
+    b = a[:50] + ["new\n"] + a[60:150] + a[:5] + a[150:]
+    opcodes = writebox.DiffLines(a, b)
+    assert apply_opcodes(a, b, opcodes) == b
+    for hunk in writebox.GroupDiffHunks(opcodes, 2):
+        assert any(tag != "equal" for tag, *_ in hunk)
+
+
+def document_fingerprint(text):
+    doc = QTextDocument()
+    doc.setPlainText(text)
+    stats = writebox.DocumentStats()
+    stats.SetDocument(doc, doc.toPlainText())
+    return doc, stats
+
+
+def test_fingerprint_matches_document():
+    text = "a\xa0b 😀\nline two\n"
+    doc, stats = document_fingerprint(text)
+    assert writebox.TextFingerprint(text)[0] == 16  # The emoji is two UTF-16 units
+    assert stats.Fingerprint(doc) == writebox.TextFingerprint(text)
+    # The text saved or kept for an inactive tab has the non-breaking space as a space
+    assert writebox.TextFingerprint(doc.toPlainText()) == writebox.TextFingerprint(text)
+
+    cursor = QTextCursor(doc)
+    cursor.insertText("x")
+    stats.Update(doc, 0, 1)
+    assert stats.Fingerprint(doc) == writebox.TextFingerprint("x" + text)
+    cursor.deletePreviousChar()
+    stats.Update(doc, 0, 0)
+    assert stats.Fingerprint(doc) == writebox.TextFingerprint(text)
+    assert writebox.TextFingerprint(text) != writebox.TextFingerprint(text.replace("two", "2wo"))
+
+
+@pytest.mark.skipif(os.name != "posix", reason="permissions are POSIX modes")
+def test_new_files_get_umask_permissions(tmp_path):
+    existing = tmp_path / "existing.txt"
+    existing.write_text("old")
+    existing.chmod(0o600)
+    writebox.WriteTextFile(str(existing), iter(["new"]))
+    writebox.WriteTextFile(str(tmp_path / "new.txt"), iter(["new"]))
+    assert existing.stat().st_mode & 0o777 == 0o600
+    assert (tmp_path / "new.txt").stat().st_mode & 0o777 == 0o666 & ~writebox.GetFileCreationMask()
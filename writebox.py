@@ -1,19 +1,42 @@
+import time
+startup_time = time.perf_counter()  # Taken before the Qt imports so /timeline can include them
+
 from PyQt6.QtWidgets import (QMainWindow, QApplication, QPlainTextEdit, QMenuBar, QMenu, QTabBar, QVBoxLayout, QWidget,
-QHBoxLayout, QPushButton, QSpinBox, QDialog, QListWidget, QMessageBox, QFileDialog, QUndoView, QFontDialog, QColorDialog,
-QDoubleSpinBox, QToolBar, QGroupBox, QLineEdit, QCheckBox, QComboBox, QLabel)
-from PyQt6.QtGui import QAction, QKeySequence, QIcon, QMouseEvent, QTextCursor, QWheelEvent, QUndoStack, QUndoCommand, QPixmap, QPainter, QPalette, QTextDocument, QColor, QActionGroup, QCloseEvent
-from PyQt6.QtCore import Qt, pyqtSignal, QObject, QTimer, QEvent, QSize
-from PyQt6.QtPrintSupport import QPrintDialog, QPrinter, QPageSetupDialog, QPrintPreviewWidget
+QHBoxLayout, QPushButton, QSpinBox, QDialog, QListWidget, QMessageBox, QFileDialog, QProgressDialog, QUndoView, QFontDialog, QColorDialog,
+QDoubleSpinBox, QToolBar, QGroupBox, QLineEdit, QCheckBox, QComboBox, QLabel, QAbstractScrollArea, QInputDialog, QRadioButton, QDialogButtonBox, QTextEdit)
+from PyQt6.QtGui import QGuiApplication, QPageSize, QAction, QKeySequence, QIcon, QMouseEvent, QTextCursor, QWheelEvent, QUndoStack, QUndoCommand, QPixmap, QPainter, QPalette, QTextDocument, QColor, QActionGroup, QCloseEvent, QImage, QImageReader, QFont, QFontMetricsF, QTextLayout, QTextOption, QPageLayout, QFontDatabase, QTextBlockUserData, QTextCharFormat
+from PyQt6.QtCore import Qt, pyqtSignal, QObject, QTimer, QEvent, QSize, QSettings, QEventLoop, QFileSystemWatcher, QStandardPaths, QLockFile, QBuffer, QByteArray, QPointF, QRectF, QSizeF
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
 import sys
 import os
-import language_tool_python
 import threading
-import chardet
 import argparse
 from enum import Enum
 import re
-import webbrowser
-import urllib.parse
+import json
+import queue
+import shutil
+import tempfile
+import codecs
+import io
+import uuid
+import bisect
+import collections
+import difflib
+import functools
+import itertools
+import math
+import mmap
+import operator
+from array import array
+
+# language_tool_python, chardet, QtPrintSupport, webbrowser and urllib.parse are imported where they're first used,
+# so that they don't hold up the window appearing
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    import language_tool_python
+    from PyQt6.QtPrintSupport import QPrinter
+import_time = time.perf_counter()
 
 
 def GetResourcePath(base: str, resourceName: str):
@@ -23,24 +46,600 @@ def GetResourcePath(base: str, resourceName: str):
         base_path = os.path.dirname(__file__)  # Path to the script location
     return os.path.join(base_path, "res", base, resourceName)
 
-def GetIconForResource(base: str, resourceName: str):
-    pixmap = QPixmap(GetResourcePath(base, resourceName))
+resource_data_cache = {}
+icon_cache = {}
+icon_cache_style = None
+
+def GetResourceData(base: str, resourceName: str):
+    """Returns the raw bytes of a resource, reading it from disk only the first time."""
+    key = (base, resourceName)
+    if key not in resource_data_cache:
+        with open(GetResourcePath(base, resourceName), 'rb') as f:
+            resource_data_cache[key] = QByteArray(f.read())
+    return resource_data_cache[key]
+
+def GetIconForResource(base: str, resourceName: str, size: QSize = None):
+    """Returns the resource tinted with the palette's text color."""
+    global icon_cache_style
     color = app.palette().text().color()
+    dpr = app.devicePixelRatio()
+
+    # Icons tinted for another theme or screen won't be asked for again
+    if icon_cache_style != (color.rgba(), dpr):
+        icon_cache.clear()
+        icon_cache_style = (color.rgba(), dpr)
+
+    key = (base, resourceName, color.rgba(), (size.width(), size.height()) if size else None, dpr)
+    icon = icon_cache.get(key)
+    if icon is None:
+        buffer = QBuffer()
+        buffer.setData(GetResourceData(base, resourceName))
+        reader = QImageReader(buffer)
+        reader.setScaledSize((size or reader.size()) * dpr)  # SVGs are rasterized straight at device pixels
+        image = reader.read().convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+
+        painter = QPainter(image)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceIn)
+        painter.fillRect(image.rect(), color)
+        painter.end()
+
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(dpr)
+        icon = QIcon(pixmap)
+        icon_cache[key] = icon
+    return icon
 
-    tinted_pixmap = QPixmap(pixmap.size())
-    tinted_pixmap.fill(Qt.GlobalColor.transparent)
+lang_tool = None
+lang_tool_loader = None
+autosave_session = None
+startup_timeline = None
 
-    painter = QPainter(tinted_pixmap)
-    painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
-    painter.drawPixmap(0, 0, pixmap)
-    painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceIn)
-    painter.fillRect(tinted_pixmap.rect(), color)
-    painter.end()
+def GetLargeFileThreshold():
+    """Files at least this many bytes open in the read-only large file view."""
+    return QSettings("WriteBox", "WriteBox").value("LargeFileThresholdMB", 256, int) << 20
 
-    return QIcon(tinted_pixmap)
+class StartupTimeline:
+    """Startup milestones, printed with /timeline."""
 
-lang_tool = None
-lang_tool_loader = None
+    def __init__(self):
+        self.Marks = [("imports done", import_time)]
+
+    def Mark(self, name: str):
+        self.Marks.append((name, time.perf_counter()))
+
+    def Print(self):
+        for name, t in self.Marks:
+            print(f"{(t - startup_time) * 1000:8.1f} ms  {name}")
+
+def CreateArgParser():
+    parser = argparse.ArgumentParser(
+        prog="WriteBox",
+        description="WriteBox is a simple text editing application.",
+        formatter_class=argparse.HelpFormatter,
+        prefix_chars="/"
+    )
+    parser.add_argument('filename', type=str, nargs='*', help='The file paths to open.')
+    parser.add_argument('/e', type=str, help='The encoding to open the file in, if a file path is specified.')
+    parser.add_argument('/newinstance', action='store_true', help='Open a new window even if WriteBox is already running.')
+    parser.add_argument('/timeline', action='store_true', help='Print how long each startup phase took.')
+    parser.add_argument('/pdf', type=str, metavar='OUTPUT', help='Export the files to PDF without opening a window. OUTPUT is a PDF file, or a folder when exporting several files.')
+    parser.add_argument('/font', type=str, help='The font to export with, e.g. "Consolas,11".')
+    parser.add_argument('/pagesize', type=str, help='The page size to export with, e.g. A4 or Letter.')
+    parser.add_argument('/replace', type=str, nargs=2, metavar=('FIND', 'REPLACEMENT'), help='Replace text in the files (globs are allowed) without opening a window. FIND and REPLACEMENT are taken as they are, even when they start with /; put -- before files that do.')
+    parser.add_argument('/matchcase', action='store_true', help='Match case with /replace.')
+    parser.add_argument('/wholeword', action='store_true', help='Match whole words with /replace.')
+    parser.add_argument('/regex', action='store_true', help='Use regular expressions with /replace.')
+    parser.add_argument('/spellcheck', action='store_true', help='Spell and grammar check the files (globs are allowed) and print the matches as JSON lines.')
+    parser.add_argument('/convert', type=str, metavar='ENCODING', help='Convert the files (globs are allowed) to another encoding, e.g. utf-8. /e sets the encoding they are in now.')
+    parser.add_argument('/cache', type=str, help='A file to keep /spellcheck results in, so unchanged files are skipped next time.')
+    return parser
+
+def ParseArguments(parser: argparse.ArgumentParser, argv: list = None):
+    """Parses the command line, taking the two values after /replace as they are."""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    end = argv.index("--") if "--" in argv else len(argv)
+    replace = None
+    if "/replace" in argv[:end]:
+        i = argv.index("/replace")
+        if i + 3 <= end:
+            replace = argv[i + 1:i + 3]
+            del argv[i:i + 3]
+    args = parser.parse_args(argv)
+    if replace:
+        args.replace = replace
+    return args
+
+def FindPageSize(name: str):
+    """Looks up a page size like A4 or Letter by name, or returns None."""
+    for pageSize in QPageSize.PageSizeId:
+        if pageSize.name.lower() == name.lower() and pageSize != QPageSize.PageSizeId.Custom:
+            return pageSize
+    return None
+
+def InitHeadlessProcess():
+    """Sets up Qt without a window system, for /pdf exports."""
+    global app
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    app = QGuiApplication([sys.argv[0]])
+    app.setApplicationName("WriteBox")
+
+def ExportPdfFile(job: tuple):
+    """Exports one file for /pdf, returning (file, output, pages, seconds, error)."""
+    file, output, encoding, fontName, pageSize = job
+    start = time.perf_counter()
+    try:
+        text, _ = ReadTextFile(file, encoding)
+        font = QGuiApplication.font()
+        if fontName and not font.fromString(fontName):
+            raise ValueError(f"Invalid font \"{fontName}\".")
+        printer = CreatePdfPrinter(output, os.path.basename(file))
+        if pageSize:
+            printer.setPageSize(QPageSize(pageSize))
+        pages = PrintText(printer, text, font)
+        return file, output, pages, time.perf_counter() - start, None
+    except Exception as e:
+        return file, output, 0, time.perf_counter() - start, str(e)
+
+def ExportPdfBatch(args: argparse.Namespace, parser: argparse.ArgumentParser):
+    """Runs /pdf over every file given and returns the exit code."""
+    if not args.filename:
+        parser.error("/pdf needs at least one file to export.")
+    pageSize = None
+    if args.pagesize:
+        pageSize = FindPageSize(args.pagesize)
+        if pageSize is None:
+            parser.error(f"Unknown page size \"{args.pagesize}\".")
+
+    # Several files (or an existing folder) go into a folder, named after each file
+    if len(args.filename) > 1 or os.path.isdir(args.pdf):
+        names = [os.path.splitext(os.path.basename(filename))[0] + ".pdf" for filename in args.filename]
+        if len(set(name.lower() for name in names)) < len(names):
+            parser.error("Several files would be exported to the same PDF name.")
+        os.makedirs(args.pdf, exist_ok=True)
+        outputs = [os.path.join(args.pdf, name) for name in names]
+    else:
+        outputs = [args.pdf]
+    jobs = [(filename, output, args.e, args.font, pageSize) for filename, output in zip(args.filename, outputs)]
+
+    failed = 0
+    for file, output, pages, seconds, error in RunJobs(ExportPdfFile, jobs, InitHeadlessProcess):
+        if error:
+            failed += 1
+            print(f"{file}: {error}", file=sys.stderr)
+        else:
+            print(f"{file} -> {output} ({pages} pages, {seconds:.2f} s)")
+    return 1 if failed else 0
+
+def RunJobs(function, jobs: list, initializer=None):
+    """Yields function(job) for every job in order, in a process per CPU."""
+    workers = min(len(jobs), os.cpu_count() or 1)
+    if workers == 1:
+        if initializer:
+            initializer()
+        yield from map(function, jobs)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    # Qt can't be carried over a fork, so every worker starts fresh and sets up its own
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"), initializer=initializer) as pool:
+        yield from pool.map(function, jobs)
+
+def CompileSearchPattern(findText: str, matchCase: bool, wholeWord: bool, useRegex: bool):
+    """Compiles Find/Replace text and options to a regex."""
+    pattern = findText if useRegex else re.escape(findText)
+    if wholeWord:
+        if useRegex:
+            pattern = r'\b(?:' + pattern + r')\b'  # Match whole words using word boundaries
+        else:
+            pattern = r'(?<![^\W_])' + pattern + r'(?![^\W_])'  # Not next to a letter or digit
+    return re.compile(pattern, 0 if matchCase else re.IGNORECASE)
+
+def ExpandFileArguments(patterns: list):
+    """Expands globs to files, returning (files, unmatched patterns)."""
+    import glob
+
+    files = []
+    missing = []
+    for pattern in patterns:
+        matches = sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        if not matches:
+            missing.append(pattern)
+        files.extend(path for path in matches if path not in files)
+    return files, missing
+
+# Magic bytes of the compressed formats that are decompressed on opening and compressed again on saving
+CompressionMagic = ((b"\x1f\x8b", "gzip"), (b"BZh", "bzip2"), (b"\xfd7zXZ\x00", "xz"), (b"\x28\xb5\x2f\xfd", "zstd"))
+CompressionExtensions = {".gz": "gzip", ".bz2": "bzip2", ".xz": "xz", ".zst": "zstd"}
+
+def DetectCompression(file: str):
+    """Returns the compression format of a file from its magic bytes, or None for a plain file."""
+    with open(file, 'rb') as f:
+        head = f.read(6)
+    return next((name for magic, name in CompressionMagic if head.startswith(magic)), None)
+
+def OpenCompressed(file, compression: str, mode: str = 'rb'):
+    """Opens a file name or binary file object as a decompressing or compressing stream."""
+    match compression:
+        case "gzip":
+            import gzip
+            return gzip.open(file, mode, compresslevel=6)  # gzip's own default, much faster than the module's 9
+        case "bzip2":
+            import bz2
+            return bz2.open(file, mode)
+        case "xz":
+            import lzma
+            return lzma.open(file, mode)
+        case "zstd":
+            try:
+                import zstandard  # Optional, only needed for .zst files
+            except ImportError:
+                raise OSError("Opening Zstandard (.zst) files needs the zstandard package.") from None
+            ownsFile = isinstance(file, str)
+            if ownsFile:
+                file = open(file, mode)
+            if mode == 'rb':
+                return zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True, closefd=ownsFile)
+            return zstandard.ZstdCompressor().stream_writer(file, closefd=ownsFile)
+    raise ValueError(f"Unknown compression {compression}.")
+
+def OpenFileStream(file: str):
+    """Opens a file to read its bytes, decompressing them if it's compressed."""
+    compression = DetectCompression(file)
+    return OpenCompressed(file, compression) if compression else open(file, 'rb')
+
+def IsBinaryFile(file: str):
+    with open(file, 'rb') as f:
+        return LooksBinary(f.read(SniffSize))
+
+def ReadFully(stream, size: int):
+    """Reads size bytes, or fewer only at the end of the stream."""
+    chunks = []
+    while size > 0 and (chunk := stream.read(size)):
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+@functools.cache
+def GetFileCreationMask():
+    """The process's umask, read the first time a new file is saved."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    # Elsewhere it can only be read by setting it, so it's put straight back
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+def MoveIntoPlace(temp: str, file: str):
+    """Replaces file with a finished temporary file, keeping the file's permissions."""
+    if os.path.exists(file):
+        shutil.copymode(file, temp)
+    else:
+        os.chmod(temp, 0o666 & ~GetFileCreationMask())
+    os.replace(temp, file)
+
+def DetectEncoding(data: bytes):
+    """Guesses the encoding of text from its first bytes."""
+    import chardet
+    encoding = chardet.detect(data[:1 << 16])['encoding'] or 'utf-8'
+    # The start can be plain ASCII even when the rest isn't
+    return 'utf-8' if encoding == 'ascii' else encoding
+
+SniffSize = 1 << 13  # Bytes looked at to tell binary files from text
+
+def LooksBinary(data: bytes):
+    """Guesses from the first bytes of a file whether it's binary."""
+    if data.startswith((codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE, codecs.BOM_UTF32_BE)):
+        return False
+    # Bytes that don't occur in text, other than whitespace, backspace and escape
+    controls = data.translate(None, bytes(range(0x20, 0x100)) + b"\t\n\v\f\r\b\x1b")
+    if not controls:
+        return False
+    if b"\0" in controls:
+        # UTF-16 and UTF-32 without a BOM have zero bytes in the upper halves of ASCII characters
+        for codec, unit in (("utf-16-le", 2), ("utf-16-be", 2), ("utf-32-le", 4), ("utf-32-be", 4)):
+            try:
+                text = data[:len(data) - len(data) % unit].decode(codec)
+            except UnicodeDecodeError:
+                continue
+            if sum(c < " " and c not in "\t\n\v\f\r\b\x1b" for c in text) * 100 <= len(text):
+                return False
+        return True
+    return len(controls) * 100 > len(data)  # Legacy 8-bit text has next to none
+
+LongLineChars = 1 << 20  # Qt lays out a whole line at once, which is slow in the editor past this
+
+def HasLongLines(text: str):
+    """Whether any line of text is longer than LongLineChars, as in minified files."""
+    # Every stretch of LongLineChars + 1 characters from a line start has a newline unless a line is longer,
+    # so each find skips to the last line starting in it without splitting the text
+    start = 0
+    while len(text) - start > LongLineChars:
+        newline = text.rfind("\n", start, start + LongLineChars + 1)
+        if newline < 0:
+            return True
+        start = newline + 1
+    return False
+
+def DetectFileEncoding(file: str):
+    """Guesses the encoding of a file that may be too big to read whole, from its start."""
+    with OpenFileStream(file) as f:
+        return DetectEncoding(ReadFully(f, 1 << 16))
+
+def ReplaceInFile(job: tuple):
+    """Runs /replace on one file, returning (file, replacements, bytes, seconds, error)."""
+    file, findText, replaceText, matchCase, wholeWord, useRegex, encoding = job
+    ChunkSize = 1 << 22  # Characters read at a time
+    Overlap = 1 << 16  # Longest match that's found across chunk boundaries
+    Context = 256  # Text kept before the search start, so lookbehinds and \b see it
+
+    start = time.perf_counter()
+    size = os.path.getsize(file)
+    temp = None
+    try:
+        if DetectCompression(file):
+            raise ValueError("Compressed files can't be changed in place.")
+        pattern = CompileSearchPattern(findText, matchCase, wholeWord, useRegex)
+        if encoding is None:
+            encoding = DetectFileEncoding(file)
+
+        count = 0
+        fd, temp = tempfile.mkstemp(prefix=os.path.basename(file) + ".", suffix=".tmp", dir=os.path.dirname(os.path.abspath(file)))
+        with open(file, 'r', encoding=encoding, newline='') as source, open(fd, 'w', encoding=encoding, newline='') as target:
+            buffer = ""
+            searchFrom = 0
+            emptyAt = -1  # Where an empty match was replaced last, so resuming there doesn't repeat it
+            eof = False
+            while not eof:
+                chunk = source.read(ChunkSize)
+                eof = not chunk
+                buffer += chunk
+
+                # Near the end of the buffer a match could still continue into the next chunk
+                safe = len(buffer) if eof else len(buffer) - Overlap
+                written = searchFrom
+                for match in pattern.finditer(buffer, searchFrom):
+                    if match.start() == match.end() == emptyAt:
+                        continue
+                    if not eof and match.end() >= safe:
+                        break
+                    target.write(buffer[written:match.start()])
+                    target.write(match.expand(replaceText) if useRegex else replaceText)
+                    written = match.end()
+                    emptyAt = written if match.start() == match.end() else -1
+                    count += 1
+                else:
+                    if written < safe:
+                        target.write(buffer[written:safe])
+                        written = safe
+                        emptyAt = -1
+
+                keep = max(0, written - Context)
+                buffer = buffer[keep:]
+                searchFrom = written - keep
+                if emptyAt >= 0:
+                    emptyAt -= keep
+            target.flush()
+            os.fsync(target.fileno())
+
+        if count:
+            MoveIntoPlace(temp, file)
+        else:
+            os.remove(temp)
+        return file, count, size, time.perf_counter() - start, None
+    except Exception as e:
+        if temp and os.path.exists(temp):
+            os.remove(temp)
+        return file, 0, size, time.perf_counter() - start, str(e)
+
+def ReplaceBatch(args: argparse.Namespace, parser: argparse.ArgumentParser):
+    """Runs /replace over the files and globs given and returns the exit code."""
+    findText, replaceText = args.replace
+    if not findText:
+        parser.error("/replace needs text to find.")
+    try:
+        CompileSearchPattern(findText, args.matchcase, args.wholeword, args.regex)
+    except re.error as e:
+        parser.error(f"Invalid regular expression: {e}")
+    files, missing = ExpandFileArguments(args.filename)
+    if missing:
+        parser.error(f"No files match {", ".join(missing)}.")
+    if not files:
+        parser.error("/replace needs at least one file.")
+
+    jobs = [(file, findText, replaceText, args.matchcase, args.wholeword, args.regex, args.e) for file in files]
+    start = time.perf_counter()
+    failed = 0
+    total = 0
+    totalBytes = 0
+    for file, count, size, seconds, error in RunJobs(ReplaceInFile, jobs):
+        totalBytes += size
+        if error:
+            failed += 1
+            print(f"{file}: {error}", file=sys.stderr)
+        else:
+            total += count
+            print(f"{file}: {count} replacements ({size / 1e6 / max(seconds, 1e-9):.1f} MB/s)")
+    seconds = time.perf_counter() - start
+    print(f"{total} replacements in {len(files) - failed} files, {totalBytes / 1e6:.1f} MB in {seconds:.2f} s ({totalBytes / 1e6 / max(seconds, 1e-9):.1f} MB/s)")
+    return 1 if failed else 0
+
+def SpellCheckParagraph(paragraph: tuple):
+    """Checks one (offset, text) paragraph with lang_tool."""
+    offset, text = paragraph
+    # LanguageTool counts UTF-16 units and some versions of language_tool_python correct the offsets but not the lengths,
+    # so characters outside the BMP are sent as one stand-in each and the results are then character offsets
+    text = AstralCharacters.sub("\ufffd", text)
+    return [{"offset": offset + match.offset, "length": match.errorLength, "rule": match.ruleId,
+             "message": match.message, "replacements": match.replacements} for match in lang_tool.check(text)]
+
+def SpellCheckBatch(args: argparse.Namespace, parser: argparse.ArgumentParser):
+    """Runs /spellcheck, printing the matches as JSON lines."""
+    import hashlib
+    from concurrent.futures import ThreadPoolExecutor
+
+    files, missing = ExpandFileArguments(args.filename)
+    if missing:
+        parser.error(f"No files match {", ".join(missing)}.")
+    if not files:
+        parser.error("/spellcheck needs at least one file.")
+
+    # Results of earlier runs, by absolute path and /e, kept while the file's bytes hash the same
+    cache = {}
+    if args.cache and os.path.exists(args.cache):
+        try:
+            with open(args.cache, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except ValueError:
+            pass  # A damaged cache only means checking everything again
+
+    global lang_tool
+    pool = None
+    found = 0
+    failed = 0
+    for file in files:
+        try:
+            with open(file, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            key = json.dumps([os.path.abspath(file), args.e])
+            entry = cache.get(key)
+            if entry and entry["hash"] == digest:
+                matches = entry["matches"]
+            else:
+                text, _ = ReadTextFile(file, args.e)
+                if lang_tool is None:
+                    # Only started once a file actually needs checking, as starting LanguageTool takes a while
+                    try:
+                        import language_tool_python
+                        lang_tool = language_tool_python.LanguageTool("en-US")
+                    except Exception as e:
+                        failed += 1
+                        print(f"LanguageTool couldn't start: {e}", file=sys.stderr)
+                        break  # Nothing else can be checked either
+                    pool = ThreadPoolExecutor()
+
+                # Paragraphs are separated by blank lines and checked side by side by the one server
+                paragraphs = [(m.start(), m.group()) for m in re.finditer(r'(?:[^\n]|\n(?![ \t]*\n))+', text) if m.group().strip()]
+                matches = [match for result in pool.map(SpellCheckParagraph, paragraphs) for match in result]
+
+                lineStarts = [0] + [m.end() for m in re.finditer('\n', text)]
+                for match in matches:
+                    line = bisect.bisect_right(lineStarts, match["offset"])
+                    match["line"] = line
+                    match["column"] = match["offset"] - lineStarts[line - 1] + 1
+                cache[key] = {"hash": digest, "matches": matches}
+
+            for match in matches:
+                print(json.dumps({"file": file, **match}, ensure_ascii=False), flush=True)
+            found += len(matches)
+        except Exception as e:
+            failed += 1
+            print(f"{file}: {e}", file=sys.stderr)
+
+    if pool:
+        pool.shutdown()
+        lang_tool.close()
+    if args.cache:
+        temp = args.cache + ".tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(temp, args.cache)
+    return 1 if found or failed else 0
+
+def ConvertFileEncoding(job: tuple):
+    """Transcodes one file in place, returning (file, source encoding, bytes, seconds, error)."""
+    file, source, target = job
+    ChunkSize = 1 << 22  # Bytes read at a time
+    MaxReported = 20
+
+    start = time.perf_counter()
+    size = os.path.getsize(file)
+    temp = None
+    try:
+        if DetectCompression(file):
+            raise ValueError("Compressed files can't be changed in place.")
+        source = source or DetectFileEncoding(file)
+        decoder = codecs.getincrementaldecoder(source)()
+        encoder = codecs.getincrementalencoder(target)()
+
+        unencodable = []
+        unencodableCount = 0
+        line, column = 1, 1  # Where the next chunk starts
+        offset = 0  # Bytes decoded before the current chunk
+        fd, temp = tempfile.mkstemp(prefix=os.path.basename(file) + ".", suffix=".tmp", dir=os.path.dirname(os.path.abspath(file)))
+        with open(file, 'rb') as f, open(fd, 'wb') as out:
+            while True:
+                data = f.read(ChunkSize)
+                final = not data
+                try:
+                    text = decoder.decode(data, final)
+                except UnicodeDecodeError as e:
+                    raise ValueError(f"Not valid {source} at byte {offset + e.start}.") from None
+                offset += len(data)
+
+                # Encode around each character the target can't hold, noting where it was
+                done = 0
+                while True:
+                    try:
+                        encoded = encoder.encode(text[done:], final)
+                        break
+                    except UnicodeEncodeError as e:
+                        out.write(encoder.encode(text[done:done + e.start]))
+                        index = done + e.start
+                        unencodableCount += e.end - e.start
+                        if len(unencodable) < MaxReported:
+                            lineStart = text.rfind('\n', 0, index)
+                            at = (line + text.count('\n', 0, index), index - lineStart if lineStart >= 0 else column + index)
+                            unencodable.append(f"line {at[0]}, column {at[1]}: {text[index]!r} (U+{ord(text[index]):04X})")
+                        done += e.end
+                out.write(encoded)
+
+                lineStart = text.rfind('\n')
+                column = len(text) - lineStart if lineStart >= 0 else column + len(text)
+                line += text.count('\n')
+                if final:
+                    break
+            out.flush()
+            os.fsync(out.fileno())
+
+        if unencodableCount:
+            raise ValueError(f"{unencodableCount} characters can't be represented in {target}:\n  " + "\n  ".join(unencodable)
+                             + ("\n  ..." if unencodableCount > len(unencodable) else ""))
+        MoveIntoPlace(temp, file)
+        return file, source, size, time.perf_counter() - start, None
+    except Exception as e:
+        if temp and os.path.exists(temp):
+            os.remove(temp)
+        return file, source, size, time.perf_counter() - start, str(e)
+
+def ConvertBatch(args: argparse.Namespace, parser: argparse.ArgumentParser):
+    """Runs /convert over the files and globs given and returns the exit code."""
+    for encoding in (args.convert, args.e):
+        if encoding:
+            try:
+                codecs.lookup(encoding)
+            except LookupError:
+                parser.error(f"Unknown encoding \"{encoding}\".")
+    files, missing = ExpandFileArguments(args.filename)
+    if missing:
+        parser.error(f"No files match {", ".join(missing)}.")
+    if not files:
+        parser.error("/convert needs at least one file.")
+
+    failed = 0
+    for file, source, size, seconds, error in RunJobs(ConvertFileEncoding, [(file, args.e, args.convert) for file in files]):
+        if error:
+            failed += 1
+            print(f"{file}: {error}", file=sys.stderr)
+        else:
+            print(f"{file}: {source} -> {args.convert} ({size / 1e6:.1f} MB, {size / 1e6 / max(seconds, 1e-9):.1f} MB/s)")
+    return 1 if failed else 0
 
 class LanguageToolLoader(QObject):
     tool_ready = pyqtSignal()
@@ -52,13 +651,15 @@ class LanguageToolLoader(QObject):
         self.Thread.start()
 
     def initialize_tool(self):
+        import language_tool_python
+
         global lang_tool
         lang_tool = language_tool_python.LanguageTool("en-US")
         self.tool_ready.emit()  # Emit signal when the tool is ready
 
 class MainWindow(QMainWindow):
     
-    def __init__(self):
+    def __init__(self, args: argparse.Namespace = None):
         super().__init__()
         self.ActionsInitialized = False
         self.setGeometry(200, 200, 800, 600)
@@ -69,8 +670,8 @@ class MainWindow(QMainWindow):
         self.CentralWidget = QWidget(self)
         self.setCentralWidget(self.CentralWidget)
 
-        global lang_tool_loader
-        lang_tool_loader = LanguageToolLoader()
+        global autosave_session
+        autosave_session = AutosaveSession()
 
         # Create a layout for the central widget
         self.Layout = QVBoxLayout(self.CentralWidget)
@@ -94,9 +695,18 @@ class MainWindow(QMainWindow):
         self.TextBox.cursorPositionChanged.connect(self.TextCursorPositionChanged)
         self.TextBox.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.TextBox.customContextMenuRequested.connect(self.TextBoxContextMenuRequested)
+        self.TextBox.document().contentsChange.connect(self.DocumentContentsChange)
         self.Font = self.TextBox.font()
+        self.SwappingContent = False
+        self.AppendingFollowedText = False
 
-        self.Printer = QPrinter(QPrinter.PrinterMode.ScreenResolution)
+        self.Printer = None
+        self.PrintJob = None
+        self.PrintProgress = None
+        self.ConvertJob = None
+        self.LargeView = None
+        self.HexView = None
+        self.CurrentView = self.TextBox  # The editor, or the view that's in its place for the current tab
 
         self.InitActions()
         self.AssignActionIcons()
@@ -117,6 +727,15 @@ class MainWindow(QMainWindow):
         self.Layout.addWidget(self.TextBox)
         self.Layout.setContentsMargins(2, 2, 2, 2)
 
+        self.CursorLabel = QLabel(self)
+        self.statusBar().addPermanentWidget(self.CursorLabel)
+        self.StatsLabel = QLabel(self)
+        self.statusBar().addPermanentWidget(self.StatsLabel)
+        self.EncodingLabel = QLabel(self)
+        self.statusBar().addPermanentWidget(self.EncodingLabel)
+        self.FileSizeLabel = QLabel(self)
+        self.statusBar().addPermanentWidget(self.FileSizeLabel)
+
         self.ToggleCloseButtons()
 
         self.LastNonFullscreenState = None
@@ -128,45 +747,116 @@ class MainWindow(QMainWindow):
         self.UndoTimer.setSingleShot(True)  # Trigger once
         self.UndoTimer.timeout.connect(self.PushUndo)  # Connect timeout to the function
 
+        self.UiUpdateTimer = QTimer(self)
+        self.UiUpdateTimer.setSingleShot(True)
+        self.UiUpdateTimer.setInterval(16)  # About one frame
+        self.UiUpdateTimer.timeout.connect(self.FlushUiUpdates)
+
+        # Notices other programs changing open files; the paths waiting to be checked are collected for a moment
+        self.FileWatcher = QFileSystemWatcher(self)
+        self.FileWatcher.fileChanged.connect(self.ScheduleDiskCheck)
+        self.DiskCheckPaths = set()
+        self.DiskCheckTimer = QTimer(self)
+        self.DiskCheckTimer.setSingleShot(True)
+        self.DiskCheckTimer.setInterval(100)
+        self.DiskCheckTimer.timeout.connect(self.CheckDiskChanges)
+        self.CheckingDisk = False
+        self.CompareDialog = None
+        self.SaveJob = None  # SaveAllJob while Save All runs
+        self.CloseWhenSaved = False
+
         self.TextBox.copyAvailable.connect(self.CopyAvailable)
+
+        # Defer work that isn't needed for an editable window until the editor has painted once
+        self.TextBox.viewport().installEventFilter(self)
+
+        # Hand pending journal deltas to the writer thread about once a second
+        self.JournalTimer = QTimer(self)
+        self.JournalTimer.timeout.connect(self.FlushJournals)
+        self.JournalTimer.start(1000)
         
         self.history_window = None
         self.PPrevWidget = None
 
-        self.ParseArgs()
-
-    def ParseArgs(self):
-        self.parser = argparse.ArgumentParser(
-            prog="WriteBox",
-            description="WriteBox is a simple text editing application.",
-            formatter_class=argparse.HelpFormatter,
-            prefix_chars="/"
-        )
-        self.parser.add_argument('filename', type=str, nargs='?', help='The file path to open.')
-        self.parser.add_argument('/e', type=str, help='The encoding to open the file in, if a file path is specified.')
+        self.ParseArgs(args)
+        QTimer.singleShot(0, self.RecoverJournals)
 
-        args = self.parser.parse_args()
+    def ParseArgs(self, args: argparse.Namespace = None):
+        self.parser = CreateArgParser()
+        if args is None:
+            args = ParseArguments(self.parser)
         
-        if args.filename:
-            if os.path.exists(args.filename):
-                idx = self.TabBar.addTab(os.path.basename(args.filename))
+        for filename in args.filename:
+            if os.path.exists(filename):
+                idx = self.TabBar.addTab(os.path.basename(filename))
                 if args.e:
                     try:
-                        self.OpenTabs[idx] = TabInfo(args.filename, args.e)
+                        self.OpenTabs[idx] = TabInfo(filename, args.e)
                     except Exception as ex:
                         self.parser.error(ex)
 
                     self.TabBar.setCurrentIndex(idx)
                 else:
-                    self.OpenTabs[idx] = TabInfo(args.filename)
+                    self.OpenTabs[idx] = TabInfo(filename)
                     self.TabBar.setCurrentIndex(idx)
 
                 self.ToggleCloseButtons()
             else:
-                self.parser.error("The file specified doesn't exist.")
+                self.parser.error(f"The file {filename} doesn't exist.")
+
+    def OpenForwardedFile(self, filename: str, encoding: str):
+        """Opens a file handed over by a later launch of WriteBox and brings the window to the front."""
+        if filename:
+            try:
+                tab = TabInfo(filename, encoding or None)
+            except Exception as ex:
+                msg = QMessageBox(self)
+                msg.setText(f"Couldn't open {os.path.basename(filename)}:\n{ex}")
+                msg.setWindowTitle("Open File")
+                msg.setIconPixmap(GetIconForResource("imgs", "warn.svg", QSize(64, 64)).pixmap(QSize(64, 64), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
+                msg.exec()
+            else:
+                idx = self.TabBar.addTab(os.path.basename(filename))
+                self.OpenTabs[idx] = tab
+                self.TabBar.setCurrentIndex(idx)
+                self.ToggleCloseButtons()
+
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
+    def eventFilter(self, obj: QObject, event: QEvent):
+        if obj is self.TextBox.viewport() and event.type() == QEvent.Type.Paint:
+            obj.removeEventFilter(self)
+            QTimer.singleShot(0, self.FirstPaint)
+        return super().eventFilter(obj, event)
+
+    def FirstPaint(self):
+        if startup_timeline:
+            startup_timeline.Mark("first paint")
+            startup_timeline.Print()
+        self.StartLanguageTool()
+
+    def StartLanguageTool(self):
+        global lang_tool_loader
+        if lang_tool_loader is None:
+            lang_tool_loader = LanguageToolLoader()
 
+    def GetPrinter(self):
+        if self.Printer is None:
+            from PyQt6.QtPrintSupport import QPrinter
+            self.Printer = QPrinter(QPrinter.PrinterMode.ScreenResolution)
+        return self.Printer
 
     def closeEvent(self, event: QCloseEvent):
+        if self.SaveJob:
+            # Close once the files being saved are written
+            self.CloseWhenSaved = True
+            event.ignore()
+            return
+
+        self.CommitPendingEdit()
         for idx, tab in self.OpenTabs.items():
             res = tab.AskSave()
             match res:
@@ -175,12 +865,18 @@ class MainWindow(QMainWindow):
                     event.accept()
                     break
                 case AskSaveResult.SaveAll:
-                    self.SaveAllTabs()
+                    if not self.SaveAllTabs():
+                        event.ignore()
+                        return
                     event.accept()
                     break
                 case AskSaveResult.Cancel:
                     event.ignore()
                     return
+        if self.PrintJob:
+            self.PrintJob.Cancel()
+            self.PrintJob.Thread.join()
+        autosave_session.Close()
         app.quit()
         super().closeEvent(event)
 
@@ -188,12 +884,15 @@ class MainWindow(QMainWindow):
 
     def PrintPreview(self):
         if self.PrintPreviewAction.isChecked():
+            if not self.PrintPreviewActionsInitialized:
+                self.InitPrintPreviewActions()
+                self.AssignPrintPreviewActionIcons()
+
             self.PrintPrevConnections = []
-            self.PPrevWidget = ZoomablePrintPreviewWidget(self.Printer, self)
+            self.PPrevWidget = PrintPreviewView(self.GetPrinter(), self.GetPrintLayout, self)
             self.Layout.replaceWidget(self.TextBox, self.PPrevWidget, Qt.FindChildOption.FindDirectChildrenOnly)
-            self.PPrevWidget.paintRequested.connect(self.PrintPreviewPaintRequested)
-            self.PPrevWidget.updatePreview()
             self.MenuBar.hide()
+            self.statusBar().hide()
             self.ToolBar.deleteLater()
             self.TabBar.hide()
             self.NewTabButton.hide()
@@ -211,9 +910,9 @@ class MainWindow(QMainWindow):
             self.PrintPreviewToolbar.addAction(self.PrintPrevFitWindowAction)
             self.PrintPreviewToolbar.addAction(self.PrintPrevFitWidthAction)
             self.PrintPreviewToolbar.addAction(self.PrintPrevCustomZoomAction)
-            self.PrintPrevConnections.append((self.PrintPrevFitWindowAction.triggered, self.PrintPrevFitWindowAction.triggered.connect(lambda: self.SetPrintPrevZoomMode(QPrintPreviewWidget.ZoomMode.FitInView))))
-            self.PrintPrevConnections.append((self.PrintPrevFitWidthAction.triggered, self.PrintPrevFitWidthAction.triggered.connect(lambda: self.SetPrintPrevZoomMode(QPrintPreviewWidget.ZoomMode.FitToWidth))))
-            self.PrintPrevConnections.append((self.PrintPrevCustomZoomAction.triggered, self.PrintPrevCustomZoomAction.triggered.connect(lambda: self.SetPrintPrevZoomMode(QPrintPreviewWidget.ZoomMode.CustomZoom))))
+            self.PrintPrevConnections.append((self.PrintPrevFitWindowAction.triggered, self.PrintPrevFitWindowAction.triggered.connect(lambda: self.SetPrintPrevZoomMode(PreviewZoomMode.FitInView))))
+            self.PrintPrevConnections.append((self.PrintPrevFitWidthAction.triggered, self.PrintPrevFitWidthAction.triggered.connect(lambda: self.SetPrintPrevZoomMode(PreviewZoomMode.FitToWidth))))
+            self.PrintPrevConnections.append((self.PrintPrevCustomZoomAction.triggered, self.PrintPrevCustomZoomAction.triggered.connect(lambda: self.SetPrintPrevZoomMode(PreviewZoomMode.CustomZoom))))
             self.PPrevZoomBox = QDoubleSpinBox(self)
             self.PPrevZoomBox.setAccelerated(True)
             self.PPrevZoomBox.setRange(5, 600)
@@ -266,7 +965,9 @@ class MainWindow(QMainWindow):
         else:
             self.Layout.replaceWidget(self.PPrevWidget, self.TextBox, Qt.FindChildOption.FindDirectChildrenOnly)
             self.PPrevWidget.deleteLater()
+            self.PPrevWidget = None
             self.MenuBar.show()
+            self.statusBar().show()
             self.InitToolBar()
             self.TabBar.show()
             self.NewTabButton.show()
@@ -294,7 +995,7 @@ class MainWindow(QMainWindow):
 
     def PrintPrevZoomChanged(self):
         self.PPrevWidget.setZoomFactor(self.PPrevZoomBox.value() / 100)
-        if self.PPrevWidget.zoomMode() == QPrintPreviewWidget.ZoomMode.CustomZoom:
+        if self.PPrevWidget.zoomMode() == PreviewZoomMode.CustomZoom:
             self.PrintPrevCustomZoomAction.setChecked(True)
 
     def UpdatePrintPreview(self):
@@ -323,23 +1024,28 @@ class MainWindow(QMainWindow):
         self.PrintPrevNextPageAction.setEnabled(self.PPrevWidget.currentPage() != self.PPrevWidget.pageCount())
         
         self.PrintPrevPageBox.blockSignals(True)
+        self.PrintPrevPageBox.setRange(1, self.PPrevWidget.pageCount())
+        self.PrintPrevPageBox.setSuffix(" / " + str(self.PPrevWidget.pageCount()))
         self.PrintPrevPageBox.setValue(self.PPrevWidget.currentPage())
         self.PrintPrevPageBox.blockSignals(False)
 
-    def SetPrintPrevZoomMode(self, zoomMode: QPrintPreviewWidget.ZoomMode):
+    def SetPrintPrevZoomMode(self, zoomMode: "PreviewZoomMode"):
         self.PPrevWidget.setZoomMode(zoomMode)
 
-    def PrintPreviewPaintRequested(self, printer: QPrinter):
-        doc = QTextDocument(self.TextBox.toPlainText())
-        doc.setDefaultFont(self.TextBox.font())
-        fnt = f"font-family:{self.TextBox.font().family()}; font-size:{self.TextBox.font().pointSizeF()}pt;"
-        tc = self.palette().text().color()
-        tcol = QColor(255 - tc.red(), 255 - tc.green(), 255 - tc.blue(), tc.alpha())
-
-        content = f'<span style="{fnt} color: rgba({tcol.red()},{tcol.green()},{tcol.blue()},{tcol.alphaF()});"> {self.TextBox.toPlainText()} </span>'
-
-        doc.setHtml(content)
-        doc.print(printer)
+    def GetPrintLayout(self, printer: "QPrinter"):
+        """Returns the current tab's pagination for the printer's page setup."""
+        tab = self.OpenTabs[self.TabBar.currentIndex()]
+        key = PrintLayout.Key(self.Font, printer.pageLayout(), printer.resolution())
+        layout = tab.PrintLayouts.pop(key, None)
+        if layout is None:
+            layout = PrintLayout(self.Font, printer.pageLayout(), printer.resolution())
+            layout.SetDocument(self.TextBox.document())
+
+        # Most recently used last, so the oldest page setup is dropped first
+        tab.PrintLayouts[key] = layout
+        while len(tab.PrintLayouts) > 4:
+            del tab.PrintLayouts[next(iter(tab.PrintLayouts))]
+        return layout
 
     def InitActions(self):
         # File actions
@@ -356,22 +1062,35 @@ class MainWindow(QMainWindow):
         self.SaveFileAction = QAction(self)
         self.SaveFileAction.setText("Save")
         self.SaveFileAction.setShortcut(QKeySequence.StandardKey.Save)
-        self.SaveFileAction.triggered.connect(lambda: self.OpenTabs[self.TabBar.currentIndex()].Save())
+        self.SaveFileAction.triggered.connect(self.SaveCurrentTab)
 
         self.SaveFileAsAction = QAction(self)
         self.SaveFileAsAction.setText("Save As")
         self.SaveFileAsAction.setShortcut(QKeySequence.StandardKey.SaveAs)
-        self.SaveFileAsAction.triggered.connect(lambda: self.OpenTabs[self.TabBar.currentIndex()].SaveAs())
+        self.SaveFileAsAction.triggered.connect(self.SaveCurrentTabAs)
 
         self.SaveAllFilesAction = QAction(self)
         self.SaveAllFilesAction.setText("Save All")
         self.SaveAllFilesAction.triggered.connect(self.SaveAllTabs)
 
+        self.ConvertEncodingAction = QAction(self)
+        self.ConvertEncodingAction.setText("Convert Encoding...")
+        self.ConvertEncodingAction.triggered.connect(self.ConvertEncoding)
+
+        self.CompareAction = QAction(self)
+        self.CompareAction.setText("Compare with Saved...")
+        self.CompareAction.setEnabled(False)
+        self.CompareAction.triggered.connect(self.CompareWithSaved)
+
         self.PrintAction = QAction(self)
         self.PrintAction.setText("Print")
         self.PrintAction.setShortcut(QKeySequence.StandardKey.Print)
         self.PrintAction.triggered.connect(self.Print)
 
+        self.ExportPdfAction = QAction(self)
+        self.ExportPdfAction.setText("Export to PDF")
+        self.ExportPdfAction.triggered.connect(self.ExportPdf)
+
         self.PageSetupAction = QAction(self)
         self.PageSetupAction.setText("Page Setup")
         self.PageSetupAction.triggered.connect(self.PageSetup)
@@ -437,16 +1156,22 @@ class MainWindow(QMainWindow):
         self.PasteAction.setShortcut(QKeySequence.StandardKey.Paste)
         self.PasteAction.setEnabled(self.TextBox.canPaste())
         self.PasteAction.triggered.connect(self.TextBox.paste)
+        QApplication.clipboard().dataChanged.connect(lambda: self.PasteAction.setEnabled(self.TextBox.canPaste()))
 
         self.SpellGrammarCheckAction = QAction(self)
         self.SpellGrammarCheckAction.setText("Spell/Grammar Check")
         self.SpellGrammarCheckAction.setShortcut(QKeySequence("F7"))
-        self.SpellGrammarCheckAction.triggered.connect(lambda: SpellCheckDialog(self.TextBox, self).exec())
+        self.SpellGrammarCheckAction.triggered.connect(self.SpellCheck)
 
         self.FindReplaceAction = QAction(self)
         self.FindReplaceAction.setText("Find/Replace")
         self.FindReplaceAction.setShortcuts([QKeySequence.StandardKey.Replace, QKeySequence.StandardKey.Find])
-        self.FindReplaceAction.triggered.connect(lambda: FindReplaceDialog(self, self.TextBox, self.TextBox.textCursor()).exec())
+        self.FindReplaceAction.triggered.connect(self.FindReplace)
+
+        self.GoToAction = QAction(self)
+        self.GoToAction.setText("Go To...")
+        self.GoToAction.setShortcut(QKeySequence("Ctrl+G"))
+        self.GoToAction.triggered.connect(self.GoTo)
 
         # View actions
         self.ZoomInAction = QAction(self)
@@ -475,10 +1200,26 @@ class MainWindow(QMainWindow):
         self.WordWrapAction.setCheckable(True)
         self.WordWrapAction.triggered.connect(lambda: self.TextBox.setLineWrapMode(QPlainTextEdit.LineWrapMode.WidgetWidth if self.WordWrapAction.isChecked() else QPlainTextEdit.LineWrapMode.NoWrap))
 
+        self.FollowAction = QAction(self)
+        self.FollowAction.setText("Follow File")
+        self.FollowAction.setShortcut(QKeySequence("Ctrl+Shift+F"))
+        self.FollowAction.setCheckable(True)
+        self.FollowAction.setEnabled(False)
+        self.FollowAction.triggered.connect(self.ToggleFollow)
+
         self.EditFontAction = QAction(self)
         self.EditFontAction.setText("Edit Font...")
         self.EditFontAction.triggered.connect(self.EditFont)
 
+        self.EditAnywayAction = QAction(self)
+        self.EditAnywayAction.setText("Edit Anyway")
+        self.EditAnywayAction.setEnabled(False)
+        self.EditAnywayAction.triggered.connect(self.EditLongLines)
+
+        self.LargeFileThresholdAction = QAction(self)
+        self.LargeFileThresholdAction.setText("Large File Threshold...")
+        self.LargeFileThresholdAction.triggered.connect(self.EditLargeFileThreshold)
+
         self.EditFontColorAction = QAction(self)
         self.EditFontColorAction.setText("Edit Font Color...")
         self.EditFontColorAction.triggered.connect(self.EditFontColor)
@@ -488,7 +1229,11 @@ class MainWindow(QMainWindow):
         self.AboutQtAction.setText("About Qt...")
         self.AboutQtAction.triggered.connect(app.aboutQt)
 
-        # Other actions
+        self.PrintPreviewActionsInitialized = False
+        self.ActionsInitialized = True
+
+    def InitPrintPreviewActions(self):
+        # Only needed once print preview is opened
         self.PrintPrevExitAction = QAction(self)
         self.PrintPrevExitAction.setText("Exit Print Preview (Ctrl + Shift + P)")
         self.PrintPrevExitAction.triggered.connect(self.PrintPreviewAction.trigger)
@@ -548,7 +1293,7 @@ class MainWindow(QMainWindow):
         self.PrintPrevViewAllAction.setCheckable(True)
         self.PrintPrevViewGroup.addAction(self.PrintPrevViewAllAction)
 
-        self.ActionsInitialized = True
+        self.PrintPreviewActionsInitialized = True
 
     def InitMenuBar(self):
         self.MenuBar = QMenuBar(self)
@@ -560,8 +1305,11 @@ class MainWindow(QMainWindow):
         self.FileMenu.addAction(self.SaveFileAction)
         self.FileMenu.addAction(self.SaveFileAsAction)
         self.FileMenu.addAction(self.SaveAllFilesAction)
+        self.FileMenu.addAction(self.ConvertEncodingAction)
+        self.FileMenu.addAction(self.CompareAction)
         self.FileMenu.addSeparator()
         self.FileMenu.addAction(self.PrintAction)
+        self.FileMenu.addAction(self.ExportPdfAction)
         self.FileMenu.addAction(self.PageSetupAction)
         self.FileMenu.addAction(self.PrintPreviewAction)
         self.FileMenu.addSeparator()
@@ -581,6 +1329,7 @@ class MainWindow(QMainWindow):
         self.EditMenu.addAction(self.PasteAction)
         self.EditMenu.addAction(self.SpellGrammarCheckAction)
         self.EditMenu.addAction(self.FindReplaceAction)
+        self.EditMenu.addAction(self.GoToAction)
 
         # View Menu
         self.ViewMenu = QMenu("View", self)
@@ -590,8 +1339,11 @@ class MainWindow(QMainWindow):
         self.ViewMenu.addSeparator()
         self.ViewMenu.addAction(self.FullScreenAction)
         self.ViewMenu.addAction(self.WordWrapAction)
+        self.ViewMenu.addAction(self.FollowAction)
+        self.ViewMenu.addAction(self.EditAnywayAction)
         self.ViewMenu.addAction(self.EditFontAction)
         self.ViewMenu.addAction(self.EditFontColorAction)
+        self.ViewMenu.addAction(self.LargeFileThresholdAction)
 
         # Help Menu
         self.HelpMenu = QMenu("Help", self)
@@ -624,8 +1376,8 @@ class MainWindow(QMainWindow):
         self.ZoomBox.setValue(100)
         self.ZoomBox.setToolTip("Zoom percentage")
         self.ZoomBox.setSuffix("%")
-        self.TextBox.zoomLevelChanged.connect(lambda zoomLevel: self.ZoomBox.setValue(round(zoomLevel * 100)))
-        self.ZoomBox.valueChanged.connect(lambda: self.TextBox.SetZoomLevel(self.ZoomBox.value() / 100))
+        self.TextBox.zoomLevelChanged.connect(self.ZoomLevelChanged)
+        self.ZoomBox.valueChanged.connect(self.ZoomBoxChanged)
         self.ToolBar.addWidget(self.ZoomBox)
         self.ToolBar.addAction(self.FullScreenAction)
         self.ToolBar.addSeparator()
@@ -648,6 +1400,7 @@ class MainWindow(QMainWindow):
         self.SaveFileAsAction.setIcon(GetIconForResource("imgs", "saveas.svg"))
         self.SaveAllFilesAction.setIcon(GetIconForResource("imgs", "save.svg"))
         self.PrintAction.setIcon(GetIconForResource("imgs", "print.svg"))
+        self.ExportPdfAction.setIcon(GetIconForResource("imgs", "saveas.svg"))
         self.PageSetupAction.setIcon(GetIconForResource("imgs", "pagesp.svg"))
         self.PrintPreviewAction.setIcon(GetIconForResource("imgs", "printprev.svg"))
         self.SettingsAction.setIcon(GetIconForResource("imgs", "config.svg"))
@@ -669,6 +1422,11 @@ class MainWindow(QMainWindow):
         self.WordWrapAction.setIcon(GetIconForResource("imgs", "wwrap.svg"))
         self.EditFontAction.setIcon(GetIconForResource("imgs", "font.svg"))
         self.EditFontColorAction.setIcon(GetIconForResource("imgs", "paint.svg"))
+        self.AboutQtAction.setIcon(GetIconForResource("imgs", "info.svg"))
+        if self.PrintPreviewActionsInitialized:
+            self.AssignPrintPreviewActionIcons()
+
+    def AssignPrintPreviewActionIcons(self):
         self.PrintPrevExitAction.setIcon(GetIconForResource("imgs", "exit.svg"))
         self.PrintPrevFitWindowAction.setIcon(GetIconForResource("imgs", "fitwin.svg"))
         self.PrintPrevFitWidthAction.setIcon(GetIconForResource("imgs", "fitwidth.svg"))
@@ -682,16 +1440,15 @@ class MainWindow(QMainWindow):
         self.PrintPrevViewSingleAction.setIcon(GetIconForResource("imgs", "printprevm0.svg"))
         self.PrintPrevViewFacingAction.setIcon(GetIconForResource("imgs", "printprevm1.svg"))
         self.PrintPrevViewAllAction.setIcon(GetIconForResource("imgs", "printprevm2.svg"))
-        self.AboutQtAction.setIcon(GetIconForResource("imgs", "info.svg"))
 
     def ToggleFullscreen(self):
         if self.isFullScreen():
             self.setWindowState(self.LastNonFullscreenState)
-            self.FullScreenAction.setIcon(QIcon(GetResourcePath("imgs", "fullscreen.svg")))
+            self.FullScreenAction.setIcon(GetIconForResource("imgs", "fullscreen.svg"))
         else:
             self.LastNonFullscreenState = self.windowState()
             self.setWindowState(Qt.WindowState.WindowFullScreen)
-            self.FullScreenAction.setIcon(QIcon(GetResourcePath("imgs", "fullscreenx.svg")))
+            self.FullScreenAction.setIcon(GetIconForResource("imgs", "fullscreenx.svg"))
 
     def TabAdded(self, index):
         self.ToggleCloseButtons()
@@ -701,15 +1458,22 @@ class MainWindow(QMainWindow):
 
     def CloseTab(self, index):
         if self.TabBar.count() > 1:
+            self.CommitPendingEdit()
             res = self.OpenTabs[index].AskSave()
             match res:
                 case AskSaveResult.SaveAll:
-                    self.SaveAllTabs()
+                    if not self.SaveAllTabs():
+                        return
                 case AskSaveResult.SaveCurrent:
                     self.OpenTabs[index].Save()
                 case AskSaveResult.Cancel:
                     return
 
+            closed = self.OpenTabs[index]
+            self.OpenTabs[index].Journal.Discard()
+            if self.OpenTabs[index].Follower:
+                self.OpenTabs[index].Follower.Stop()
+
             # Remove the tab from TabBar first
             self.TabBar.removeTab(index)
             
@@ -725,37 +1489,312 @@ class MainWindow(QMainWindow):
             self.OpenTabs = updated_tabs
             self.TabSelected(self.TabBar.currentIndex())
 
+            # Only once no view shows them, since removing the tab selected another one with the old indexes
+            if closed.LargeFile:
+                closed.LargeFile.Close()
+            if closed.Binary:
+                closed.Binary.Close()
+
             self.ToggleCloseButtons()
 
     def SaveAllTabs(self):
-        for idx, tab in self.OpenTabs.items():
-            if tab.FilePath:
-                tab.Save()
+        """Saves every tab that has a file, returning False if some couldn't be saved."""
+        if self.SaveJob:
+            return False
+        self.CommitPendingEdit()
+        tabs = []
+        jobs = []
+        fingerprints = []
+        for tab in self.OpenTabs.values():
+            if tab.FilePath and tab.LargeFile is None and tab.Binary is None:
+                pending = tab.SaveJob()
+                if pending:
+                    tabs.append(tab)
+                    jobs.append(pending[0])
+                    fingerprints.append(pending[1])
+
+        errors = []
+        if jobs:
+            progress = QProgressDialog("Saving files...", "", 0, len(jobs), self)
+            progress.setWindowTitle("WriteBox")
+            progress.setCancelButton(None)  # Files already written stay written, so there's nothing to cancel
+            progress.setWindowModality(Qt.WindowModality.WindowModal)
+            progress.setMinimumDuration(500)
+            done = []
+
+            def FileSaved(result):
+                index, encoding, error = result
+                if error:
+                    errors.append(f"{os.path.basename(jobs[index][0])}: {error}")
+                else:
+                    tabs[index].Saved(encoding, fingerprints[index])
+                done.append(index)
+                progress.setLabelText(f"Saved {len(done)} of {len(jobs)} files...")
+                progress.setValue(len(done))
+
+            # Wait in an event loop, so the progress shows and a close request can be held until the files are written
+            loop = QEventLoop()
+            self.SaveJob = SaveAllJob(jobs)
+            self.SaveJob.fileSaved.connect(FileSaved)
+            self.SaveJob.finished.connect(loop.quit)
+            self.SaveJob.Start()
+            loop.exec()
+            self.SaveJob.Thread.join()
+            self.SaveJob = None
+            progress.close()
+            progress.deleteLater()
+
+        for idx in self.OpenTabs:
+            self.UpdateTabTitle(idx)
+        self.SyncModified()  # In case the text was edited before the progress showed
+        self.UpdateDocumentStatus()
+
+        if errors:
+            msg = QMessageBox(self)
+            msg.setWindowTitle("Save All")
+            msg.setText(f"{len(errors)} of {len(jobs)} files couldn't be saved:\n\n" + "\n".join(errors))
+            msg.setIconPixmap(GetIconForResource("imgs", "warn.svg", QSize(64, 64)).pixmap(QSize(64, 64), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
+            msg.exec()
+            self.CloseWhenSaved = False
+        elif self.CloseWhenSaved:
+            QTimer.singleShot(0, self.close)
+        return not errors
 
     def PageSetup(self):
-        dialog = QPageSetupDialog(self.Printer, self)
+        from PyQt6.QtPrintSupport import QPageSetupDialog
+
+        dialog = QPageSetupDialog(self.GetPrinter(), self)
         dialog.exec()
         if self.PPrevWidget:
             self.PPrevWidget.updatePreview()
             self.UpdatePrintPreview()
 
     def Print(self):
+        from PyQt6.QtPrintSupport import QPrintDialog
+
+        if not self.CanPrintCurrentTab():
+            return
 
         # Open the print dialog
-        dialog = QPrintDialog(self.Printer, self)
+        dialog = QPrintDialog(self.GetPrinter(), self)
         if dialog.exec() == QPrintDialog.DialogCode.Accepted:
-            # Print the contents of the QPlainTextEdit
-            zoom = self.TextBox.zoomLevel
-            self.TextBox.SetZoomLevel(1)
-            self.TextBox.print(self.Printer)
-            self.TextBox.SetZoomLevel(zoom)
+            self.StartPrintJob(self.Printer, "Printing...")
+
+    def ExportPdf(self):
+        if not self.CanPrintCurrentTab():
+            return
+
+        tab = self.OpenTabs[self.TabBar.currentIndex()]
+        name = os.path.splitext(tab.FilePath)[0] + ".pdf" if tab.FilePath else "Untitled.pdf"
+        filename, _ = QFileDialog.getSaveFileName(self, "Export to PDF", name, "PDF files (*.pdf);;All files (*.*)")
+        if not filename:
+            return
+
+        # Same page setup and resolution as printing, so the pages match the preview
+        printer = CreatePdfPrinter(filename, os.path.basename(tab.FilePath) if tab.FilePath else "Untitled")
+        printer.setResolution(self.GetPrinter().resolution())
+        printer.setPageLayout(self.GetPrinter().pageLayout())
+        self.StartPrintJob(printer, "Exporting to PDF...")
+
+    def CanPrintCurrentTab(self):
+        tab = self.OpenTabs[self.TabBar.currentIndex()]
+        if tab.LargeFile or tab.Binary:
+            msg = QMessageBox(self)
+            msg.setWindowTitle("WriteBox")
+            msg.setText(f"Files open in the {'large file' if tab.LargeFile else 'hex'} view can't be printed.")
+            msg.setIconPixmap(GetIconForResource("imgs", "warn.svg", QSize(64, 64)).pixmap(QSize(64, 64), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
+            msg.exec()
+            return False
+        return True
+
+    def StartPrintJob(self, printer: "QPrinter", label: str):
+        """Prints a snapshot of the current text on a worker thread, leaving the editor usable."""
+        self.PrintJob = PrintJob(printer, self.TextBox.toPlainText(), self.Font)
+        self.SetPrintActionsEnabled(False)
+
+        self.PrintProgress = QProgressDialog(label, "Cancel", 0, 0, self)
+        self.PrintProgress.setWindowTitle("WriteBox")
+        self.PrintProgress.setMinimumDuration(500)
+        self.PrintProgress.canceled.connect(self.PrintJob.Cancel)
+        self.PrintJob.pagesCounted.connect(self.PrintProgress.setMaximum)
+        self.PrintJob.pagePrinted.connect(self.PrintProgress.setValue)
+        self.PrintJob.finished.connect(self.PrintJobFinished)
+        self.PrintJob.Start()
+
+    def PrintJobFinished(self, error: str):
+        self.PrintJob.Thread.join()
+        self.PrintJob = None
+        self.PrintProgress.canceled.disconnect()
+        self.PrintProgress.close()
+        self.PrintProgress.deleteLater()
+        self.PrintProgress = None
+        self.SetPrintActionsEnabled(True)
+
+        if error:
+            msg = QMessageBox(self)
+            msg.setWindowTitle("Print Error")
+            msg.setText(error)
+            msg.setIconPixmap(GetIconForResource("imgs", "warn.svg", QSize(64, 64)).pixmap(QSize(64, 64), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
+            msg.exec()
+
+    def FindReplace(self):
+        if self.OpenTabs[self.TabBar.currentIndex()].LargeFile:
+            self.LargeView.Find()
+        elif self.OpenTabs[self.TabBar.currentIndex()].Binary:
+            self.HexView.Find()
+        else:
+            FindReplaceDialog(self, self.TextBox, self.TextBox.textCursor()).exec()
+
+    def ShowFileView(self, tab: "TabInfo"):
+        """Shows the large file view, the hex view or the editor for the current tab."""
+        if tab.LargeFile:
+            if self.LargeView is None:
+                self.LargeView = LargeFileView(self)
+                self.LargeView.statusChanged.connect(self.UpdateCursorStatus)
+                self.LargeView.statusChanged.connect(self.UpdateDocumentStatus)
+                self.LargeView.hide()
+            self.LargeView.setFont(self.TextBox.font())
+            self.LargeView.setPalette(self.TextBox.palette())
+            self.LargeView.SetFile(tab.LargeFile)
+            view = self.LargeView
+        elif tab.Binary:
+            if self.HexView is None:
+                self.HexView = HexView(self)
+                self.HexView.statusChanged.connect(self.UpdateCursorStatus)
+                self.HexView.hide()
+            # Columns of hex only line up in a fixed pitch font
+            font = QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont)
+            font.setPointSizeF(self.TextBox.font().pointSizeF())
+            self.HexView.setFont(font)
+            self.HexView.setPalette(self.TextBox.palette())
+            self.HexView.SetFile(tab.Binary)
+            view = self.HexView
+        else:
+            view = self.TextBox
+
+        if view is not self.CurrentView:
+            self.Layout.replaceWidget(self.CurrentView, view, Qt.FindChildOption.FindDirectChildrenOnly)
+            self.CurrentView.hide()
+            if self.CurrentView is not self.TextBox:
+                self.CurrentView.SetFile(None)
+            view.show()
+            self.CurrentView = view
+        if view is not self.TextBox:
+            view.setFocus()
+        self.PrintPreviewAction.setEnabled(view is self.TextBox)
+
+    def EditLongLines(self):
+        """Loads a file shown in segments into the editor."""
+        index = self.TabBar.currentIndex()
+        tab = self.OpenTabs[index]
+        largeFile = tab.LargeFile
+        tab.LargeFile = None
+        tab.LongLines = False
+        tab.IsLoading = True
+        try:
+            tab.LoadFile(tab.FilePath, tab.Encoding, False)
+        except Exception as ex:
+            tab.LargeFile = largeFile
+            tab.LongLines = True
+            tab.IsLoading = False
+            msg = QMessageBox(self)
+            msg.setText(f"Couldn't open {os.path.basename(tab.FilePath)}:\n{ex}")
+            msg.setWindowTitle("Edit Anyway")
+            msg.setIconPixmap(GetIconForResource("imgs", "warn.svg", QSize(64, 64)).pixmap(QSize(64, 64), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
+            msg.exec()
+            return
+        self.TabSelected(index)
+        self.UpdateTabTitle(index)
+        largeFile.Close()  # Only once the view no longer shows it
+
+    def EditLargeFileThreshold(self):
+        settings = QSettings("WriteBox", "WriteBox")
+        value, ok = QInputDialog.getInt(self, "Large File Threshold", "Open files of this many MB or more read-only\nin the large file view:",
+                                        settings.value("LargeFileThresholdMB", 256, int), 1, 1 << 20)
+        if ok:
+            settings.setValue("LargeFileThresholdMB", value)
+
+    def ConvertEncoding(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "Convert Encoding", None, "Text files (*.txt);;All files (*.*)")
+        if not files:
+            return
+        encoding, ok = QInputDialog.getItem(self, "Convert Encoding", f"Convert {len(files)} file(s) to:",
+                                            ["utf-8", "utf-8-sig", "utf-16", "utf-16-le", "utf-16-be", "cp1252", "latin-1"], 0, True)
+        if not ok or not encoding:
+            return
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            msg = QMessageBox(self)
+            msg.setWindowTitle("Convert Encoding")
+            msg.setText(f"\"{encoding}\" isn't a known encoding.")
+            msg.setIconPixmap(GetIconForResource("imgs", "warn.svg", QSize(64, 64)).pixmap(QSize(64, 64), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
+            msg.exec()
+            return
+
+        # Files open in a tab are converted from the encoding they were opened with
+        encodings = {os.path.abspath(tab.FilePath): tab.Encoding for tab in self.OpenTabs.values() if tab.FilePath}
+        jobs = [(file, encodings.get(os.path.abspath(file)), encoding) for file in files]
+        self.ConvertEncodingAction.setEnabled(False)
+        self.ConvertProgress = QProgressDialog("Converting...", None, 0, len(jobs), self)
+        self.ConvertProgress.setWindowTitle("WriteBox")
+        self.ConvertProgress.setMinimumDuration(500)
+        self.ConvertResults = []
+        self.ConvertJob = BatchJob(ConvertFileEncoding, jobs)
+        self.ConvertJob.jobDone.connect(lambda result: (self.ConvertResults.append(result), self.ConvertProgress.setValue(len(self.ConvertResults))))
+        self.ConvertJob.finished.connect(lambda error: self.ConvertFinished(encoding, error))
+        self.ConvertJob.Start()
+
+    def ConvertFinished(self, encoding: str, error: str):
+        self.ConvertJob.Thread.join()
+        self.ConvertJob = None
+        self.ConvertProgress.close()
+        self.ConvertProgress.deleteLater()
+        self.ConvertEncodingAction.setEnabled(True)
+
+        converted = {os.path.abspath(file) for file, _, _, _, fileError in self.ConvertResults if not fileError}
+        for index, tab in self.OpenTabs.items():
+            if tab.FilePath and os.path.abspath(tab.FilePath) in converted:
+                # The text is the same, only the bytes on disk changed
+                tab.Encoding = encoding
+                tab.Journal.Reset(tab.FilePath, encoding)
+                if tab.Modified:
+                    content = self.TextBox.toPlainText() if index == self.TabBar.currentIndex() else tab.Content
+                    tab.Journal.Snapshot(tab.Journal.Header, content)
+
+        errors = [f"{os.path.basename(file)}: {fileError}" for file, _, _, _, fileError in self.ConvertResults if fileError]
+        if error:
+            errors.append(error)
+        msg = QMessageBox(self)
+        msg.setWindowTitle("Convert Encoding")
+        msg.setText(f"Converted {len(converted)} file(s) to {encoding}." + ("\n\n" + "\n\n".join(errors) if errors else ""))
+        if errors:
+            msg.setIconPixmap(GetIconForResource("imgs", "warn.svg", QSize(64, 64)).pixmap(QSize(64, 64), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
+        else:
+            msg.setIconPixmap(QPixmap(GetResourcePath("imgs", "info.svg")))
+        msg.exec()
+
+    def SetPrintActionsEnabled(self, enabled: bool):
+        # The printer is in use by the job, so its page setup can't change until it's done
+        self.PrintAction.setEnabled(enabled)
+        self.ExportPdfAction.setEnabled(enabled)
+        self.PageSetupAction.setEnabled(enabled)
+        if self.PrintPreviewActionsInitialized:
+            self.PrintPrevPortraitAction.setEnabled(enabled)
+            self.PrintPrevLandscapeAction.setEnabled(enabled)
 
     def changeEvent(self, event: QEvent):
         super().changeEvent(event)
-        if self.ActionsInitialized:
+        if self.ActionsInitialized and event.type() in (QEvent.Type.PaletteChange, QEvent.Type.ApplicationPaletteChange,
+                                                        QEvent.Type.StyleChange, QEvent.Type.DevicePixelRatioChange):
             self.AssignActionIcons()
             self.ToggleCloseButtons()
             self.NewTabButton.setIcon(GetIconForResource("imgs", "add.svg"))
+        if event.type() == QEvent.Type.ActivationChange and self.isActiveWindow():
+            # Watchers miss some changes, e.g. on network drives, so look again when the user comes back
+            for tab in self.OpenTabs.values():
+                if tab.FilePath:
+                    self.ScheduleDiskCheck(tab.FilePath)
 
     def ToggleHistoryWindow(self):
         if self.HistoryAction.isChecked():
@@ -787,6 +1826,10 @@ class MainWindow(QMainWindow):
             for idx in range(self.TabBar.count()):
                 self.TabBar.setTabButton(idx, QTabBar.ButtonPosition.RightSide, None)
 
+    def SpellCheck(self):
+        self.StartLanguageTool()
+        SpellCheckDialog(self.TextBox, self).exec()
+
     def TextBoxContextMenuRequested(self, pos):
         menu = QMenu(self)
         menu.addAction(self.UndoAction)
@@ -800,6 +1843,12 @@ class MainWindow(QMainWindow):
         menu.addAction(self.ZoomOutAction)
         menu.exec(self.mapToGlobal(pos))
 
+    def CommitPendingEdit(self):
+        """Pushes an edit still waiting on the undo timer."""
+        if self.UndoTimer.isActive():
+            self.UndoTimer.stop()
+            self.PushUndo()
+
     def PushUndo(self):
         command = EditCommand(self.TextBox, self.OpenTabs[self.TabBar.currentIndex()].Content, self.TextBox.toPlainText())
         self.OpenTabs[self.TabBar.currentIndex()].UndoStack.push(command)
@@ -812,24 +1861,40 @@ class MainWindow(QMainWindow):
 
     def Undo(self):
         self.OpenTabs[self.TabBar.currentIndex()].UndoStack.undo()
+        self.SyncModified()
+        self.ScheduleUiUpdate()
         self.UndoAction.setEnabled(self.OpenTabs[self.TabBar.currentIndex()].UndoStack.canUndo())
         self.RedoAction.setEnabled(self.OpenTabs[self.TabBar.currentIndex()].UndoStack.canRedo())
         self.OpenTabs[self.TabBar.currentIndex()].Content = self.TextBox.toPlainText()
 
     def Redo(self):
         self.OpenTabs[self.TabBar.currentIndex()].UndoStack.redo()
+        self.SyncModified()
+        self.ScheduleUiUpdate()
         self.UndoAction.setEnabled(self.OpenTabs[self.TabBar.currentIndex()].UndoStack.canUndo())
         self.RedoAction.setEnabled(self.OpenTabs[self.TabBar.currentIndex()].UndoStack.canRedo())
         self.OpenTabs[self.TabBar.currentIndex()].Content = self.TextBox.toPlainText()
 
     def TabSelected(self, index: int):
         self.TextBox.blockSignals(True)
+        self.SwappingContent = True  # The editor is only taking on the tab's text, nothing was edited
+        if self.TextBox.ZoomTimer.isActive() or self.OpenTabs[index].ZoomLevel != self.TextBox.zoomLevel:
+            # Emptied first, so the font change doesn't lay out the text of the tab being left
+            self.TextBox.setPlainText("")
+            self.TextBox.SetZoomLevel(self.OpenTabs[index].ZoomLevel)
         self.TextBox.setPlainText(self.OpenTabs[index].Content)
+        self.SwappingContent = False
         cursor = self.TextBox.textCursor()
         cursor.setPosition(self.OpenTabs[index].CursorPos, QTextCursor.MoveMode.MoveAnchor)
         self.TextBox.setTextCursor(cursor)  # Explicitly set the cursor back
         self.TextBox.blockSignals(False)
+        self.ZoomBox.setValue(round(self.TextBox.zoomLevel * 100))
         self.setWindowTitle(self.OpenTabs[index].GetTitle() + " - WriteBox")
+        self.ShowFileView(self.OpenTabs[index])
+        self.FollowAction.setChecked(self.OpenTabs[index].Follower is not None)
+        self.UpdateFileActions()
+        self.UpdateCursorStatus()
+        self.UpdateDocumentStatus()
         self.UndoAction.setEnabled(self.OpenTabs[self.TabBar.currentIndex()].UndoStack.canUndo())
         self.RedoAction.setEnabled(self.OpenTabs[self.TabBar.currentIndex()].UndoStack.canRedo())
         if self.history_window:
@@ -854,6 +1919,17 @@ class MainWindow(QMainWindow):
         self.CutAction.setEnabled(canCopy)
         self.PasteAction.setEnabled(self.TextBox.canPaste())
 
+    def ZoomLevelChanged(self, zoomLevel: float):
+        self.ZoomBox.setValue(round(zoomLevel * 100))
+        tab = self.OpenTabs.get(self.TabBar.currentIndex())
+        if tab:
+            tab.ZoomLevel = zoomLevel
+
+    def ZoomBoxChanged(self, value: int):
+        # Showing the editor's zoom in the box mustn't round it
+        if value != round(self.TextBox.zoomLevel * 100):
+            self.TextBox.SetZoomLevel(value / 100, True)
+
     def EditFont(self):
         dlg = QFontDialog(self)
         dlg.setCurrentFont(self.Font)
@@ -878,25 +1954,392 @@ class MainWindow(QMainWindow):
             self.TextBox.setPalette(new_palette)
 
     def TextChanged(self):
+        if self.AppendingFollowedText:
+            self.ScheduleUiUpdate()
+            return
 
-        if self.UndoTimer.isActive():
-            self.UndoTimer.stop()
+        tab = self.OpenTabs[self.TabBar.currentIndex()]
 
-        # Start the timer
+        # (Re)start the timer
         self.UndoTimer.start(500)
 
-        if not self.OpenTabs[self.TabBar.currentIndex()].IsLoading:
-            self.OpenTabs[self.TabBar.currentIndex()].Modified = True
+        # The title only changes when the tab first becomes modified
+        if not tab.IsLoading and not tab.Modified:
+            tab.Modified = True
+            self.UpdateTabTitle(self.TabBar.currentIndex())
 
-        self.OpenTabs[self.TabBar.currentIndex()].CursorPos = self.TextBox.textCursor().position()
-        self.TabBar.setTabText(self.TabBar.currentIndex(), self.OpenTabs[self.TabBar.currentIndex()].GetTitle())
-        self.setWindowTitle(self.OpenTabs[self.TabBar.currentIndex()].GetTitle() + " - WriteBox")
-        self.UndoAction.setEnabled(self.OpenTabs[self.TabBar.currentIndex()].UndoStack.canUndo())
-        self.RedoAction.setEnabled(self.OpenTabs[self.TabBar.currentIndex()].UndoStack.canRedo())
-        self.PasteAction.setEnabled(self.TextBox.canPaste())
+        self.ScheduleUiUpdate()
 
     def TextCursorPositionChanged(self):
         self.OpenTabs[self.TabBar.currentIndex()].CursorPos = self.TextBox.textCursor().position()
+        self.ScheduleUiUpdate()
+
+    def ScheduleUiUpdate(self):
+        # Holding a key down can edit faster than the screen refreshes, so status updates wait for the next frame
+        if not self.UiUpdateTimer.isActive():
+            self.UiUpdateTimer.start()
+
+    def FlushUiUpdates(self):
+        tab = self.OpenTabs.get(self.TabBar.currentIndex())
+        if tab is None:
+            return
+        if tab.Modified:
+            self.SyncModified()  # Editing back to the saved text, e.g. by undoing, makes the tab unmodified again
+        self.UndoAction.setEnabled(tab.UndoStack.canUndo())
+        self.RedoAction.setEnabled(tab.UndoStack.canRedo())
+        self.UpdateCursorStatus()
+        self.UpdateDocumentStatus()
+
+    def SyncModified(self):
+        """Marks the current tab modified unless its text matches its fingerprint."""
+        tab = self.OpenTabs[self.TabBar.currentIndex()]
+        if tab.LargeFile or tab.Binary or tab.IsLoading:
+            return
+        doc = self.TextBox.document()
+        # Qt keeps the length, so the block hashes are only compared when it matches
+        modified = doc.characterCount() - 1 != tab.Fingerprint[0] or self.GetStats(tab).Fingerprint(doc) != tab.Fingerprint
+        if modified != tab.Modified:
+            tab.Modified = modified
+            if not modified:
+                if tab.FilePath:
+                    tab.Journal.Reset(tab.FilePath, tab.Encoding)
+                else:
+                    tab.Journal.Discard()
+            self.UpdateTabTitle(self.TabBar.currentIndex())
+
+    def UpdateTabTitle(self, index: int):
+        self.TabBar.setTabText(index, self.OpenTabs[index].GetTitle())
+        if index == self.TabBar.currentIndex():
+            self.setWindowTitle(self.OpenTabs[index].GetTitle() + " - WriteBox")
+
+    def UpdateCursorStatus(self):
+        # Block numbers and positions come from the document's block map, so this doesn't scan the text
+        tab = self.OpenTabs.get(self.TabBar.currentIndex())
+        if tab and tab.LargeFile:
+            self.CursorLabel.setText(f"Ln {tab.LargeFile.LineNumber(tab.LargeFile.CurrentLine) + 1:,}")
+        elif tab and tab.Binary:
+            self.CursorLabel.setText(f"Offset {tab.Binary.Offset:,} (0x{tab.Binary.Offset:X})")
+        else:
+            cursor = self.TextBox.textCursor()
+            self.CursorLabel.setText(f"Ln {cursor.blockNumber() + 1:,}, Col {cursor.positionInBlock() + 1:,}")
+
+    def GetStats(self, tab: "TabInfo"):
+        """Returns the tab's DocumentStats, counting the editor's text once if they don't exist yet."""
+        if tab.Stats is None or len(tab.Stats.WordCounts) != self.TextBox.document().blockCount():
+            tab.Stats = DocumentStats()
+            tab.Stats.SetDocument(self.TextBox.document(), self.TextBox.toPlainText())
+        return tab.Stats
+
+    def UpdateDocumentStatus(self):
+        tab = self.OpenTabs.get(self.TabBar.currentIndex())
+        if tab is None:
+            return
+        if tab.LargeFile:
+            self.StatsLabel.setText(f"{tab.LargeFile.NumberedLines():,} lines" + ("" if tab.LargeFile.Indexed else " so far"))
+        elif tab.Binary:
+            self.StatsLabel.setText(f"{len(tab.Binary.Map):,} bytes")
+        else:
+            doc = self.TextBox.document()
+            # Characters and lines are kept by Qt, words per block by DocumentStats
+            self.StatsLabel.setText(f"{doc.characterCount() - 1:,} characters, {self.GetStats(tab).Words:,} words, {doc.blockCount():,} lines")
+        self.EncodingLabel.setText("BINARY" if tab.Binary else (tab.Encoding or "utf-8").upper())
+        self.FileSizeLabel.setText(FormatFileSize(tab.FileSize) if tab.FilePath else "Not saved")
+
+    def SaveCurrentTab(self):
+        self.OpenTabs[self.TabBar.currentIndex()].Save(*self.EditorText())
+        self.UpdateTabTitle(self.TabBar.currentIndex())
+        self.UpdateFileActions()
+        self.UpdateDocumentStatus()
+
+    def SaveCurrentTabAs(self):
+        self.OpenTabs[self.TabBar.currentIndex()].SaveAs(*self.EditorText())
+        self.UpdateTabTitle(self.TabBar.currentIndex())
+        self.UpdateFileActions()
+        self.UpdateDocumentStatus()
+
+    def EditorText(self):
+        """Returns the editor's text as chunks, with its fingerprint."""
+        tab = self.OpenTabs[self.TabBar.currentIndex()]
+        if tab.LargeFile or tab.Binary or tab.IsLoading:
+            self.CommitPendingEdit()
+            return None, None  # Saved from Content
+        doc = self.TextBox.document()
+        return DocumentChunks(doc), self.GetStats(tab).Fingerprint(doc)
+
+    def UpdateFileActions(self):
+        """Enables the actions that need the current tab's file."""
+        tab = self.OpenTabs[self.TabBar.currentIndex()]
+        hasFile = bool(tab.FilePath) and tab.LargeFile is None and tab.Binary is None
+        self.FollowAction.setEnabled(hasFile and tab.Compression is None)
+        self.CompareAction.setEnabled(hasFile)
+        self.EditAnywayAction.setEnabled(tab.LongLines)
+        self.SyncFileWatcher()
+
+    def CompareWithSaved(self):
+        tab = self.OpenTabs[self.TabBar.currentIndex()]
+        if self.CompareDialog:
+            self.CompareDialog.close()
+        self.CompareDialog = DiffDialog(self, tab.FilePath, tab.Encoding, self.TextBox.toPlainText(), self.TextBox.font())
+        self.CompareDialog.destroyed.connect(lambda: setattr(self, "CompareDialog", None))
+        self.CompareDialog.show()
+
+    def SyncFileWatcher(self):
+        """Watches the files of the open tabs, except ones that are read only or followed."""
+        paths = {os.path.abspath(tab.FilePath) for tab in self.OpenTabs.values()
+                 if tab.FilePath and tab.LargeFile is None and tab.Binary is None and tab.Follower is None and os.path.exists(tab.FilePath)}
+        watched = set(self.FileWatcher.files())
+        if watched - paths:
+            self.FileWatcher.removePaths(list(watched - paths))
+        if paths - watched:
+            self.FileWatcher.addPaths(list(paths - watched))
+
+    def ScheduleDiskCheck(self, path: str):
+        self.DiskCheckPaths.add(os.path.abspath(path))
+        if not self.DiskCheckTimer.isActive():
+            self.DiskCheckTimer.start()
+
+    def CheckDiskChanges(self):
+        if self.CheckingDisk:
+            return  # Still asking about an earlier change, the paths are checked after that
+        self.CheckingDisk = True
+        try:
+            while self.DiskCheckPaths:
+                path = self.DiskCheckPaths.pop()
+                for tab in list(self.OpenTabs.values()):
+                    if tab.FilePath and os.path.abspath(tab.FilePath) == path and tab in self.OpenTabs.values():
+                        self.CheckDiskChange(tab)
+        finally:
+            self.CheckingDisk = False
+        # Editors that save by replacing the file leave the watcher without the path
+        self.SyncFileWatcher()
+
+    def CheckDiskChange(self, tab: "TabInfo"):
+        if tab.LargeFile or tab.Binary or tab.Follower:
+            return
+        try:
+            stat = os.stat(tab.FilePath)
+        except OSError:
+            return  # Deleted, or about to be replaced
+        if (stat.st_size, stat.st_mtime_ns) == tab.DiskStat:
+            return
+
+        try:
+            text, _ = ReadTextFile(tab.FilePath, tab.Encoding)
+        except (OSError, UnicodeDecodeError, LookupError):
+            return
+        fingerprint = TextFingerprint(text)
+        tab.DiskStat = (stat.st_size, stat.st_mtime_ns)
+        if fingerprint == tab.Fingerprint:
+            return  # Only touched
+        tab.Fingerprint = fingerprint
+
+        index = next(i for i, t in self.OpenTabs.items() if t is tab)
+        if index == self.TabBar.currentIndex():
+            self.CommitPendingEdit()
+        if text == tab.Content:
+            # Another program saved the same text, e.g. the same edit
+            tab.Modified = False
+            tab.Journal.Reset(tab.FilePath, tab.Encoding)
+            self.UpdateTabTitle(index)
+            return
+
+        msg = QMessageBox(self)
+        msg.setText(f"{os.path.basename(tab.FilePath)} was changed by another program.\nDo you want to reload it?"
+                    + ("\nReloading replaces your unsaved changes, you can still undo it." if tab.Modified else ""))
+        msg.setWindowTitle("File Changed")
+        msg.setIconPixmap(GetIconForResource("imgs", "warn.svg", QSize(64, 64)).pixmap(QSize(64, 64), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
+        reloadButton = msg.addButton("Reload", QMessageBox.ButtonRole.AcceptRole)
+        msg.addButton("Ignore", QMessageBox.ButtonRole.RejectRole)
+        msg.exec()
+        if tab not in self.OpenTabs.values():
+            return
+        if msg.clickedButton() is reloadButton:
+            self.ReloadTab(tab, text)
+        elif not tab.Modified:
+            # The text no longer matches the file, so it needs saving like an edit
+            tab.Modified = True
+            self.UpdateTabTitle(next(i for i, t in self.OpenTabs.items() if t is tab))
+
+    def ReloadTab(self, tab: "TabInfo", text: str):
+        """Brings a tab up to date with its file, replacing only the lines that differ."""
+        index = next(i for i, t in self.OpenTabs.items() if t is tab)
+        if index == self.TabBar.currentIndex():
+            self.CommitPendingEdit()
+            # Cursors move along with edits, so this one keeps track of the first line on screen
+            top = QTextCursor(self.TextBox.firstVisibleBlock())
+            topLine = top.blockNumber()
+            cursor = QTextCursor(self.TextBox.document())
+            tab.IsLoading = True
+            cursor.beginEditBlock()
+            for start, end, replacement in reversed(ChangedLineRanges(self.TextBox.toPlainText(), text)):
+                cursor.setPosition(start)
+                cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+                cursor.insertText(replacement)
+            cursor.endEditBlock()
+            tab.IsLoading = False
+            scrollBar = self.TextBox.verticalScrollBar()
+            scrollBar.setValue(scrollBar.value() + top.blockNumber() - topLine)
+            # The reload is one step in the history
+            self.UndoTimer.stop()
+            self.PushUndo()
+        else:
+            tab.UndoStack.push(EditCommand(self.TextBox, tab.Content, text))
+            tab.Content = text
+            tab.CursorPos = min(tab.CursorPos, Utf16Length(text))
+            tab.PrintLayouts.clear()
+            tab.Stats = None
+
+        tab.Modified = False
+        tab.FileSize = tab.DiskStat[0]
+        tab.Journal.Reset(tab.FilePath, tab.Encoding)
+        self.UpdateTabTitle(index)
+        self.ScheduleUiUpdate()
+
+    def ToggleFollow(self, checked: bool):
+        tab = self.OpenTabs[self.TabBar.currentIndex()]
+        if tab.Follower:
+            tab.Follower.Stop()
+            tab.Follower = None
+        if checked:
+            # Start from the end of what was loaded or saved, anything written since is read right away
+            tab.Follower = FileFollower(tab.FilePath, tab.Encoding, tab.FileSize, self)
+            tab.Follower.appended.connect(lambda text: self.AppendFollowedText(tab, text))
+            tab.Follower.reset.connect(lambda: self.ResetFollowedText(tab))
+            self.TextBox.moveCursor(QTextCursor.MoveOperation.End)
+            tab.Follower.Read()
+        self.SyncFileWatcher()
+
+    def AppendFollowedText(self, tab: "TabInfo", text: str):
+        if self.OpenTabs.get(self.TabBar.currentIndex()) is tab:
+            self.CommitPendingEdit()  # Keep a pending edit apart from the appended text
+
+            scrollBar = self.TextBox.verticalScrollBar()
+            atEnd = scrollBar.value() == scrollBar.maximum()
+            doc = self.TextBox.document()
+            position = doc.characterCount() - 1
+            cursor = QTextCursor(doc)
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            # Inserting at the end only lays out the new blocks; the document's own undo history would keep a copy of everything
+            doc.setUndoRedoEnabled(False)
+            self.AppendingFollowedText = True
+            cursor.insertText(text)
+            self.AppendingFollowedText = False
+            doc.setUndoRedoEnabled(True)
+            if atEnd:
+                scrollBar.setValue(scrollBar.maximum())
+        else:
+            position = Utf16Length(tab.Content) if tab.Modified else 0
+            tab.PrintLayouts.clear()
+            tab.Stats = None
+
+        tab.Content += text
+        tab.FileSize = tab.Follower.Offset
+        if tab.Modified:
+            tab.Journal.Grow(tab.FilePath, position, text)
+        else:
+            tab.Journal.Reset(tab.FilePath, tab.Encoding)  # The text still matches the file on disk
+
+    def ResetFollowedText(self, tab: "TabInfo"):
+        """Empties a followed tab after its file was truncated or rotated."""
+        tab.Content = ""
+        tab.Modified = False
+        tab.UndoStack.clear()
+        tab.PrintLayouts.clear()
+        tab.Stats = None
+        index = next(i for i, t in self.OpenTabs.items() if t is tab)
+        if index == self.TabBar.currentIndex():
+            self.AppendingFollowedText = True
+            self.TextBox.setPlainText("")
+            self.AppendingFollowedText = False
+        self.UpdateTabTitle(index)
+
+    def GoTo(self):
+        if self.OpenTabs[self.TabBar.currentIndex()].LargeFile:
+            self.LargeView.GoTo()
+            return
+        if self.OpenTabs[self.TabBar.currentIndex()].Binary:
+            self.HexView.GoTo()
+            return
+
+        doc = self.TextBox.document()
+        cursor = self.TextBox.textCursor()
+        dlg = GoToDialog(self, doc.blockCount(), doc.characterCount() - 1, cursor.blockNumber(), "Character offset")
+        if dlg.exec() == QDialog.DialogCode.Accepted:
+            if dlg.ByLine:
+                cursor.setPosition(doc.findBlockByNumber(dlg.Value).position())
+            else:
+                cursor.setPosition(dlg.Value)
+            self.TextBox.setTextCursor(cursor)
+            self.TextBox.centerCursor()
+
+    def DocumentContentsChange(self, position: int, charsRemoved: int, charsAdded: int):
+        if self.SwappingContent:
+            return
+
+        tab = self.OpenTabs[self.TabBar.currentIndex()]
+        for layout in tab.PrintLayouts.values():
+            layout.Update(self.TextBox.document(), position, charsAdded)
+        if tab.Stats:
+            tab.Stats.Update(self.TextBox.document(), position, charsAdded)
+        if self.AppendingFollowedText:
+            return  # AppendFollowedText tells the journal
+
+        added = ""
+        if charsAdded:
+            doc = self.TextBox.document()
+            cursor = QTextCursor(doc)
+            cursor.setPosition(position)
+            # Qt counts the document's final paragraph separator in whole-document changes
+            cursor.setPosition(min(position + charsAdded, doc.characterCount() - 1), QTextCursor.MoveMode.KeepAnchor)
+            added = cursor.selectedText().replace("\u2029", "\n")
+
+        tab.Journal.Record(position, charsRemoved, added)
+
+    def FlushJournals(self):
+        for tab in self.OpenTabs.values():
+            tab.Journal.Flush()
+
+    def RecoverJournals(self):
+        sessions = autosave_session.FindOrphanedSessions()
+        recovered = []
+        for directory, lock in sessions:
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(".journal"):
+                    try:
+                        recovered.append(ReplayJournal(os.path.join(directory, name)))
+                    except (OSError, ValueError, UnicodeError):
+                        pass  # The saved file changed since the crash, so the deltas no longer apply
+
+        if recovered:
+            msg = QMessageBox(self)
+            msg.setText(f"WriteBox didn't close properly last time.\nDo you want to recover {len(recovered)} unsaved document(s)?")
+            msg.setWindowTitle("Recover Unsaved Work")
+            msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            msg.setIconPixmap(GetIconForResource("imgs", "help.svg", QSize(64, 64)).pixmap(QSize(64, 64), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
+            if msg.exec() == QMessageBox.StandardButton.Yes:
+                for header, text in recovered:
+                    tab = TabInfo()
+                    tab.Content = text
+                    tab.FilePath = header["file"]
+                    tab.Encoding = header["encoding"]
+                    tab.Modified = True
+                    if header["file"]:
+                        tab.DiskStat = (header["size"], header["mtime"])  # The file the journal was started from
+                        tab.Compression = DetectCompression(header["file"])
+                        if tab.GetDiskStat() == tab.DiskStat:
+                            try:
+                                tab.Fingerprint = TextFingerprint(ReadTextFile(header["file"], header["encoding"])[0])
+                            except (OSError, UnicodeDecodeError, LookupError):
+                                pass
+                    tab.Journal.Snapshot(header, text)
+                    idx = self.TabBar.addTab(tab.GetTitle())
+                    self.OpenTabs[idx] = tab
+                self.TabBar.setCurrentIndex(idx)
+                self.ToggleCloseButtons()
+
+        for directory, lock in sessions:
+            lock.unlock()
+            autosave_session.Writer.Remove(directory)
 
     def Open(self):
         dlg = QFileDialog(self, "Open File", None, "Text files (*.txt);;All files (*.*)")
@@ -937,14 +2380,40 @@ class CustomTabBar(QTabBar):
             if i != index:
                 self.removeTab(i)
 
+class BlockLinks(QTextBlockUserData):
+    """The links found in a block, kept on it until its text changes."""
+
+    def __init__(self, revision: int, links: list):
+        super().__init__()
+        self.Revision = revision
+        self.Links = links  # (start, end, url), positions within the block
+
 class CustomPlainTextEdit(QPlainTextEdit):
 
     zoomLevelChanged = pyqtSignal(float)
+    # Words that start with a scheme and //, the only ones IsLink can accept
+    LinkCandidate = re.compile(r"(?<!\S)[A-Za-z][A-Za-z0-9+.-]*://\S+")
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.defaultFontSize = self.font().pointSizeF()  # Get default font size
         self.zoomLevel = 1.0  # Default zoom level (100%)
+        self.HoveredLink = None  # (start, end) in the document of the link under the mouse
+        self.viewport().setMouseTracking(True)
+        self.textChanged.connect(self.ClearHoveredLink)
+
+        # A font change lays out the whole document again, so zooming step by step only scales a picture of the text
+        # until the steps stop
+        self.ZoomTimer = QTimer(self)
+        self.ZoomTimer.setSingleShot(True)
+        self.ZoomTimer.setInterval(300)
+        self.ZoomTimer.timeout.connect(self.ApplyZoom)
+        self.ZoomPreview = QLabel(self.viewport())
+        self.ZoomPreview.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
+        self.ZoomPreview.setBackgroundRole(QPalette.ColorRole.Base)
+        self.ZoomPreview.setAutoFillBackground(True)
+        self.ZoomPreview.hide()
+        self.ZoomSnapshot = None  # The viewport as it looked at the applied zoom
 
     def wheelEvent(self, event: QWheelEvent):
         if event.modifiers() == Qt.KeyboardModifier.ControlModifier:
@@ -954,6 +2423,7 @@ class CustomPlainTextEdit(QPlainTextEdit):
             else:
                 self.ZoomOut()
         else:
+            self.FinishZoom()
             super().wheelEvent(event)
 
     def mouseReleaseEvent(self, event: QMouseEvent):
@@ -961,50 +2431,124 @@ class CustomPlainTextEdit(QPlainTextEdit):
         if event.button() == Qt.MouseButton.MiddleButton:
             self.SetZoomLevel(1)
 
+    def keyPressEvent(self, event):
+        self.FinishZoom()
+        super().keyPressEvent(event)
+
+    def resizeEvent(self, event):
+        self.FinishZoom()
+        super().resizeEvent(event)
 
     def ZoomIn(self):
-        self.SetZoomLevel(self.zoomLevel + 0.1)
+        self.SetZoomLevel(self.zoomLevel + 0.1, True)
 
     def ZoomOut(self):
-        self.SetZoomLevel(self.zoomLevel - 0.1)
+        self.SetZoomLevel(self.zoomLevel - 0.1, True)
 
-    def SetZoomLevel(self, level: float):
+    def SetZoomLevel(self, level: float, deferred: bool = False):
         """Sets the zoom level with limits between 0.08 (8%) and 4.0 (400%)."""
         self.zoomLevel = max(0.08, min(4.0, level))  # Clamp between 0.08 and 4.0
-        newFontSize = self.defaultFontSize * self.zoomLevel
-        font = self.font()
-        font.setPointSizeF(newFontSize)
-        self.setFont(font)
+        if deferred:
+            if not self.ZoomPreview.isVisible():
+                self.ZoomSnapshot = self.viewport().grab()
+                self.ZoomPreview.setGeometry(self.viewport().rect())
+                self.ZoomPreview.show()
+            scale = self.defaultFontSize * self.zoomLevel / self.font().pointSizeF()
+            self.ZoomPreview.setPixmap(self.ZoomSnapshot.scaled(self.ZoomSnapshot.size() * scale))
+            self.ZoomTimer.start()
+        else:
+            self.ApplyZoom()
         self.zoomLevelChanged.emit(self.zoomLevel)
 
-    def mousePressEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton and event.modifiers() == Qt.KeyboardModifier.ShiftModifier:
-            cursor = self.cursorForPosition(event.pos())
-            cursor_position = cursor.position()
-
-            text = self.toPlainText()
-
-            # Find the start of the URL
-            start = cursor_position
-            while start > 0 and not text[start - 1].isspace():
-                start -= 1
-
-            # Find the end of the URL
-            end = cursor_position
-            while end < len(text) and not text[end].isspace():
-                end += 1
+    def ApplyZoom(self):
+        """Changes the font to the zoom level, and drops the preview of it."""
+        self.ZoomTimer.stop()
+        self.ZoomPreview.hide()
+        self.ZoomSnapshot = None
+        newFontSize = self.defaultFontSize * self.zoomLevel
+        if self.font().pointSizeF() != newFontSize:
+            font = self.font()
+            font.setPointSizeF(newFontSize)
+            self.setFont(font)
 
-            # Extract the link
-            link = text[start:end]
+    def FinishZoom(self):
+        """Applies a zoom still being previewed, before the text is used."""
+        if self.ZoomTimer.isActive():
+            self.ApplyZoom()
 
-            # Validate it using regex
-            if self.IsLink(link):
-                webbrowser.open(link)
+    def mousePressEvent(self, event):
+        self.FinishZoom()
+        if event.button() == Qt.MouseButton.LeftButton and event.modifiers() == Qt.KeyboardModifier.ShiftModifier:
+            link = self.LinkAt(event.pos())
+            if link:
+                import webbrowser
+                webbrowser.open(link[2])
 
         super().mousePressEvent(event)
 
+    def mouseMoveEvent(self, event):
+        super().mouseMoveEvent(event)
+        link = self.LinkAt(event.pos())
+        self.SetHoveredLink(link[:2] if link else None)
+
+    def leaveEvent(self, event):
+        super().leaveEvent(event)
+        self.ClearHoveredLink()
+
+    def scrollContentsBy(self, dx: int, dy: int):
+        super().scrollContentsBy(dx, dy)
+        self.ClearHoveredLink()  # The text under the mouse moved
+
+    def BlockLinks(self, block):
+        """Returns the links in a block, finding them only the first time after the block changes."""
+        data = block.userData()
+        if not isinstance(data, BlockLinks) or data.Revision != block.revision():
+            text = block.text()
+            links = [(m.start(), m.end(), m.group()) for m in self.LinkCandidate.finditer(text) if self.IsLink(m.group())]
+            if AstralCharacters.search(text):
+                # Columns in the block count UTF-16 units
+                links = [(Utf16Length(text[:start]), Utf16Length(text[:end]), url) for start, end, url in links]
+            data = BlockLinks(block.revision(), links)
+            block.setUserData(data)
+        return data.Links
+
+    def LinkAt(self, pos):
+        """Returns (start, end, url) of the link at a point in the viewport, or None."""
+        cursor = self.cursorForPosition(pos)
+        # Past the end of a line the cursor lands on its last character, but the mouse isn't over it
+        width = self.fontMetrics().averageCharWidth()
+        if not self.cursorRect(cursor).adjusted(-width, 0, width, 0).contains(pos):
+            return None
+        block = cursor.block()
+        column = cursor.positionInBlock()
+        for start, end, url in self.BlockLinks(block):
+            if start <= column <= end:
+                return block.position() + start, block.position() + end, url
+        return None
+
+    def SetHoveredLink(self, link):
+        if link == self.HoveredLink:
+            return
+        self.HoveredLink = link
+        selections = []
+        if link:
+            selection = QTextEdit.ExtraSelection()
+            selection.cursor = QTextCursor(self.document())
+            selection.cursor.setPosition(link[0])
+            selection.cursor.setPosition(link[1], QTextCursor.MoveMode.KeepAnchor)
+            selection.format = QTextCharFormat()
+            selection.format.setFontUnderline(True)
+            selection.format.setForeground(self.palette().color(QPalette.ColorRole.Link))
+            selections.append(selection)
+        self.setExtraSelections(selections)
+
+    def ClearHoveredLink(self):
+        if self.HoveredLink:
+            self.SetHoveredLink(None)
+
     def IsLink(self, text):
         # Check if the text is a valid link
+        import urllib.parse
         parsed = urllib.parse.urlparse(text)
         return all([parsed.scheme, parsed.netloc])  # Check for scheme and netloc
 
@@ -1016,6 +2560,7 @@ class EditCommand(QUndoCommand):
         self.old_text = old_text
         self.new_text = new_text
         self.cursor_position = self.editor.textCursor().position()  # Save cursor position
+        self.pushed = False
 
     def get_added_text(self, old_text: str, new_text: str) -> str:
         """Determine the characters that were added."""
@@ -1033,6 +2578,11 @@ class EditCommand(QUndoCommand):
         self.editor.blockSignals(False)
 
     def redo(self):
+        # QUndoStack.push() calls redo(), but the editor already holds the new text then
+        if not self.pushed:
+            self.pushed = True
+            return
+
         self.editor.blockSignals(True)
         self.editor.setPlainText(self.new_text)  # Restore new text
         cur = self.editor.textCursor()
@@ -1040,6 +2590,70 @@ class EditCommand(QUndoCommand):
         self.editor.setTextCursor(cur)
         self.editor.blockSignals(False)
 
+def TextChunks(text: str, size: int = 1 << 18):
+    """Yields a text in slices, so it can be encoded a slice at a time."""
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+def DocumentChunks(doc: QTextDocument, size: int = 1 << 18):
+    """Yields the same text as doc.toPlainText() in chunks."""
+    cursor = QTextCursor(doc)
+    end = doc.characterCount() - 1
+    position = 0
+    while position < end:
+        stop = min(position + size, end)
+        if stop < end and "\ud800" <= doc.characterAt(stop - 1) <= "\udbff":
+            stop -= 1  # Don't split a surrogate pair
+        cursor.setPosition(position)
+        cursor.setPosition(stop, QTextCursor.MoveMode.KeepAnchor)
+        # Map block separators, line separators and non-breaking spaces as toPlainText does
+        chunk = cursor.selectedText().replace("\u2029", "\n")
+        if "\u2028" in chunk:
+            chunk = chunk.replace("\u2028", "\n")
+        if "\xa0" in chunk:
+            chunk = chunk.replace("\xa0", " ")
+        yield chunk
+        position = stop
+
+def WriteTextFile(file: str, chunks, encoding: str = None, compression: str = None):
+    """Streams chunks of text into the file through a temporary file, returning the encoding."""
+    if not os.path.exists(file):
+        encoding = "utf-8"
+    elif encoding is None:
+        encoding = DetectFileEncoding(file)
+    encoder = codecs.getincrementalencoder(encoding)()
+
+    fd, temp = tempfile.mkstemp(prefix=os.path.basename(file) + ".", suffix=".tmp", dir=os.path.dirname(os.path.abspath(file)))
+    try:
+        with open(fd, 'wb', buffering=1 << 16) as raw:
+            f = OpenCompressed(raw, compression, 'wb') if compression else raw
+            for chunk in chunks:
+                if os.linesep != "\n":
+                    chunk = chunk.replace("\n", os.linesep)  # As text mode writes it
+                f.write(encoder.encode(chunk))
+            f.write(encoder.encode("", final=True))
+            if compression:
+                f.close()  # Ends the compressed stream, raw stays open
+            raw.flush()
+            os.fsync(raw.fileno())
+        MoveIntoPlace(temp, file)
+    except BaseException:
+        os.remove(temp)
+        raise
+    return encoding
+
+def ReadTextFile(file: str, encoding: str = None):
+    """Reads a text file, decompressing it if needed, returning (text, encoding)."""
+    with OpenFileStream(file) as f:
+        return DecodeText(f.read(), encoding)
+
+def DecodeText(data: bytes, encoding: str = None):
+    """Decodes a file's bytes as text mode would, returning (text, encoding)."""
+    if encoding is None:
+        import chardet
+        encoding = chardet.detect(data)['encoding']
+    with io.TextIOWrapper(io.BytesIO(data), encoding=encoding) as f:
+        return f.read(), encoding
+
 class TabInfo:
     def __init__(self, file: str = None, encoding: str = None):
         self.Content = ""
@@ -1049,49 +2663,121 @@ class TabInfo:
         self.IsLoading = False
         self.Encoding = None
         self.UndoStack = QUndoStack()
+        self.Journal = autosave_session.CreateJournal()
+        self.PrintLayouts = {}
+        self.LargeFile = None  # LargeFileIndex when the file is shown read-only in LargeFileView
+        self.LongLines = False  # Whether that's only for its long lines, so it can still be edited
+        self.Compression = None  # Format the file is compressed in, see CompressionMagic
+        self.Binary = None  # BinaryFile when the file is shown read-only in HexView
+        self.Stats = None  # DocumentStats, created once the tab is shown
+        self.ZoomLevel = 1.0  # The editor's zoom while the tab is shown
+        self.FileSize = 0
+        self.Follower = None  # FileFollower while the tab follows its growing file
+        self.DiskStat = None  # Size and modification time of the file when it was last loaded or saved
+        self.Fingerprint = TextFingerprint("")  # TextFingerprint of the text then, or of a new tab's empty text
 
         if file:
             self.IsLoading = True
             self.LoadFile(file, encoding)
 
-    def LoadFile(self, file: str, encoding: str):
-        if encoding is None:
-            with open(file, 'rb') as f:  # Open in binary mode to read the raw bytes
-                raw_data = f.read()
-                result = chardet.detect(raw_data)  # Detect encoding
-                e = result['encoding']  # Get the detected encoding
+    def LoadFile(self, file: str, encoding: str, segmentLongLines: bool = True):
+        threshold = GetLargeFileThreshold()
+        self.Compression = DetectCompression(file)
+        if self.Compression:
+            # Only decompressing tells how big the text is. Text compresses to well under an eighth, so bigger archives
+            # go straight to the large file view, which opens while the rest is decompressed.
+            stream = OpenCompressed(file, self.Compression)
+            try:
+                size = threshold if os.path.getsize(file) < threshold >> 3 else 1 << 16
+                head = ReadFully(stream, size)
+                if encoding is None and LooksBinary(head[:SniffSize]):
+                    # Shown as the compressed bytes on disk, it isn't text either way
+                    stream.close()
+                    self.Binary = BinaryFile(file)
+                    e = None
+                elif len(head) == size:
+                    self.LargeFile = LargeFileIndex(file, encoding, stream, head)
+                    e = self.LargeFile.Encoding
+                else:
+                    stream.close()
+                    self.Content, e = DecodeText(head, encoding)
+            except BaseException:
+                stream.close()
+                raise
+        elif encoding is None and IsBinaryFile(file):
+            self.Binary = BinaryFile(file)
+            e = None
+        elif os.path.getsize(file) >= threshold:
+            self.LargeFile = LargeFileIndex(file, encoding)
+            e = self.LargeFile.Encoding
         else:
-            e = encoding
-
-        with open(file, 'r', encoding=e) as f:  # Open with detected encoding
-            self.Content = f.read()
+            self.Content, e = ReadTextFile(file, encoding)
+        if segmentLongLines and HasLongLines(self.Content):
+            # Shown read-only in segments, since even moving the cursor relays out the whole line in the editor
+            self.LargeFile = LargeFileIndex(file, e, io.BytesIO(), head) if self.Compression else LargeFileIndex(file, e)
+            self.LongLines = True
+            self.Content = ""
         self.FilePath = file
         self.IsLoading = False
         self.Encoding = e
+        stat = os.stat(file)
+        self.FileSize = stat.st_size
+        self.DiskStat = (stat.st_size, stat.st_mtime_ns)
+        self.Fingerprint = None if self.LargeFile or self.Binary else TextFingerprint(self.Content)
+        self.Journal.Reset(file, e)
+
+    def GetDiskStat(self):
+        try:
+            stat = os.stat(self.FilePath)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
 
     def GetTitle(self):
         title = os.path.basename(self.FilePath) if self.FilePath else "Untitled"
+        if self.LargeFile or self.Binary:
+            title += " (Read Only)"
         return title + ("*" if self.Modified else "")
     
-    def Save(self):
+    def Save(self, chunks=None, fingerprint: tuple = None):
+        """Saves Content, or the text given as chunks with its fingerprint."""
+        if self.LargeFile or self.Binary:
+            return  # Read only, and Content doesn't hold the text
         if not self.FilePath:
-            self.SaveAs()
+            self.SaveAs(chunks, fingerprint)
             return
-        
-        if not os.path.exists(self.FilePath):
-            e = "utf-16"
-        elif self.Encoding is None:
-            with open(self.FilePath, 'rb') as f:  # Open in binary mode to read the raw bytes
-                raw_data = f.read()
-                result = chardet.detect(raw_data)  # Detect encoding
-                e = result['encoding']  # Get the detected encoding
-        else:
-            e = self.Encoding
 
-        with open(self.FilePath, 'w', encoding=e) as f:
-            f.write(self.Content)
+        pending = self.SaveJob(chunks, fingerprint)
+        if pending:
+            job, fingerprint = pending
+            self.Saved(WriteTextFile(*job), fingerprint)
+
+    def SaveJob(self, chunks=None, fingerprint: tuple = None):
+        """Returns the WriteTextFile arguments and fingerprint, or None if nothing needs writing."""
+        if self.Follower and not self.Modified:
+            return None  # Only mirrors its file
+        if chunks is None:
+            chunks = TextChunks(self.Content)
+            fingerprint = TextFingerprint(self.Content)
+        # Skip the write when the text is what was loaded or last saved and the file wasn't changed since
+        if fingerprint == self.Fingerprint and self.DiskStat == self.GetDiskStat():
+            self.Modified = False
+            return None
+        return (self.FilePath, chunks, self.Encoding, self.Compression), fingerprint
+
+    def Saved(self, encoding: str, fingerprint: tuple):
+        """Takes note of the text with the given fingerprint having been written to the file."""
+        self.Encoding = encoding
+        stat = os.stat(self.FilePath)
+        self.FileSize = stat.st_size
+        self.DiskStat = (stat.st_size, stat.st_mtime_ns)
+        self.Fingerprint = fingerprint
+        self.Modified = False
+        self.Journal.Reset(self.FilePath, encoding)
+        if self.Follower:
+            self.Follower.Rebase(self.FilePath, self.FileSize)
     
-    def SaveAs(self):
+    def SaveAs(self, chunks=None, fingerprint: tuple = None):
         dlg = QFileDialog(None, Qt.WindowType.WindowCloseButtonHint | Qt.WindowType.Dialog)
         dlg.setAcceptMode(QFileDialog.AcceptMode.AcceptSave)
         dlg.setFileMode(QFileDialog.FileMode.AnyFile)
@@ -1099,14 +2785,16 @@ class TabInfo:
         res = dlg.exec()
         if res == QFileDialog.DialogCode.Accepted:
             self.FilePath = dlg.selectedFiles()[0]
-            self.Save()
+            # Compress by the new name, so a .gz stays compressed and saving it as .txt writes plain text
+            self.Compression = CompressionExtensions.get(os.path.splitext(self.FilePath)[1].lower())
+            self.Save(chunks, fingerprint)
 
     def AskSave(self):
         if self.Modified:
             msg = QMessageBox()
             msg.setText(f"Save changes in {os.path.basename(self.FilePath) if self.FilePath else "Untitled"}?")
             msg.setWindowTitle("Unsaved Changes")
-            msg.setIconPixmap(GetIconForResource("imgs", "warn.svg").pixmap(QSize(40, 40), 1.0, QIcon.Mode.Normal, QIcon.State.On))
+            msg.setIconPixmap(GetIconForResource("imgs", "warn.svg", QSize(40, 40)).pixmap(QSize(40, 40), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
             saveButton = msg.addButton("Save", QMessageBox.ButtonRole.AcceptRole)
             saveAllButton = msg.addButton("Save All", QMessageBox.ButtonRole.AcceptRole)
             noSaveButton = msg.addButton("Don't Save", QMessageBox.ButtonRole.DestructiveRole)
@@ -1129,6 +2817,297 @@ class AskSaveResult(Enum):
     NoSave = 2,
     Cancel = 3
 
+
+AstralCharacters = re.compile("[\U00010000-\U0010FFFF]")
+
+def Utf16Length(text: str):
+    """Length of text in UTF-16 units, which is how Qt counts document positions."""
+    return len(text) + len(AstralCharacters.findall(text))
+
+def SurrogatePair(match):
+    code = ord(match.group()) - 0x10000
+    return chr(0xD800 + (code >> 10)) + chr(0xDC00 + (code & 0x3FF))
+
+def ToUtf16Units(text: str):
+    """Splits characters outside the BMP into surrogate pairs."""
+    return AstralCharacters.sub(SurrogatePair, text)
+
+def FromUtf16Units(text: str):
+    """Joins the surrogate pairs left by ToUtf16Units back into characters."""
+    return text.encode('utf-16-le', 'surrogatepass').decode('utf-16-le', 'surrogatepass')
+
+
+class JournalText:
+    """Chunked string for replaying a journal, indexed in UTF-16 units."""
+    ChunkSize = 1 << 16
+
+    def __init__(self, text: str = ""):
+        text = ToUtf16Units(text)
+        self.Chunks = [text[i:i + self.ChunkSize] for i in range(0, len(text), self.ChunkSize)] or [""]
+
+    def Splice(self, position: int, removed: int, added: str):
+        added = ToUtf16Units(added)
+        # Find the chunk holding the position
+        index = 0
+        while index < len(self.Chunks) - 1 and position > len(self.Chunks[index]):
+            position -= len(self.Chunks[index])
+            index += 1
+
+        # Join the following chunks until the removed range is covered
+        end = index + 1
+        text = self.Chunks[index]
+        while end < len(self.Chunks) and len(text) < position + removed:
+            text += self.Chunks[end]
+            end += 1
+
+        text = text[:position] + added + text[position + removed:]
+        self.Chunks[index:end] = [text[i:i + self.ChunkSize] for i in range(0, len(text), self.ChunkSize)] or [""]
+
+    def Text(self):
+        return FromUtf16Units("".join(self.Chunks))
+
+
+def ReadJournalBase(header: dict):
+    """Reads the saved file a journal was started from, refusing if it changed since."""
+    if header["file"] is None:
+        return ""
+
+    stat = os.stat(header["file"])
+    if (stat.st_size, stat.st_mtime_ns) != (header["size"], header["mtime"]):
+        raise ValueError(f"{header['file']} changed after its journal was started.")
+
+    return ReadTextFile(header["file"], header["encoding"])[0]
+
+
+def ReplayJournal(path: str):
+    """Rebuilds a tab's text from its journal, returning (header, text)."""
+    with open(path, 'r', encoding='utf-8', newline='\n') as f:
+        header = json.loads(f.readline())
+        records = []
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break  # Torn write at the end of the journal
+
+    # A followed file grows under its journal, see AutosaveJournal.Grow, so it's checked against its last size
+    for record in records:
+        if isinstance(record, dict) and "size" in record:
+            header.update(record)
+
+    text = None
+    for record in records:
+        if isinstance(record, list):
+            if text is None:
+                text = JournalText(ReadJournalBase(header))
+            text.Splice(*record)
+        elif "snapshot" in record:
+            text = JournalText(record["snapshot"])
+
+    if text is None:
+        text = JournalText(ReadJournalBase(header))
+    return header, text.Text()
+
+
+class JournalWriter:
+    """Background thread that appends journal records to disk in the order they were queued."""
+
+    def __init__(self):
+        self.Queue = queue.Queue()
+        self.Files = {}
+        self.Thread = threading.Thread(target=self.Run, daemon=True)
+        self.Thread.start()
+
+    def Append(self, path: str, data: bytes):
+        self.Queue.put(("append", path, data))
+
+    def Compact(self, journal):
+        self.Queue.put(("compact", journal.Path, journal))
+
+    def Delete(self, path: str):
+        self.Queue.put(("delete", path, None))
+
+    def Remove(self, directory: str):
+        self.Queue.put(("remove", directory, None))
+
+    def Stop(self):
+        self.Queue.put(None)
+        self.Thread.join()
+
+    def Run(self):
+        running = True
+        while running:
+            batch = [self.Queue.get()]
+            while True:
+                try:
+                    batch.append(self.Queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in batch:
+                if item is None:
+                    running = False
+                    break
+                try:
+                    self.Process(*item)
+                except (OSError, ValueError, UnicodeError):
+                    pass  # Autosave is best effort and must never take the editor down
+
+            for f in self.Files.values():
+                f.flush()
+                os.fsync(f.fileno())
+
+        for f in self.Files.values():
+            f.close()
+        self.Files.clear()
+
+    def Process(self, op: str, path: str, arg):
+        if op == "append":
+            if path not in self.Files:
+                self.Files[path] = open(path, 'ab')
+            self.Files[path].write(arg)
+            return
+
+        # Every other operation replaces or removes the file
+        for key in [key for key in self.Files if key == path or key.startswith(path + os.sep)]:
+            self.Files.pop(key).close()
+
+        if op == "compact":
+            header, text = ReplayJournal(path)
+            data = (json.dumps(header) + "\n" + json.dumps({"snapshot": text}, ensure_ascii=False) + "\n").encode('utf-8')
+            with open(path + ".tmp", 'wb') as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            arg.BaseBytes = len(data)
+        elif op == "delete":
+            if os.path.exists(path):
+                os.remove(path)
+        elif op == "remove":
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class AutosaveJournal:
+    """Append-only log of one tab's edit deltas, replayed over its saved file after a crash."""
+    CompactMinBytes = 1 << 20
+
+    def __init__(self, writer: JournalWriter, directory: str):
+        self.Writer = writer
+        self.Path = os.path.join(directory, uuid.uuid4().hex + ".journal")
+        self.Header = {"file": None, "encoding": None, "size": None, "mtime": None}
+        self.Pending = []
+        self.Started = False
+        self.HasSnapshot = False  # Replaying no longer reads the file once a snapshot is written
+        self.BytesWritten = 0
+        self.BaseBytes = 0
+
+    def Reset(self, file: str, encoding: str):
+        """Starts over from the file as it is on disk now, e.g. after loading or saving it."""
+        self.Discard()
+        stat = os.stat(file)
+        self.Header = {"file": os.path.abspath(file), "encoding": encoding, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+        self.BaseBytes = stat.st_size
+
+    def Snapshot(self, header: dict, text: str):
+        """Starts over from text that isn't on disk yet, e.g. after recovering it."""
+        self.Discard()
+        self.Header = header
+        data = json.dumps({"snapshot": text}, ensure_ascii=False) + "\n"
+        self.Write((json.dumps(self.Header) + "\n" + data).encode('utf-8'))
+        self.BaseBytes = self.BytesWritten
+        self.HasSnapshot = True
+
+    def Grow(self, file: str, position: int, added: str):
+        """Notes text appended to the document from its file growing."""
+        if self.HasSnapshot:
+            self.Record(position, 0, added)
+            return
+        stat = os.stat(file)
+        self.Header.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+        self.BaseBytes = stat.st_size
+        if self.Started:
+            self.Write((json.dumps({"size": stat.st_size, "mtime": stat.st_mtime_ns}) + "\n").encode('utf-8'))
+
+    def Record(self, position: int, removed: int, added: str):
+        added = ToUtf16Units(added)  # Positions are Qt's, so the text is kept in the same units until it's written
+        if self.Pending:
+            last = self.Pending[-1]
+            # Fold typing and backspacing at the end of the previous delta into it
+            if removed == 0 and position == last[0] + len(last[2]):
+                last[2] += added
+                return
+            if not added and last[0] <= position and position + removed == last[0] + len(last[2]):
+                last[2] = last[2][:position - last[0]]
+                return
+        self.Pending.append([position, removed, added])
+
+    def Flush(self):
+        if not self.Pending:
+            return
+
+        data = "".join(json.dumps([position, removed, FromUtf16Units(added)], ensure_ascii=False) + "\n"
+                       for position, removed, added in self.Pending)
+        self.Pending.clear()
+        if not self.Started:
+            data = json.dumps(self.Header) + "\n" + data
+        self.Write(data.encode('utf-8'))
+
+        # Fold the deltas into a snapshot once replaying them would cost more than rereading the base
+        if self.BytesWritten > max(self.CompactMinBytes, self.BaseBytes):
+            self.Writer.Compact(self)
+            self.BytesWritten = 0
+            self.HasSnapshot = True
+
+    def Write(self, data: bytes):
+        self.Writer.Append(self.Path, data)
+        self.Started = True
+        self.BytesWritten += len(data)
+
+    def Discard(self):
+        self.Pending.clear()
+        if self.Started:
+            self.Writer.Delete(self.Path)
+            self.Started = False
+            self.BytesWritten = 0
+        self.HasSnapshot = False
+
+
+class AutosaveSession:
+    """Owns this process's locked journal directory."""
+
+    def __init__(self):
+        self.Root = os.path.join(QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppLocalDataLocation), "journal")
+        self.Directory = os.path.join(self.Root, uuid.uuid4().hex)
+        os.makedirs(self.Directory, exist_ok=True)
+
+        self.Lock = QLockFile(os.path.join(self.Directory, "session.lock"))
+        self.Lock.setStaleLockTime(0)  # Only a dead owner makes a lock stale
+        self.Lock.tryLock(0)
+
+        self.Writer = JournalWriter()
+
+    def CreateJournal(self):
+        return AutosaveJournal(self.Writer, self.Directory)
+
+    def FindOrphanedSessions(self):
+        """Returns (directory, lock) for every session whose process is gone, locking each one."""
+        sessions = []
+        for name in os.listdir(self.Root):
+            directory = os.path.join(self.Root, name)
+            if directory == self.Directory or not os.path.isdir(directory):
+                continue
+
+            lock = QLockFile(os.path.join(directory, "session.lock"))
+            lock.setStaleLockTime(0)
+            if lock.tryLock(0):
+                sessions.append((directory, lock))
+        return sessions
+
+    def Close(self):
+        """Ends a clean session; its journals go with the directory."""
+        self.Writer.Stop()
+        self.Lock.unlock()
+        shutil.rmtree(self.Directory, ignore_errors=True)
+
     
 class SpellCheckDialog(QDialog):
     def __init__(self, text_edit: QPlainTextEdit, parent=None):
@@ -1294,20 +3273,1848 @@ class UnhidableToolbar(QToolBar):
     def contextMenuEvent(self, event):
         pass
 
-class ZoomablePrintPreviewWidget(QPrintPreviewWidget):
+class InstanceServer(QObject):
+    """Local socket that later launches hand their files to."""
+    fileRequested = pyqtSignal(str, str)
+
+    ServerName = "WriteBox-" + (os.environ.get("USERNAME") or os.environ.get("USER") or "")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.Server = QLocalServer(self)
+        self.Server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.Server.newConnection.connect(self.NewConnection)
+        # With access options Qt moves the new socket over an existing one on Unix, so make sure no running instance owns
+        # it first. A crashed instance can leave its socket file behind, but one that's still running answers.
+        probe = QLocalSocket()
+        probe.connectToServer(self.ServerName)
+        if probe.waitForConnected(500):
+            probe.disconnectFromServer()
+            return
+        if not self.Server.listen(self.ServerName):
+            QLocalServer.removeServer(self.ServerName)
+            self.Server.listen(self.ServerName)
+
+    @staticmethod
+    def Forward(args: argparse.Namespace):
+        """Sends the files to a running instance, returning False if none is listening."""
+        socket = QLocalSocket()
+        socket.connectToServer(InstanceServer.ServerName)
+        if not socket.waitForConnected(500):
+            return False
+
+        messages = [{"filename": os.path.abspath(filename), "encoding": args.e} for filename in args.filename] or [{"filename": None, "encoding": None}]
+        for message in messages:
+            socket.write((json.dumps(message) + "\n").encode('utf-8'))
+        socket.waitForBytesWritten(2000)
+        socket.disconnectFromServer()
+        if socket.state() != QLocalSocket.LocalSocketState.UnconnectedState:
+            socket.waitForDisconnected(2000)
+        return True
+
+    def NewConnection(self):
+        while self.Server.hasPendingConnections():
+            socket = self.Server.nextPendingConnection()
+            socket.readyRead.connect(lambda s=socket: self.ReadMessages(s))
+            socket.disconnected.connect(lambda s=socket: (self.ReadMessages(s), s.deleteLater()))
+
+    def ReadMessages(self, socket: QLocalSocket):
+        while socket.canReadLine():
+            try:
+                message = json.loads(bytes(socket.readLine()).decode('utf-8'))
+            except ValueError:
+                continue
+            self.fileRequested.emit(message.get("filename") or "", message.get("encoding") or "")
+
+def ChangedBlockRange(doc: QTextDocument, position: int, charsAdded: int, oldBlockCount: int):
+    """Maps a contentsChange to (first, oldEnd, newEnd) blocks."""
+    first = doc.findBlock(position).blockNumber()
+    # Qt counts the final paragraph separator in whole-document changes, so clamp to the last position
+    last = doc.findBlock(min(position + charsAdded, doc.characterCount() - 1)).blockNumber()
+    return first, last + 1 - (doc.blockCount() - oldBlockCount), last + 1
+
+def SplitLines(text: str):
+    """Splits text into lines that keep their newline, so joining them gives the text back."""
+    lines = text.split("\n")
+    last = lines.pop()
+    lines = [line + "\n" for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def ChunkLines(lines: list):
+    """Cuts lines into content-defined chunks, returning (hashes, starts)."""
+    hashes = []
+    starts = [0]
+    for i, line in enumerate(lines):
+        if hash(line) & 63 == 0 or i + 1 - starts[-1] >= 1024:
+            hashes.append(hash(tuple(lines[starts[-1]:i + 1])))
+            starts.append(i + 1)
+    if starts[-1] < len(lines):
+        hashes.append(hash(tuple(lines[starts[-1]:])))
+        starts.append(len(lines))
+    return hashes, starts
+
+
+def ChangedLineRanges(old: str, new: str):
+    """Returns (start, end, replacement) for the lines of old that differ from new."""
+    oldLines = SplitLines(old)
+    newLines = SplitLines(new)
+    oldHashes, oldStarts = ChunkLines(oldLines)
+    newHashes, newStarts = ChunkLines(newLines)
+    offsets = [0, *itertools.accumulate(map(Utf16Length if AstralCharacters.search(old) else len, oldLines))]  # As QTextCursor counts
+
+    ranges = []
+    matcher = difflib.SequenceMatcher(None, oldHashes, newHashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        a1, a2, b1, b2 = oldStarts[i1], oldStarts[i2], newStarts[j1], newStarts[j2]
+        # Chunks hold many lines, narrow them down to the ones that changed
+        while a1 < a2 and b1 < b2 and oldLines[a1] == newLines[b1]:
+            a1 += 1
+            b1 += 1
+        while a1 < a2 and b1 < b2 and oldLines[a2 - 1] == newLines[b2 - 1]:
+            a2 -= 1
+            b2 -= 1
+        ranges.append((offsets[a1], offsets[a2], "".join(newLines[b1:b2])))
+    return ranges
+
+
+def CommonPrefix(a: list, b: list, a1: int, a2: int, b1: int, b2: int):
+    """Counts the equal lines at the start of a[a1:a2] and b[b1:b2]."""
+    n = min(a2 - a1, b2 - b1)
+    # Slice comparisons run in C; grow them while they match, then halve the one that didn't
+    lo, step = 0, 64
+    while lo < n:
+        hi = min(lo + step, n)
+        if a[a1 + lo:a1 + hi] != b[b1 + lo:b1 + hi]:
+            break
+        lo, step = hi, step * 2
+    else:
+        return n
+    while hi - lo > 64:
+        mid = (lo + hi) // 2
+        if a[a1 + lo:a1 + mid] == b[b1 + lo:b1 + mid]:
+            lo = mid
+        else:
+            hi = mid
+    while a[a1 + lo] == b[b1 + lo]:
+        lo += 1
+    return lo
+
+
+def CommonSuffix(a: list, b: list, a1: int, a2: int, b1: int, b2: int):
+    """Counts the equal lines at the end of a[a1:a2] and b[b1:b2]."""
+    n = min(a2 - a1, b2 - b1)
+    lo, step = 0, 64
+    while lo < n:
+        hi = min(lo + step, n)
+        if a[a2 - hi:a2 - lo] != b[b2 - hi:b2 - lo]:
+            break
+        lo, step = hi, step * 2
+    else:
+        return n
+    while hi - lo > 64:
+        mid = (lo + hi) // 2
+        if a[a2 - mid:a2 - lo] == b[b2 - mid:b2 - lo]:
+            lo = mid
+        else:
+            hi = mid
+    while a[a2 - lo - 1] == b[b2 - lo - 1]:
+        lo += 1
+    return lo
+
+
+DiffSplitLines = 1 << 10
+
+
+def DiffLines(a: list, b: list):
+    """Patience diff of two lists of lines, returning difflib style opcodes."""
+    blocks = []  # (i, j, n) runs of equal lines
+    regions = [(0, len(a), 0, len(b))]
+    # Lines found once in each whole file are found once in every part of them too
+    countA = collections.Counter(a)
+    countB = collections.Counter(b)
+    indexB = dict(zip(b, range(len(b))))
+    while regions:
+        a1, a2, b1, b2 = regions.pop()
+        n = CommonPrefix(a, b, a1, a2, b1, b2)
+        if n:
+            blocks.append((a1, b1, n))
+            a1 += n
+            b1 += n
+        n = CommonSuffix(a, b, a1, a2, b1, b2)
+        if n:
+            blocks.append((a2 - n, b2 - n, n))
+            a2 -= n
+            b2 -= n
+        if a1 == a2 or b1 == b2:
+            continue
+
+        if a2 - a1 > DiffSplitLines:
+            # Sorting every anchor of a big region costs too much in Python. Split it at a unique line near the middle
+            # that has equal neighbours, so the halves shrink to their changes quickly.
+            for offset in range(min(1000, (a2 - a1) // 2)):
+                i = (a1 + a2) // 2 + (offset // 2 if offset % 2 else -offset // 2)
+                line = a[i]
+                if countA[line] == 1 and countB.get(line) == 1 and b1 < indexB[line] < b2 - 1:
+                    j = indexB[line]
+                    if a[i - 1] == b[j - 1] and a[i + 1] == b[j + 1]:
+                        blocks.append((i, j, 1))
+                        regions.append((a1, i, b1, j))
+                        regions.append((i + 1, a2, j + 1, b2))
+                        break
+            else:
+                i = None
+            if i is not None:
+                continue
+
+        localA = collections.Counter(a[a1:a2])
+        localB = collections.Counter(b[b1:b2])
+        positionB = {line: j for j, line in enumerate(b[b1:b2], b1) if localB[line] == 1 and localA[line] == 1}
+        pairs = [(i, positionB[line]) for i, line in enumerate(a[a1:a2], a1) if line in positionB]
+        if not pairs:
+            if (a2 - a1) * (b2 - b1) <= 1 << 22:
+                matcher = difflib.SequenceMatcher(None, a[a1:a2], b[b1:b2], autojunk=False)
+                blocks.extend((a1 + i, b1 + j, n) for i, j, n in matcher.get_matching_blocks() if n)
+            continue  # Otherwise left as one replaced block
+
+        # Longest run of anchors in order on both sides, by patience sorting
+        tails = []
+        tailIndex = []
+        previous = [0] * len(pairs)
+        for k, (_, j) in enumerate(pairs):
+            pile = bisect.bisect_left(tails, j)
+            previous[k] = tailIndex[pile - 1] if pile else -1
+            if pile == len(tails):
+                tails.append(j)
+                tailIndex.append(k)
+            else:
+                tails[pile] = j
+                tailIndex[pile] = k
+        anchors = []
+        k = tailIndex[-1]
+        while k >= 0:
+            anchors.append(pairs[k])
+            k = previous[k]
+        anchors.reverse()
+
+        # Adjacent anchors make one block, the gaps between blocks are diffed again
+        lastA, lastB = a1, b1
+        runI, runJ, runN = anchors[0][0], anchors[0][1], 0
+        for i, j in anchors:
+            if i == runI + runN and j == runJ + runN:
+                runN += 1
+                continue
+            blocks.append((runI, runJ, runN))
+            if runI > lastA or runJ > lastB:
+                regions.append((lastA, runI, lastB, runJ))
+            lastA, lastB = runI + runN, runJ + runN
+            runI, runJ, runN = i, j, 1
+        blocks.append((runI, runJ, runN))
+        if runI > lastA or runJ > lastB:
+            regions.append((lastA, runI, lastB, runJ))
+        lastA, lastB = runI + runN, runJ + runN
+        if a2 > lastA or b2 > lastB:
+            regions.append((lastA, a2, lastB, b2))
+
+    opcodes = []
+    i = j = 0
+    for bi, bj, n in sorted(blocks) + [(len(a), len(b), 0)]:
+        if bi > i or bj > j:
+            opcodes.append(("replace" if bi > i and bj > j else "delete" if bi > i else "insert", i, bi, j, bj))
+        if n:
+            if opcodes and opcodes[-1][0] == "equal":
+                opcodes[-1] = ("equal", opcodes[-1][1], bi + n, opcodes[-1][3], bj + n)
+            else:
+                opcodes.append(("equal", bi, bi + n, bj, bj + n))
+        i, j = bi + n, bj + n
+    return opcodes
+
+
+def GroupDiffHunks(opcodes: list, context: int = 3):
+    """Groups diff opcodes into hunks with a few lines of context."""
+    hunks = []
+    hunk = []
+    for tag, a1, a2, b1, b2 in opcodes:
+        if tag == "equal":
+            if hunk and a2 - a1 > 2 * context:
+                hunk.append((tag, a1, a1 + context, b1, b1 + context))
+                hunks.append(hunk)
+                hunk = []
+            if not hunk:
+                a1, b1 = max(a1, a2 - context), max(b1, b2 - context)
+        hunk.append((tag, a1, a2, b1, b2))
+    if hunk and not (len(hunk) == 1 and hunk[0][0] == "equal"):
+        if hunk[-1][0] == "equal":
+            tag, a1, a2, b1, b2 = hunk[-1]
+            hunk[-1] = (tag, a1, min(a2, a1 + context), b1, min(b2, b1 + context))
+        hunks.append(hunk)
+    return hunks
+
+
+def TextFingerprint(text: str):
+    """Cheap fingerprint of a text, matching DocumentStats.Fingerprint."""
+    # Lines are hashed as toPlainText gives them, so text taken out of the editor matches the document it came from
+    plain = text.replace("\xa0", " ") if "\xa0" in text else text
+    return Utf16Length(text), hash(tuple(map(hash, plain.split("\n"))))
+
+
+def FormatFileSize(size: int):
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:,} {unit}" if unit == "bytes" else f"{size:,.1f} {unit}"
+        size /= 1024
+
+class DocumentStats:
+    """Word counts and hashes per block, so a change only recounts the blocks it touched."""
+
+    def __init__(self):
+        self.WordCounts = [0]
+        self.BlockHashes = [hash("")]
+        self.Words = 0
+
+    def SetDocument(self, doc: QTextDocument, text: str):
+        # Splitting the plain text is much faster than walking the blocks, and matches them unless a block holds a line separator
+        lines = text.split("\n")
+        if len(lines) != doc.blockCount():
+            lines = []
+            block = doc.begin()
+            while block.isValid():
+                lines.append(block.text().replace("\xa0", " "))
+                block = block.next()
+        self.WordCounts = list(map(len, map(str.split, lines)))
+        self.BlockHashes = list(map(hash, lines))
+        self.Words = sum(self.WordCounts)
+
+    def Update(self, doc: QTextDocument, position: int, charsAdded: int):
+        first, oldEnd, newEnd = ChangedBlockRange(doc, position, charsAdded, len(self.WordCounts))
+        counts = []
+        hashes = []
+        block = doc.findBlockByNumber(first)
+        for _ in range(newEnd - first):
+            text = block.text()
+            counts.append(len(text.split()))
+            hashes.append(hash(text.replace("\xa0", " ") if "\xa0" in text else text))  # As TextFingerprint
+            block = block.next()
+        self.Words += sum(counts) - sum(self.WordCounts[first:oldEnd])
+        self.WordCounts[first:oldEnd] = counts
+        self.BlockHashes[first:oldEnd] = hashes
+
+    def Fingerprint(self, doc: QTextDocument):
+        """Same as TextFingerprint of the document's text, without copying the text out."""
+        return doc.characterCount() - 1, hash(tuple(self.BlockHashes))
+
+class PrintLayout:
+    """Paginates plain text for one font, page setup and resolution."""
+    TabSize = 8
+
+    def __init__(self, font: QFont, pageLayout: QPageLayout, resolution: int):
+        self.Font = QFont(font)
+        self.Resolution = resolution
+        self.PageRect = pageLayout.fullRectPixels(resolution)
+        self.PaintRect = pageLayout.paintRectPixels(resolution)
+
+        # Measure on a device with the target resolution so the layout matches what gets painted
+        self.DotsPerMeter = round(resolution / 0.0254)
+        self.Device = QImage(1, 1, QImage.Format.Format_RGB32)
+        self.Device.setDotsPerMeterX(self.DotsPerMeter)
+        self.Device.setDotsPerMeterY(self.DotsPerMeter)
+        metrics = QFontMetricsF(self.Font, self.Device)
+        self.Metrics = metrics
+        self.LineHeight = metrics.lineSpacing()
+        self.Ascent = metrics.ascent()
+        self.LinesPerPage = max(1, int(self.PaintRect.height() // self.LineHeight))
+
+        self.Lines = [""]
+        self.LineCounts = [None]  # Visual lines per block, None until wrapped
+        self.Starts = None  # First visual line of each block, rebuilt after changes
+
+    @staticmethod
+    def Key(font: QFont, pageLayout: QPageLayout, resolution: int):
+        # The pixel rects already account for page size, orientation and margins
+        page = pageLayout.fullRectPixels(resolution)
+        paint = pageLayout.paintRectPixels(resolution)
+        return (font.toString(), page.width(), page.height(), paint.x(), paint.y(), paint.width(), paint.height(), resolution)
+
+    def SetText(self, text: str):
+        self.Lines = [line.expandtabs(self.TabSize) for line in text.split("\n")]
+        self.LineCounts = [None] * len(self.Lines)
+        self.Starts = None
+
+    def SetDocument(self, doc: QTextDocument):
+        self.Lines = []
+        block = doc.begin()
+        while block.isValid():
+            self.Lines.append(block.text().expandtabs(self.TabSize))
+            block = block.next()
+        self.LineCounts = [None] * len(self.Lines)
+        self.Starts = None
+
+    def Update(self, doc: QTextDocument, position: int, charsAdded: int):
+        """Takes over a contentsChange of doc, rewrapping only the blocks it touched."""
+        first, oldEnd, newEnd = ChangedBlockRange(doc, position, charsAdded, len(self.Lines))
+        lines = []
+        block = doc.findBlockByNumber(first)
+        for _ in range(newEnd - first):
+            lines.append(block.text().expandtabs(self.TabSize))
+            block = block.next()
+        self.Lines[first:oldEnd] = lines
+        self.LineCounts[first:oldEnd] = [None] * len(lines)
+        self.Starts = None
+
+    def WrapBlock(self, index: int):
+        """Returns (start, length) of each visual line of a block."""
+        text = self.Lines[index]
+        width = self.PaintRect.width()
+        if self.Metrics.horizontalAdvance(text) <= width:
+            return [(0, len(text))]
+
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+        layout = QTextLayout(text, self.Font, self.Device)
+        layout.setTextOption(option)
+        segments = []
+        layout.beginLayout()
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(width)
+            segments.append((line.textStart(), line.textLength()))
+        layout.endLayout()
+        return segments
+
+    def EnsureWrapped(self):
+        if self.Starts is not None:
+            return
+        for index, count in enumerate(self.LineCounts):
+            if count is None:
+                self.LineCounts[index] = len(self.WrapBlock(index))
+        self.Starts = [0] + list(itertools.accumulate(self.LineCounts))
+
+    def PageCount(self):
+        self.EnsureWrapped()
+        return max(1, math.ceil(self.Starts[-1] / self.LinesPerPage))
+
+    def RenderPage(self, painter: QPainter, page: int):
+        """Paints one page in device pixels."""
+        self.EnsureWrapped()
+        painter.setFont(self.Font)
+        painter.setPen(Qt.GlobalColor.black)
+
+        line = page * self.LinesPerPage
+        end = min(line + self.LinesPerPage, self.Starts[-1])
+        index = bisect.bisect_right(self.Starts, line) - 1
+        y = self.PaintRect.top() + self.Ascent
+        while line < end:
+            text = self.Lines[index]
+            for start, length in self.WrapBlock(index)[line - self.Starts[index]:]:
+                if line >= end:
+                    break
+                painter.drawText(QPointF(self.PaintRect.left(), y), text[start:start + length])
+                y += self.LineHeight
+                line += 1
+            index += 1
+
+def PrintText(printer: "QPrinter", text: str, font: QFont, cancelled: threading.Event = None, pagesCounted=None, pagePrinted=None):
+    """Paints text on printer, returning the number of pages printed."""
+    layout = PrintLayout(font, printer.pageLayout(), printer.resolution())
+    layout.SetText(text)
+    count = layout.PageCount()
+
+    # fromPage/toPage are 1-based and 0 when the whole document was chosen
+    first = max(1, printer.fromPage()) - 1
+    last = min(count, printer.toPage() or count)
+    pages = range(first, last)
+    if pagesCounted:
+        pagesCounted(len(pages))
+
+    painter = QPainter()
+    if not painter.begin(printer):
+        raise RuntimeError("The printer could not be started.")
+    if not printer.fullPage():
+        # The painter starts at the margins, the layout works in whole page coordinates
+        painter.translate(-QPointF(layout.PaintRect.topLeft()))
+
+    done = 0
+    for page in pages:
+        if cancelled and cancelled.is_set():
+            break
+        if done:
+            printer.newPage()
+        layout.RenderPage(painter, page)
+        done += 1
+        if pagePrinted:
+            pagePrinted(done)
+
+    if cancelled and cancelled.is_set():
+        printer.abort()
+        painter.end()
+        if printer.outputFileName() and os.path.exists(printer.outputFileName()):
+            os.remove(printer.outputFileName())
+    else:
+        painter.end()
+    return done
+
+def CreatePdfPrinter(filename: str, docName: str):
+    """A printer writing a PDF at screen resolution, which is what Print Preview paginates for."""
+    from PyQt6.QtPrintSupport import QPrinter
+
+    printer = QPrinter(QPrinter.PrinterMode.ScreenResolution)
+    printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
+    printer.setOutputFileName(filename)
+    printer.setDocName(docName)
+    return printer
+
+class PrintJob(QObject):
+    """Prints a text snapshot with PrintLayout on a worker thread, one page at a time."""
+    pagesCounted = pyqtSignal(int)
+    pagePrinted = pyqtSignal(int)
+    finished = pyqtSignal(str)  # Error message, empty when done or cancelled
+
+    def __init__(self, printer: "QPrinter", text: str, font: QFont):
+        super().__init__()
+        self.Printer = printer
+        self.Text = text
+        self.Font = QFont(font)
+        self.Cancelled = threading.Event()
+        self.Thread = threading.Thread(target=self.Run, daemon=True)
+
+    def Start(self):
+        self.Thread.start()
+
+    def Cancel(self):
+        self.Cancelled.set()
+
+    def Run(self):
+        try:
+            PrintText(self.Printer, self.Text, self.Font, self.Cancelled, self.pagesCounted.emit, self.pagePrinted.emit)
+            self.finished.emit("")
+        except Exception as e:
+            self.finished.emit(str(e))
+
+class BatchJob(QObject):
+    """Runs a batch function over jobs with RunJobs on a worker thread, reporting each result."""
+    jobDone = pyqtSignal(object)
+    finished = pyqtSignal(str)  # Error message, empty when every job ran
+
+    def __init__(self, function, jobs: list):
+        super().__init__()
+        self.Function = function
+        self.Jobs = jobs
+        self.Thread = threading.Thread(target=self.Run, daemon=True)
+
+    def Start(self):
+        self.Thread.start()
+
+    def Run(self):
+        try:
+            for result in RunJobs(self.Function, self.Jobs):
+                self.jobDone.emit(result)
+            self.finished.emit("")
+        except Exception as e:
+            self.finished.emit(str(e))
+
+class SaveAllJob(QObject):
+    """Writes several files with WriteTextFile on a pool of threads."""
+    fileSaved = pyqtSignal(object)  # (index of the job, encoding, error message or None)
+    finished = pyqtSignal()
+    MaxWorkers = 8
+
+    def __init__(self, jobs: list):
+        super().__init__()
+        self.Jobs = jobs
+        self.Thread = threading.Thread(target=self.Run, daemon=True)
+
+    def Start(self):
+        self.Thread.start()
+
+    def Run(self):
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        # Writing and syncing mostly waits on the disk, so threads overlap well without copying the text to processes
+        with ThreadPoolExecutor(min(len(self.Jobs), self.MaxWorkers)) as pool:
+            futures = {pool.submit(WriteTextFile, *job): index for index, job in enumerate(self.Jobs)}
+            for future in as_completed(futures):
+                try:
+                    self.fileSaved.emit((futures[future], future.result(), None))
+                except Exception as e:
+                    self.fileSaved.emit((futures[future], None, str(e)))
+        self.finished.emit()
+
+class PreviewZoomMode(Enum):
+    CustomZoom = 0
+    FitToWidth = 1
+    FitInView = 2
+
+class PreviewViewMode(Enum):
+    SinglePage = 0
+    FacingPages = 1
+    AllPages = 2
+
+class PrintPreviewView(QAbstractScrollArea):
+    """Print preview that paints only the pages in view."""
+    previewChanged = pyqtSignal()
+    Margin = 12
+    Spacing = 12
+
+    def __init__(self, printer: "QPrinter", layoutProvider, parent=None):
+        super().__init__(parent)
+        self.Printer = printer
+        self.LayoutProvider = layoutProvider
+        self.Zoom = 1.0
+        self.ZoomMode = PreviewZoomMode.FitInView
+        self.ViewMode = PreviewViewMode.SinglePage
+        self.PageImages = {}
+        self.verticalScrollBar().setSingleStep(20)
+        self.horizontalScrollBar().setSingleStep(20)
+        self.updatePreview()
+
+    def updatePreview(self):
+        self.Pages = self.LayoutProvider(self.Printer)
+        self.Pages.EnsureWrapped()
+        self.PageImages.clear()
+        self.UpdateGeometry()
+        self.previewChanged.emit()
+
+    def pageCount(self):
+        return self.Pages.PageCount()
+
+    def zoomFactor(self):
+        return self.Zoom
+
+    def zoomMode(self):
+        return self.ZoomMode
+
+    def setZoomFactor(self, factor: float):
+        self.ZoomMode = PreviewZoomMode.CustomZoom
+        self.Zoom = max(0.05, min(6.0, factor))
+        self.UpdateGeometry()
+        self.previewChanged.emit()
+
+    def setZoomMode(self, mode: PreviewZoomMode):
+        self.ZoomMode = mode
+        self.UpdateGeometry()
+        self.previewChanged.emit()
+
+    def zoomIn(self, factor: float = 1.1):
+        self.setZoomFactor(self.Zoom * factor)
+
+    def zoomOut(self, factor: float = 1.1):
+        self.setZoomFactor(self.Zoom / factor)
+
+    def setLandscapeOrientation(self):
+        self.Printer.setPageOrientation(QPageLayout.Orientation.Landscape)
+        self.updatePreview()
+
+    def setPortraitOrientation(self):
+        self.Printer.setPageOrientation(QPageLayout.Orientation.Portrait)
+        self.updatePreview()
+
+    def setSinglePageViewMode(self):
+        self.SetViewMode(PreviewViewMode.SinglePage)
+
+    def setFacingPagesViewMode(self):
+        self.SetViewMode(PreviewViewMode.FacingPages)
+
+    def setAllPagesViewMode(self):
+        self.SetViewMode(PreviewViewMode.AllPages)
+
+    def SetViewMode(self, mode: PreviewViewMode):
+        self.ViewMode = mode
+        self.UpdateGeometry()
+        self.previewChanged.emit()
+
+    def PageSize(self):
+        """Size of one page on screen at the current zoom, in logical pixels."""
+        scale = self.Zoom * self.logicalDpiX() / self.Pages.Resolution
+        return QSizeF(self.Pages.PageRect.width() * scale, self.Pages.PageRect.height() * scale)
+
+    def Columns(self):
+        match self.ViewMode:
+            case PreviewViewMode.SinglePage:
+                return 1
+            case PreviewViewMode.FacingPages:
+                return 2
+            case PreviewViewMode.AllPages:
+                width = self.PageSize().width() + self.Spacing
+                return max(1, int((self.viewport().width() - 2 * self.Margin + self.Spacing) // width))
+
+    def UpdateGeometry(self):
+        oldZoom = self.Zoom
+        viewport = self.viewport().size()
+        if self.ZoomMode != PreviewZoomMode.CustomZoom and viewport.width() > 0 and viewport.height() > 0:
+            columns = 2 if self.ViewMode == PreviewViewMode.FacingPages else 1
+            scale = self.logicalDpiX() / self.Pages.Resolution
+            zoom = (viewport.width() - 2 * self.Margin - (columns - 1) * self.Spacing) / (columns * self.Pages.PageRect.width() * scale)
+            if self.ZoomMode == PreviewZoomMode.FitInView:
+                zoom = min(zoom, (viewport.height() - 2 * self.Margin) / (self.Pages.PageRect.height() * scale))
+            self.Zoom = max(0.05, zoom)
+
+        if self.Zoom != oldZoom:
+            self.PageImages.clear()
+
+        # Keep the same spot of the document in view across zoom changes
+        vbar = self.verticalScrollBar()
+        fraction = vbar.value() / vbar.maximum() if vbar.maximum() else 0
+
+        size = self.PageSize()
+        columns = self.Columns()
+        rows = math.ceil(self.pageCount() / columns)
+        width = 2 * self.Margin + columns * size.width() + (columns - 1) * self.Spacing
+        height = 2 * self.Margin + rows * size.height() + (rows - 1) * self.Spacing
+        self.horizontalScrollBar().setRange(0, max(0, math.ceil(width - viewport.width())))
+        self.horizontalScrollBar().setPageStep(viewport.width())
+        vbar.setRange(0, max(0, math.ceil(height - viewport.height())))
+        vbar.setPageStep(viewport.height())
+        vbar.setValue(round(fraction * vbar.maximum()))
+        self.viewport().update()
+
+    def PageRect(self, page: int):
+        """Where a page (0-based) sits in the scrolled content, in logical pixels."""
+        size = self.PageSize()
+        columns = self.Columns()
+        width = 2 * self.Margin + columns * size.width() + (columns - 1) * self.Spacing
+        left = max(0, (self.viewport().width() - width) / 2) + self.Margin
+        row, column = divmod(page, columns)
+        return QRectF(left + column * (size.width() + self.Spacing), self.Margin + row * (size.height() + self.Spacing), size.width(), size.height())
+
+    def currentPage(self):
+        vbar = self.verticalScrollBar()
+        if vbar.maximum() and vbar.value() >= vbar.maximum():
+            return self.pageCount()
+        rowHeight = self.PageSize().height() + self.Spacing
+        row = int((vbar.value() + rowHeight / 2) // rowHeight)
+        return max(1, min(self.pageCount(), row * self.Columns() + 1))
+
+    def setCurrentPage(self, page: int):
+        page = max(1, min(self.pageCount(), page))
+        self.verticalScrollBar().setValue(round(self.PageRect(page - 1).top() - self.Margin))
+
+    def PageImage(self, page: int):
+        image = self.PageImages.get(page)
+        if image is None:
+            dpr = self.devicePixelRatioF()
+            size = self.PageSize()
+            image = QImage(max(1, round(size.width() * dpr)), max(1, round(size.height() * dpr)), QImage.Format.Format_RGB32)
+            image.fill(Qt.GlobalColor.white)
+            # Fonts resolve against the image's DPI, which has to match the layout's
+            image.setDotsPerMeterX(self.Pages.DotsPerMeter)
+            image.setDotsPerMeterY(self.Pages.DotsPerMeter)
+
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.RenderHint.TextAntialiasing)
+            painter.scale(image.width() / self.Pages.PageRect.width(), image.height() / self.Pages.PageRect.height())
+            self.Pages.RenderPage(painter, page)
+            painter.end()
+
+            image.setDevicePixelRatio(dpr)
+            self.PageImages[page] = image
+        return image
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), self.palette().color(QPalette.ColorRole.Dark))
+
+        dx = self.horizontalScrollBar().value()
+        dy = self.verticalScrollBar().value()
+        rowHeight = self.PageSize().height() + self.Spacing
+        columns = self.Columns()
+        firstRow = max(0, int((dy - self.Margin) // rowHeight))
+        lastRow = int((dy + self.viewport().height() - self.Margin) // rowHeight)
+
+        visible = range(firstRow * columns, min(self.pageCount(), (lastRow + 1) * columns))
+        for page in visible:
+            rect = self.PageRect(page).translated(-dx, -dy)
+            painter.fillRect(rect.translated(3, 3), self.palette().color(QPalette.ColorRole.Shadow))
+            painter.drawImage(rect, self.PageImage(page))
+        painter.end()
+
+        # Only keep rendered pages around that are likely to be scrolled back to
+        if len(self.PageImages) > 2 * len(visible) + 4:
+            for page in [page for page in self.PageImages if page not in visible]:
+                del self.PageImages[page]
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.UpdateGeometry()
+
+    def scrollContentsBy(self, dx: int, dy: int):
+        self.viewport().update()
+        self.previewChanged.emit()
+
     def wheelEvent(self, event: QWheelEvent):
         if event.modifiers() == Qt.KeyboardModifier.ControlModifier:
-            delta = event.angleDelta().y()
-            self.setZoomMode(QPrintPreviewWidget.ZoomMode.CustomZoom)
-            if delta > 0:
+            if event.angleDelta().y() > 0:
                 self.zoomIn()
             else:
                 self.zoomOut()
-            self.previewChanged.emit()
             event.accept()
         else:
             super().wheelEvent(event)
 
+class LargeFileIndex(QObject):
+    """A memory-mapped file with an index of where each line starts."""
+    indexProgress = pyqtSignal()
+    ChunkSize = 1 << 24
+    MaxLineBytes = 1 << 16  # Only this much of a line is shown before it's indexed
+    SegmentBytes = 1 << 10
+
+    def __init__(self, file: str, encoding: str = None, stream=None, head: bytes = b""):
+        super().__init__()
+        self.Path = file
+        self.Stream = stream
+        if stream:
+            self.File = tempfile.TemporaryFile(prefix="writebox-")
+            self.File.write(head)
+            self.File.flush()
+        else:
+            self.File = open(file, 'rb')
+        self.Map = mmap.mmap(self.File.fileno(), 0, access=mmap.ACCESS_READ)
+        self.Encoding = encoding or (DetectEncoding(head) if stream else DetectFileEncoding(file))
+
+        # Slicing lines out of the bytes needs a codec without a BOM and the size of a newline
+        self.Codec = codecs.lookup(self.Encoding).name
+        self.Start = 0
+        for bom, codec in ((codecs.BOM_UTF32_LE, "utf-32-le"), (codecs.BOM_UTF32_BE, "utf-32-be"), (codecs.BOM_UTF8, "utf-8"),
+                           (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be")):
+            if self.Codec.startswith(codec[:6]) and self.Map[:len(bom)] == bom:
+                self.Codec, self.Start = codec, len(bom)
+                break
+        else:
+            self.Codec = {"utf-8-sig": "utf-8", "utf-16": "utf-16-le", "utf-32": "utf-32-le"}.get(self.Codec, self.Codec)
+        self.Newline = "\n".encode(self.Codec)
+
+        # A decompressing stream can grow past 4 GiB while it's indexed
+        self.Offsets = array('I' if stream is None and len(self.Map) < 1 << 32 else 'Q', [self.Start])
+        self.Continuations = array('Q')  # Indexed lines that continue the one before, in order
+        self.Indexed = False
+        self.TopLine = 0
+        self.CurrentLine = 0
+        self.Cancelled = threading.Event()
+        self.Thread = threading.Thread(target=self.Index, daemon=True)
+        self.Thread.start()
+
+    def Index(self):
+        start = self.Start
+        while True:
+            size = len(self.Map)
+            if not self.IndexRange(start, size):
+                return
+            if self.Stream is None or not self.Spool():
+                break
+            start = size
+        self.Indexed = True
+        self.indexProgress.emit()
+
+    def IndexRange(self, begin: int, size: int):
+        """Adds the lines starting from begin to size, returning False if cancelled."""
+        if len(self.Newline) == 1:
+            # Splitting in C is much faster than finding newlines one by one
+            for start in range(begin, size, self.ChunkSize):
+                if self.Cancelled.is_set():
+                    return False
+                stop = min(start + self.ChunkSize, size)
+                parts = self.Map[start:stop].split(self.Newline)
+                starts = map(operator.add, itertools.accumulate(map(len, parts[:-1])), itertools.count(start + 1))
+                if max(start - self.Offsets[-1] + len(parts[0]), max(map(len, parts))) > self.SegmentBytes:
+                    self.AddLines(starts, stop)
+                else:
+                    self.Offsets.extend(starts)
+                self.indexProgress.emit()
+        else:
+            found = array(self.Offsets.typecode)
+            # A newline can straddle the end of the bytes indexed before
+            position = self.Map.find(self.Newline, max(self.Start, begin - len(self.Newline) + 1), size)
+            while position != -1:
+                if (position - self.Start) % len(self.Newline) == 0:
+                    found.append(position + len(self.Newline))
+                    if len(found) == 1 << 16:
+                        if self.Cancelled.is_set():
+                            return False
+                        self.AddLines(found, found[-1])
+                        found = array(self.Offsets.typecode)
+                        self.indexProgress.emit()
+                    position = self.Map.find(self.Newline, position + len(self.Newline), size)
+                else:
+                    position = self.Map.find(self.Newline, position + 1, size)
+            self.AddLines(found, size)
+        return True
+
+    def AddLines(self, starts, end: int):
+        """Adds lines starting at starts, splitting long ones."""
+        for start in starts:
+            self.Split(start - len(self.Newline))
+            self.Offsets.append(start)
+        self.Split(end)
+
+    def Split(self, end: int):
+        """Adds continuations to the last line while more than SegmentBytes of it come before end."""
+        while end - self.Offsets[-1] > self.SegmentBytes:
+            position = self.Offsets[-1] + self.SegmentBytes
+            # Don't split a character
+            if self.Codec == "utf-8":
+                while self.Map[position] & 0xC0 == 0x80 and self.Offsets[-1] + self.SegmentBytes - position < 3:
+                    position -= 1
+            elif self.Codec in ("utf-16-le", "utf-16-be"):
+                high = self.Map[position + (self.Codec == "utf-16-le")]
+                position -= 2 if 0xDC <= high <= 0xDF else 0
+            # Listed first, so the view never sees the new line as a line of its own
+            self.Continuations.append(len(self.Offsets))
+            self.Offsets.append(position)
+
+
+    def Spool(self):
+        """Decompresses the next chunk, returning False at the end."""
+        data = ReadFully(self.Stream, self.ChunkSize)
+        if not data:
+            self.Stream.close()
+            return False
+        self.File.seek(0, os.SEEK_END)
+        self.File.write(data)
+        self.File.flush()
+        # The old map is closed once the view lets go of it
+        self.Map = mmap.mmap(self.File.fileno(), 0, access=mmap.ACCESS_READ)
+        return True
+
+    def Progress(self):
+        """Fraction of the file indexed, or None while a compressed file's size isn't known yet."""
+        if self.Indexed:
+            return 1.0
+        return None if self.Stream else self.Offsets[-1] / max(1, len(self.Map))
+
+    def LineCount(self):
+        return len(self.Offsets)
+
+    def NumberedLines(self):
+        """Lines in the file, not counting continuations."""
+        return len(self.Offsets) - len(self.Continuations)
+
+    def IsContinuation(self, line: int):
+        i = bisect.bisect_left(self.Continuations, line)
+        return i < len(self.Continuations) and self.Continuations[i] == line
+
+    def LineNumber(self, line: int):
+        """Returns the 0-based number in the file of the line an indexed line is part of."""
+        return line - bisect.bisect_right(self.Continuations, line)
+
+    def FirstLineOf(self, number: int):
+        """Returns the indexed line a 0-based line number in the file starts on."""
+        # The line number each continuation belongs to only grows
+        return number + bisect.bisect_left(range(len(self.Continuations)), number, key=lambda i: self.Continuations[i] - i - 1)
+
+    def LineBytes(self, line: int):
+        """Returns (start, end) of a line's bytes, without its line break."""
+        start = self.Offsets[line]
+        if line + 1 < len(self.Offsets):
+            end = self.Offsets[line + 1] - (0 if self.IsContinuation(line + 1) else len(self.Newline))
+        elif self.Indexed:
+            end = len(self.Map)
+        else:
+            end = self.Map.find(self.Newline, start, start + self.MaxLineBytes)
+            end = end if end != -1 else min(len(self.Map), start + self.MaxLineBytes)
+        if self.Map[end - len(self.Newline):end] == "\r".encode(self.Codec) and end - len(self.Newline) >= start:
+            end -= len(self.Newline)
+        return start, end
+
+    def Line(self, line: int):
+        start, end = self.LineBytes(line)
+        end = min(end, start + self.MaxLineBytes - self.MaxLineBytes % len(self.Newline))
+        return self.Map[start:end].decode(self.Codec, errors='replace')
+
+    def LineAt(self, offset: int):
+        return bisect.bisect_right(self.Offsets, offset) - 1
+
+    def FindPattern(self, text: str, matchCase: bool):
+        # Without matchCase only ASCII letters match regardless of case
+        return re.compile(re.escape(text.encode(self.Codec)), 0 if matchCase else re.IGNORECASE)
+
+    def Find(self, pattern: re.Pattern, begin: int, end: int):
+        """Returns (offset, length) of the first match from begin to end, or None."""
+        endpos = min(len(self.Map), end + len(pattern.pattern))
+        match = pattern.search(self.Map, begin, endpos)
+        while match and (match.start() - self.Start) % len(self.Newline):
+            match = pattern.search(self.Map, match.start() + 1, endpos)
+        return (match.start(), match.end() - match.start()) if match and match.start() < end else None
+
+    def Close(self):
+        self.Cancelled.set()
+        self.Thread.join()
+        if self.Stream:
+            self.Stream.close()
+        self.Map.close()
+        self.File.close()
+
+class FindJob(QObject):
+    """Searches a mapped file on a worker thread."""
+    progress = pyqtSignal(int)  # Per mille searched
+    finished = pyqtSignal(object)  # (offset, length) of the match, or None
+    ChunkSize = 1 << 24
+
+    def __init__(self, find, start: int, begin: int, size: int):
+        super().__init__()
+        self.Find = find  # Called with (begin, end) to find a match starting in between
+        self.Ranges = [(start, size), (begin, start)]
+        self.Total = max(1, size - begin)
+        self.Cancelled = threading.Event()
+        self.Thread = threading.Thread(target=self.Run, daemon=True)
+
+    def Start(self):
+        self.Thread.start()
+
+    def Cancel(self):
+        self.Cancelled.set()
+
+    def Run(self):
+        match = None
+        done = 0
+        try:
+            for first, last in self.Ranges:
+                for begin in range(first, last, self.ChunkSize):
+                    if self.Cancelled.is_set() or match:
+                        break
+                    end = min(begin + self.ChunkSize, last)
+                    match = self.Find(begin, end)
+                    done += end - begin
+                    self.progress.emit(done * 1000 // self.Total)
+        except (ValueError, OSError):
+            match = None  # The file was closed
+        self.finished.emit(match)
+
+def StartFindJob(view, job: FindJob, found):
+    """Runs a FindJob for a view with a progress dialog."""
+    view.Search = job
+    progress = QProgressDialog("Searching...", "Cancel", 0, 1000, view)
+    progress.setWindowTitle("Find")
+    progress.setWindowModality(Qt.WindowModality.WindowModal)
+    progress.setMinimumDuration(500)
+    progress.canceled.connect(job.Cancel)
+    job.progress.connect(progress.setValue)
+
+    def Finished(match):
+        job.Thread.join()
+        progress.canceled.disconnect()
+        progress.close()
+        progress.deleteLater()
+        if view.Search is job:
+            view.Search = None
+            if not job.Cancelled.is_set():
+                found(match)
+
+    job.finished.connect(Finished)
+    job.Start()
+
+def CancelFindJob(view):
+    # The file may be closed once this returns
+    if view.Search:
+        view.Search.Cancel()
+        view.Search.Thread.join()
+        view.Search = None
+
+class LargeFileView(QAbstractScrollArea):
+    """Read-only view of a LargeFileIndex that only decodes the lines on screen."""
+    statusChanged = pyqtSignal()  # The current line moved or more lines were indexed
+    Margin = 4
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.File = None
+        self.FindText = ""
+        self.FindMatchCase = False
+        self.Match = None  # (offset, length) in bytes of the last search hit
+        self.Search = None  # FindJob while searching
+        self.TextWidth = 0
+        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        self.verticalScrollBar().setSingleStep(1)
+        self.horizontalScrollBar().setSingleStep(20)
+
+    def SetFile(self, largeFile: LargeFileIndex):
+        CancelFindJob(self)
+        if self.File:
+            self.File.indexProgress.disconnect(self.UpdateScrollBars)
+        self.File = largeFile
+        self.Match = None
+        self.TextWidth = 0
+        if largeFile:
+            largeFile.indexProgress.connect(self.UpdateScrollBars)
+            self.UpdateScrollBars()
+            self.verticalScrollBar().setValue(largeFile.TopLine)
+            self.horizontalScrollBar().setValue(0)
+
+    def VisibleLines(self):
+        return max(1, self.viewport().height() // self.fontMetrics().lineSpacing())
+
+    def GutterWidth(self):
+        return self.fontMetrics().horizontalAdvance("9" * len(str(self.File.LineCount()))) + 3 * self.Margin
+
+    def UpdateScrollBars(self):
+        if not self.File:
+            return
+        vbar = self.verticalScrollBar()
+        vbar.setRange(0, max(0, self.File.LineCount() - self.VisibleLines()))
+        vbar.setPageStep(self.VisibleLines())
+        hbar = self.horizontalScrollBar()
+        hbar.setRange(0, max(0, self.TextWidth + self.GutterWidth() - self.viewport().width()))
+        hbar.setPageStep(self.viewport().width())
+        self.viewport().update()
+        self.statusChanged.emit()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        painter.fillRect(self.viewport().rect(), palette.color(QPalette.ColorRole.Base))
+        if not self.File:
+            return
+
+        metrics = self.fontMetrics()
+        lineHeight = metrics.lineSpacing()
+        gutter = self.GutterWidth()
+        left = gutter - self.horizontalScrollBar().value()
+        top = self.verticalScrollBar().value()
+        count = self.File.LineCount()
+        painter.fillRect(0, 0, gutter - self.Margin, self.viewport().height(), palette.color(QPalette.ColorRole.AlternateBase))
+
+        widest = self.TextWidth
+        for row in range(self.VisibleLines() + 1):
+            line = top + row
+            if line >= count:
+                break
+            y = row * lineHeight
+            text = self.File.Line(line).expandtabs(8)
+            if line == self.File.CurrentLine:
+                painter.fillRect(gutter - self.Margin, y, self.viewport().width(), lineHeight, palette.color(QPalette.ColorRole.AlternateBase))
+            if self.Match and self.File.LineAt(self.Match[0]) == line:
+                # Highlight the hit, measuring the decoded text before it
+                start, _ = self.File.LineBytes(line)
+                before = self.File.Map[start:self.Match[0]].decode(self.File.Codec, errors='replace')
+                hit = self.File.Map[self.Match[0]:self.Match[0] + self.Match[1]].decode(self.File.Codec, errors='replace')
+                x = metrics.horizontalAdvance(before.expandtabs(8))
+                painter.fillRect(left + x, y, metrics.horizontalAdvance(hit), lineHeight, palette.color(QPalette.ColorRole.Highlight))
+
+            painter.setPen(palette.color(QPalette.ColorRole.PlaceholderText))
+            if not self.File.IsContinuation(line):
+                painter.drawText(0, y, gutter - 2 * self.Margin, lineHeight, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter,
+                                 str(self.File.LineNumber(line) + 1))
+            painter.setClipRect(gutter - self.Margin, 0, self.viewport().width(), self.viewport().height())
+            painter.setPen(palette.color(QPalette.ColorRole.Text))
+            painter.drawText(left, y + metrics.ascent(), text)
+            painter.setClipping(False)
+            widest = max(widest, metrics.horizontalAdvance(text))
+
+        if not self.File.Indexed:
+            progress = self.File.Progress()
+            status = f"Indexing lines... {progress:.0%}" if progress is not None else f"Decompressing... {FormatFileSize(len(self.File.Map))}"
+            rect = metrics.boundingRect(status).adjusted(-self.Margin, -self.Margin, self.Margin, self.Margin)
+            rect.moveBottomRight(self.viewport().rect().bottomRight())
+            painter.fillRect(rect, palette.color(QPalette.ColorRole.ToolTipBase))
+            painter.setPen(palette.color(QPalette.ColorRole.ToolTipText))
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, status)
+        painter.end()
+
+        if widest > self.TextWidth:
+            self.TextWidth = widest
+            QTimer.singleShot(0, self.UpdateScrollBars)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.UpdateScrollBars()
+
+    def scrollContentsBy(self, dx: int, dy: int):
+        if self.File:
+            self.File.TopLine = self.verticalScrollBar().value()
+        self.viewport().update()
+
+    def SetCurrentLine(self, line: int):
+        """Moves the current line, scrolling it into view."""
+        self.File.CurrentLine = max(0, min(self.File.LineCount() - 1, line))
+        vbar = self.verticalScrollBar()
+        if self.File.CurrentLine < vbar.value():
+            vbar.setValue(self.File.CurrentLine)
+        elif self.File.CurrentLine >= vbar.value() + self.VisibleLines():
+            vbar.setValue(self.File.CurrentLine - self.VisibleLines() + 1)
+        self.viewport().update()
+        self.statusChanged.emit()
+
+    def GoTo(self):
+        dlg = GoToDialog(self, self.File.NumberedLines(), len(self.File.Map), self.File.LineNumber(self.File.CurrentLine), "Byte offset")
+        if dlg.exec() == QDialog.DialogCode.Accepted:
+            line = self.File.FirstLineOf(dlg.Value) if dlg.ByLine else self.File.LineAt(dlg.Value)
+            self.SetCurrentLine(line)
+            self.verticalScrollBar().setValue(line - self.VisibleLines() // 2)
+
+    def Find(self):
+        text, ok = QInputDialog.getText(self, "Find", "Find (press F3 to find the next one):", text=self.FindText)
+        if ok and text:
+            self.FindText = text
+            self.FindMatchCase = text != text.lower()  # Only match case when the search has capitals
+            self.FindNext()
+
+    def FindNext(self):
+        if not self.FindText:
+            self.Find()
+            return
+
+        if self.Search:
+            return
+        largeFile = self.File
+        pattern = largeFile.FindPattern(self.FindText, self.FindMatchCase)
+        start = self.Match[0] + 1 if self.Match else largeFile.Offsets[largeFile.CurrentLine]
+        StartFindJob(self, FindJob(lambda begin, end: largeFile.Find(pattern, begin, end), start, largeFile.Start, len(largeFile.Map)), self.Found)
+
+    def Found(self, match):
+        self.Match = match
+        if match:
+            self.SetCurrentLine(self.File.LineAt(match[0]))
+        else:
+            msg = QMessageBox(self)
+            msg.setWindowTitle("Find")
+            msg.setText(f"\"{self.FindText}\" wasn't found.")
+            msg.setIconPixmap(QPixmap(GetResourcePath("imgs", "info.svg")))
+            msg.exec()
+        self.viewport().update()
+
+    def keyPressEvent(self, event):
+        if not self.File:
+            return super().keyPressEvent(event)
+        key = event.key()
+        ctrl = event.modifiers() & Qt.KeyboardModifier.ControlModifier
+        if key == Qt.Key.Key_Up:
+            self.SetCurrentLine(self.File.CurrentLine - 1)
+        elif key == Qt.Key.Key_Down:
+            self.SetCurrentLine(self.File.CurrentLine + 1)
+        elif key == Qt.Key.Key_PageUp:
+            self.SetCurrentLine(self.File.CurrentLine - self.VisibleLines())
+        elif key == Qt.Key.Key_PageDown:
+            self.SetCurrentLine(self.File.CurrentLine + self.VisibleLines())
+        elif key == Qt.Key.Key_Home and ctrl:
+            self.SetCurrentLine(0)
+        elif key == Qt.Key.Key_End and ctrl:
+            self.SetCurrentLine(self.File.LineCount() - 1)
+        elif key == Qt.Key.Key_F3:
+            self.FindNext()
+        elif event.matches(QKeySequence.StandardKey.Copy):
+            QApplication.clipboard().setText(self.File.Line(self.File.CurrentLine))
+        else:
+            super().keyPressEvent(event)
+
+    def mousePressEvent(self, event: QMouseEvent):
+        if self.File:
+            self.SetCurrentLine(self.verticalScrollBar().value() + int(event.position().y()) // self.fontMetrics().lineSpacing())
+
+# Printable ASCII stays, the other bytes show as dots
+AsciiTable = bytes(b if 0x20 <= b < 0x7f else ord(".") for b in range(256))
+
+class BinaryFile:
+    """A memory-mapped binary file, shown as rows of bytes in HexView."""
+    RowBytes = 16
+
+    def __init__(self, file: str):
+        self.Path = file
+        self.File = open(file, 'rb')
+        self.Map = mmap.mmap(self.File.fileno(), 0, access=mmap.ACCESS_READ)
+        self.TopRow = 0
+        self.Offset = 0  # Of the current byte
+
+    def RowCount(self):
+        return max(1, -(-len(self.Map) // self.RowBytes))
+
+    def Row(self, row: int):
+        """Returns a row's bytes as hex, with a gap after the first half, and as ASCII."""
+        data = self.Map[row * self.RowBytes:(row + 1) * self.RowBytes]
+        half = self.RowBytes // 2
+        return f"{data[:half].hex(' ')}  {data[half:].hex(' ')}".rstrip(), data.translate(AsciiTable).decode('ascii')
+
+    def Find(self, data: bytes, begin: int, end: int):
+        """Returns (offset, length) of the first match from begin to end, or None."""
+        position = self.Map.find(data, begin, min(len(self.Map), end + len(data) - 1))
+        return (position, len(data)) if position != -1 else None
+
+    def Close(self):
+        self.Map.close()
+        self.File.close()
+
+class HexView(QAbstractScrollArea):
+    """Read-only hex view of a BinaryFile."""
+    statusChanged = pyqtSignal()  # The current byte moved
+    Margin = 4
+    HexChars = BinaryFile.RowBytes * 3  # Two digits and a space between bytes, and two in the middle
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.File = None
+        self.FindText = ""
+        self.Match = None  # (offset, length) of the last search hit
+        self.Search = None  # FindJob while searching
+        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        self.verticalScrollBar().setSingleStep(1)
+        self.horizontalScrollBar().setSingleStep(20)
+
+    def SetFile(self, binary: BinaryFile):
+        CancelFindJob(self)
+        self.File = binary
+        self.Match = None
+        if binary:
+            self.UpdateScrollBars()
+            self.verticalScrollBar().setValue(binary.TopRow)
+            self.horizontalScrollBar().setValue(0)
+
+    def VisibleRows(self):
+        return max(1, self.viewport().height() // self.fontMetrics().lineSpacing())
+
+    def CharWidth(self):
+        # Fractional, since rounding would add up along a row
+        return QFontMetricsF(self.font()).horizontalAdvance("0")
+
+    def OffsetDigits(self):
+        return max(8, len(f"{len(self.File.Map):X}"))
+
+    def GutterWidth(self):
+        return math.ceil(self.CharWidth() * self.OffsetDigits()) + 3 * self.Margin
+
+    def AsciiLeft(self):
+        """Where the ASCII column starts, from the start of the hex column."""
+        return (self.HexChars + 2) * self.CharWidth()
+
+    def UpdateScrollBars(self):
+        if not self.File:
+            return
+        vbar = self.verticalScrollBar()
+        vbar.setRange(0, max(0, self.File.RowCount() - self.VisibleRows()))
+        vbar.setPageStep(self.VisibleRows())
+        hbar = self.horizontalScrollBar()
+        width = self.GutterWidth() + self.AsciiLeft() + BinaryFile.RowBytes * self.CharWidth() + self.Margin
+        hbar.setRange(0, max(0, math.ceil(width) - self.viewport().width()))
+        hbar.setPageStep(self.viewport().width())
+        self.viewport().update()
+        self.statusChanged.emit()
+
+    def ByteColumns(self, first: int, last: int):
+        """Returns the hex and ASCII column spans of bytes in a row."""
+        charWidth = self.CharWidth()
+        half = BinaryFile.RowBytes // 2
+        start = (first * 3 + (first >= half)) * charWidth
+        end = (last * 3 + 2 + (last >= half)) * charWidth
+        return (start, end - start), (self.AsciiLeft() + first * charWidth, (last - first + 1) * charWidth)
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        painter.fillRect(self.viewport().rect(), palette.color(QPalette.ColorRole.Base))
+        if not self.File:
+            return
+
+        metrics = self.fontMetrics()
+        lineHeight = metrics.lineSpacing()
+        gutter = self.GutterWidth()
+        left = gutter - self.horizontalScrollBar().value()
+        top = self.verticalScrollBar().value()
+        digits = self.OffsetDigits()
+        painter.fillRect(0, 0, gutter - self.Margin, self.viewport().height(), palette.color(QPalette.ColorRole.AlternateBase))
+
+        for index in range(self.VisibleRows() + 1):
+            row = top + index
+            if row >= self.File.RowCount():
+                break
+            y = index * lineHeight
+            rowStart = row * BinaryFile.RowBytes
+            painter.setClipRect(gutter - self.Margin, 0, self.viewport().width(), self.viewport().height())
+            # Highlight the search hit, then the current byte
+            highlights = []
+            if self.Match and self.Match[0] < rowStart + BinaryFile.RowBytes and self.Match[0] + self.Match[1] > rowStart:
+                first = max(self.Match[0], rowStart) - rowStart
+                last = min(self.Match[0] + self.Match[1], rowStart + BinaryFile.RowBytes) - 1 - rowStart
+                highlights.append((first, last, QPalette.ColorRole.Highlight))
+            if rowStart <= self.File.Offset < rowStart + BinaryFile.RowBytes:
+                highlights.append((self.File.Offset - rowStart, self.File.Offset - rowStart, QPalette.ColorRole.Mid))
+            for first, last, role in highlights:
+                for x, width in self.ByteColumns(first, last):
+                    painter.fillRect(QRectF(left + x, y, width, lineHeight), palette.color(role))
+
+            hexText, asciiText = self.File.Row(row)
+            painter.setPen(palette.color(QPalette.ColorRole.Text))
+            painter.drawText(QPointF(left, y + metrics.ascent()), hexText)
+            painter.drawText(QPointF(left + self.AsciiLeft(), y + metrics.ascent()), asciiText)
+            painter.setClipping(False)
+            painter.setPen(palette.color(QPalette.ColorRole.PlaceholderText))
+            painter.drawText(self.Margin, y, gutter - 3 * self.Margin, lineHeight, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, f"{rowStart:0{digits}X}")
+        painter.end()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.UpdateScrollBars()
+
+    def scrollContentsBy(self, dx: int, dy: int):
+        if self.File:
+            self.File.TopRow = self.verticalScrollBar().value()
+        self.viewport().update()
+
+    def SetOffset(self, offset: int):
+        """Moves the current byte, scrolling its row into view."""
+        self.File.Offset = max(0, min(len(self.File.Map) - 1, offset))
+        row = self.File.Offset // BinaryFile.RowBytes
+        vbar = self.verticalScrollBar()
+        if row < vbar.value():
+            vbar.setValue(row)
+        elif row >= vbar.value() + self.VisibleRows():
+            vbar.setValue(row - self.VisibleRows() + 1)
+        self.viewport().update()
+        self.statusChanged.emit()
+
+    def GoTo(self):
+        dlg = GoToDialog(self, self.File.RowCount(), len(self.File.Map), self.File.Offset // BinaryFile.RowBytes, "Byte offset")
+        if dlg.exec() == QDialog.DialogCode.Accepted:
+            offset = dlg.Value * BinaryFile.RowBytes if dlg.ByLine else dlg.Value
+            self.SetOffset(offset)
+            self.verticalScrollBar().setValue(offset // BinaryFile.RowBytes - self.VisibleRows() // 2)
+
+    def Find(self):
+        text, ok = QInputDialog.getText(self, "Find", "Find text, or bytes in hex like 4D 5A (press F3 to find the next one):", text=self.FindText)
+        if ok and text:
+            self.FindText = text
+            self.FindNext()
+
+    def FindNext(self):
+        if not self.FindText:
+            self.Find()
+            return
+
+        # Pairs of hex digits separated by spaces are bytes, anything else is UTF-8 text
+        if re.fullmatch(r"\s*[0-9A-Fa-f]{2}(\s+[0-9A-Fa-f]{2})+\s*", self.FindText):
+            data = bytes.fromhex(self.FindText)
+        else:
+            data = self.FindText.encode('utf-8')
+        if self.Search:
+            return
+        binary = self.File
+        start = self.Match[0] + 1 if self.Match else binary.Offset
+        StartFindJob(self, FindJob(lambda begin, end: binary.Find(data, begin, end), start, 0, len(binary.Map)), self.Found)
+
+    def Found(self, match):
+        self.Match = match
+        if match:
+            self.SetOffset(match[0])
+        else:
+            msg = QMessageBox(self)
+            msg.setWindowTitle("Find")
+            msg.setText(f"\"{self.FindText}\" wasn't found.")
+            msg.setIconPixmap(QPixmap(GetResourcePath("imgs", "info.svg")))
+            msg.exec()
+        self.viewport().update()
+
+    def keyPressEvent(self, event):
+        if not self.File:
+            return super().keyPressEvent(event)
+        key = event.key()
+        ctrl = event.modifiers() & Qt.KeyboardModifier.ControlModifier
+        offset = self.File.Offset
+        rowStart = offset - offset % BinaryFile.RowBytes
+        if key == Qt.Key.Key_Left:
+            self.SetOffset(offset - 1)
+        elif key == Qt.Key.Key_Right:
+            self.SetOffset(offset + 1)
+        elif key == Qt.Key.Key_Up:
+            self.SetOffset(offset - BinaryFile.RowBytes)
+        elif key == Qt.Key.Key_Down:
+            self.SetOffset(offset + BinaryFile.RowBytes)
+        elif key == Qt.Key.Key_PageUp:
+            self.SetOffset(offset - BinaryFile.RowBytes * self.VisibleRows())
+        elif key == Qt.Key.Key_PageDown:
+            self.SetOffset(offset + BinaryFile.RowBytes * self.VisibleRows())
+        elif key == Qt.Key.Key_Home:
+            self.SetOffset(0 if ctrl else rowStart)
+        elif key == Qt.Key.Key_End:
+            self.SetOffset(len(self.File.Map) - 1 if ctrl else rowStart + BinaryFile.RowBytes - 1)
+        elif key == Qt.Key.Key_F3:
+            self.FindNext()
+        elif event.matches(QKeySequence.StandardKey.Copy):
+            hexText, asciiText = self.File.Row(rowStart // BinaryFile.RowBytes)
+            QApplication.clipboard().setText(f"{rowStart:0{self.OffsetDigits()}X}  {hexText:<{self.HexChars}}  {asciiText}")
+        else:
+            super().keyPressEvent(event)
+
+    def mousePressEvent(self, event: QMouseEvent):
+        if not self.File:
+            return
+        row = self.verticalScrollBar().value() + int(event.position().y()) // self.fontMetrics().lineSpacing()
+        x = int(event.position().x()) - self.GutterWidth() + self.horizontalScrollBar().value()
+        charWidth = self.CharWidth()
+        if x >= self.AsciiLeft():
+            column = int((x - self.AsciiLeft()) // charWidth)
+        else:
+            column = int(max(0, x) // charWidth)
+            column = (column - (column > BinaryFile.RowBytes // 2 * 3)) // 3
+        self.SetOffset(row * BinaryFile.RowBytes + min(column, BinaryFile.RowBytes - 1))
+
+class FileFollower(QObject):
+    """Watches a growing file and decodes only the bytes appended."""
+    appended = pyqtSignal(str)
+    reset = pyqtSignal()  # The file was truncated or replaced, its text starts over
+    PollInterval = 1000  # For file systems the watcher doesn't see changes on
+    ReadDelay = 50  # Writers flush in bursts, read once per burst
+    MaxRead = 1 << 22  # Hand the text over in pieces so the editor stays responsive
+    TailSize = 64
+
+    def __init__(self, file: str, encoding: str, offset: int, parent=None):
+        super().__init__(parent)
+        self.Encoding = encoding or "utf-8"
+        if codecs.lookup(self.Encoding).name == "ascii":
+            self.Encoding = "utf-8"  # A log that started out plain ASCII can still be written as UTF-8 later
+        self.Watcher = QFileSystemWatcher(self)
+        self.Watcher.fileChanged.connect(self.ScheduleRead)
+        self.ReadTimer = QTimer(self)
+        self.ReadTimer.setSingleShot(True)
+        self.ReadTimer.setInterval(self.ReadDelay)
+        self.ReadTimer.timeout.connect(self.Read)
+        self.PollTimer = QTimer(self)
+        self.PollTimer.timeout.connect(self.Read)
+        self.PollTimer.start(self.PollInterval)
+        self.Rebase(file, offset)
+
+    def Rebase(self, file: str, offset: int):
+        """Continues from the given byte offset of the file, e.g. after it was saved from the editor."""
+        if self.Watcher.files():
+            self.Watcher.removePaths(self.Watcher.files())
+        self.FilePath = file
+        self.Watcher.addPath(file)
+        with open(file, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.FileId = (stat.st_dev, stat.st_ino)
+            self.Offset = min(offset, stat.st_size)
+            f.seek(max(self.Offset - self.TailSize, 0))
+            self.Tail = f.read(self.Offset - f.tell())
+            self.Decoder = self.CreateDecoder(f)
+
+    def CreateDecoder(self, f):
+        decoder = codecs.getincrementaldecoder(self.Encoding)(errors='replace')
+        if self.Offset:
+            # Codecs that read the byte order from a BOM need to see it before starting mid-file
+            f.seek(0)
+            head = f.read(4)
+            for bom in (codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE, codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+                if head.startswith(bom):
+                    decoder.decode(bom)
+                    break
+        return io.IncrementalNewlineDecoder(decoder, translate=True)
+
+    def ScheduleRead(self):
+        if not self.ReadTimer.isActive():
+            self.ReadTimer.start()
+
+    def Read(self):
+        try:
+            f = open(self.FilePath, 'rb')
+        except OSError:
+            return  # Rotated away and not created again yet
+
+        with f:
+            stat = os.fstat(f.fileno())
+            f.seek(self.Offset - len(self.Tail))
+            # A new file, a shorter one, or different bytes before the offset (copied and truncated) all mean starting over
+            if (stat.st_dev, stat.st_ino) != self.FileId or stat.st_size < self.Offset or f.read(len(self.Tail)) != self.Tail:
+                self.FileId = (stat.st_dev, stat.st_ino)
+                self.Offset = 0
+                self.Tail = b""
+                self.Decoder = self.CreateDecoder(f)
+                self.reset.emit()
+                f.seek(0)
+
+            if self.FilePath not in self.Watcher.files():
+                self.Watcher.addPath(self.FilePath)  # The watcher drops files that were removed or replaced
+
+            data = f.read(self.MaxRead)
+            if not data:
+                return
+            self.Offset += len(data)
+            self.Tail = (self.Tail + data)[-self.TailSize:]
+            text = self.Decoder.decode(data)
+            if self.Offset < stat.st_size:
+                self.ScheduleRead()
+
+        if text:
+            self.appended.emit(text)
+
+    def Stop(self):
+        self.ReadTimer.stop()
+        self.PollTimer.stop()
+        self.Watcher.removePaths(self.Watcher.files())
+        self.deleteLater()
+
+
+class DiffJob(QObject):
+    """Diffs a text snapshot against its file on disk on a worker thread."""
+    finished = pyqtSignal(str)  # Error message, empty when done
+
+    def __init__(self, file: str, encoding: str, text: str):
+        super().__init__()
+        self.File = file
+        self.Encoding = encoding
+        self.Text = text
+        self.OldLines = self.NewLines = self.Hunks = None
+        self.Thread = threading.Thread(target=self.Run, daemon=True)
+
+    def Start(self):
+        self.Thread.start()
+
+    def Run(self):
+        try:
+            saved, _ = ReadTextFile(self.File, self.Encoding)
+            self.OldLines = saved.split("\n")
+            self.NewLines = self.Text.split("\n")
+            self.Hunks = GroupDiffHunks(DiffLines(self.OldLines, self.NewLines))
+            self.finished.emit("")
+        except Exception as e:
+            self.finished.emit(str(e))
+
+
+class DiffView(QAbstractScrollArea):
+    """Unified diff that only builds the rows of the hunks on screen."""
+    Margin = 4
+    CachedHunks = 64
+    RemovedColor = QColor(220, 40, 40, 50)
+    AddedColor = QColor(40, 170, 60, 50)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.OldLines = []
+        self.NewLines = []
+        self.Hunks = []
+        self.RowStarts = [0]
+        self.Rows = {}  # Hunk index to its rows
+        self.TextWidth = 0
+        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        self.verticalScrollBar().setSingleStep(1)
+        self.horizontalScrollBar().setSingleStep(20)
+
+    def SetDiff(self, oldLines: list, newLines: list, hunks: list):
+        self.OldLines = oldLines
+        self.NewLines = newLines
+        self.Hunks = hunks
+        self.Rows = {}
+        self.TextWidth = 0
+        # Each hunk has a header row, a row per equal line and one per removed or added line
+        self.RowStarts = [0, *itertools.accumulate(1 + sum(a2 - a1 + (b2 - b1 if tag != "equal" else 0) for tag, a1, a2, b1, b2 in hunk)
+                                                   for hunk in hunks)]
+        self.UpdateScrollBars()
+        self.verticalScrollBar().setValue(0)
+
+    def HunkRows(self, index: int):
+        """Returns the rows of a hunk, building them when first shown."""
+        rows = self.Rows.get(index)
+        if rows is not None:
+            return rows
+
+        hunk = self.Hunks[index]
+        a1, b1 = hunk[0][1], hunk[0][3]
+        a2, b2 = hunk[-1][2], hunk[-1][4]
+        rows = [("@", None, None, f"@@ -{a1 + 1},{a2 - a1} +{b1 + 1},{b2 - b1} @@", ())]
+        for tag, a1, a2, b1, b2 in hunk:
+            if tag == "equal":
+                rows.extend((" ", a1 + k, b1 + k, self.OldLines[a1 + k].expandtabs(8), ()) for k in range(a2 - a1))
+                continue
+            removed = [self.OldLines[i].expandtabs(8) for i in range(a1, a2)]
+            added = [self.NewLines[j].expandtabs(8) for j in range(b1, b2)]
+            removedSpans = [()] * len(removed)
+            addedSpans = [()] * len(added)
+            # Lines replaced one for one also show what changed inside them
+            if len(removed) == len(added):
+                for k, (old, new) in enumerate(zip(removed, added)):
+                    if len(old) + len(new) < 4000:
+                        opcodes = difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes()
+                        removedSpans[k] = [(i1, i2) for op, i1, i2, _, _ in opcodes if op in ("replace", "delete")]
+                        addedSpans[k] = [(j1, j2) for op, _, _, j1, j2 in opcodes if op in ("replace", "insert")]
+            rows.extend(("-", a1 + k, None, text, removedSpans[k]) for k, text in enumerate(removed))
+            rows.extend(("+", None, b1 + k, text, addedSpans[k]) for k, text in enumerate(added))
+
+        if len(self.Rows) >= self.CachedHunks:
+            del self.Rows[next(iter(self.Rows))]
+        self.Rows[index] = rows
+        return rows
+
+    def Row(self, row: int):
+        index = bisect.bisect_right(self.RowStarts, row) - 1
+        return self.HunkRows(index)[row - self.RowStarts[index]]
+
+    def VisibleLines(self):
+        return max(1, self.viewport().height() // self.fontMetrics().lineSpacing())
+
+    def NumberWidth(self):
+        return self.fontMetrics().horizontalAdvance("9" * len(str(max(len(self.OldLines), len(self.NewLines))))) + 2 * self.Margin
+
+    def GutterWidth(self):
+        return 2 * self.NumberWidth() + self.fontMetrics().horizontalAdvance("+ ") + 2 * self.Margin
+
+    def UpdateScrollBars(self):
+        vbar = self.verticalScrollBar()
+        vbar.setRange(0, max(0, self.RowStarts[-1] - self.VisibleLines()))
+        vbar.setPageStep(self.VisibleLines())
+        hbar = self.horizontalScrollBar()
+        hbar.setRange(0, max(0, self.TextWidth + self.GutterWidth() - self.viewport().width()))
+        hbar.setPageStep(self.viewport().width())
+        self.viewport().update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        painter.fillRect(self.viewport().rect(), palette.color(QPalette.ColorRole.Base))
+
+        metrics = self.fontMetrics()
+        lineHeight = metrics.lineSpacing()
+        numberWidth = self.NumberWidth()
+        gutter = self.GutterWidth()
+        left = gutter - self.horizontalScrollBar().value()
+        top = self.verticalScrollBar().value()
+        width = self.viewport().width()
+        painter.fillRect(0, 0, 2 * numberWidth, self.viewport().height(), palette.color(QPalette.ColorRole.AlternateBase))
+
+        widest = self.TextWidth
+        for screenRow in range(self.VisibleLines() + 1):
+            if top + screenRow >= self.RowStarts[-1]:
+                break
+            kind, oldLine, newLine, text, spans = self.Row(top + screenRow)
+            y = screenRow * lineHeight
+            painter.setPen(palette.color(QPalette.ColorRole.PlaceholderText))
+            if kind == "@":
+                painter.fillRect(0, y, width, lineHeight, palette.color(QPalette.ColorRole.AlternateBase))
+                painter.drawText(left, y + metrics.ascent(), text)
+                continue
+
+            color = self.RemovedColor if kind == "-" else self.AddedColor if kind == "+" else None
+            if color:
+                painter.fillRect(2 * numberWidth, y, width, lineHeight, color)
+            for column, number in enumerate((oldLine, newLine)):
+                if number is not None:
+                    painter.drawText(column * numberWidth, y, numberWidth - self.Margin, lineHeight,
+                                     Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, str(number + 1))
+            painter.setPen(palette.color(QPalette.ColorRole.Text))
+            painter.drawText(2 * numberWidth + self.Margin, y + metrics.ascent(), kind)
+
+            painter.setClipRect(gutter, 0, width, self.viewport().height())
+            for start, end in spans:
+                x = metrics.horizontalAdvance(text[:start])
+                painter.fillRect(left + x, y, metrics.horizontalAdvance(text[start:end]), lineHeight, color)
+            painter.drawText(left, y + metrics.ascent(), text)
+            painter.setClipping(False)
+            widest = max(widest, metrics.horizontalAdvance(text))
+        painter.end()
+
+        if widest > self.TextWidth:
+            self.TextWidth = widest
+            QTimer.singleShot(0, self.UpdateScrollBars)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.UpdateScrollBars()
+
+    def scrollContentsBy(self, dx: int, dy: int):
+        self.viewport().update()
+
+    def ShowHunk(self, step: int):
+        """Scrolls the next hunk, or the previous one, to the top of the view."""
+        if not self.Hunks:
+            return
+        top = self.verticalScrollBar().value()
+        index = bisect.bisect_right(self.RowStarts, top) - 1
+        if step > 0:
+            index += 1
+        elif self.RowStarts[index] == top:
+            index -= 1
+        index = max(0, min(len(self.Hunks) - 1, index))
+        self.verticalScrollBar().setValue(self.RowStarts[index])
+
+
+class DiffDialog(QDialog):
+    """Shows how a tab's text differs from its saved file."""
+
+    def __init__(self, parent, file: str, encoding: str, text: str, font: QFont):
+        super().__init__(parent, Qt.WindowType.Window | Qt.WindowType.WindowCloseButtonHint)
+        self.setWindowTitle(f"Changes in {os.path.basename(file)}")
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.resize(900, 600)
+
+        self.Layout = QVBoxLayout(self)
+        self.SummaryLabel = QLabel("Comparing with the saved file...", self)
+        self.Layout.addWidget(self.SummaryLabel)
+        self.View = DiffView(self)
+        self.View.setFont(font)
+        self.Layout.addWidget(self.View)
+
+        self.ButtonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Close, self)
+        self.PreviousButton = self.ButtonBox.addButton("Previous Change", QDialogButtonBox.ButtonRole.ActionRole)
+        self.PreviousButton.clicked.connect(lambda: self.View.ShowHunk(-1))
+        self.NextButton = self.ButtonBox.addButton("Next Change", QDialogButtonBox.ButtonRole.ActionRole)
+        self.NextButton.clicked.connect(lambda: self.View.ShowHunk(1))
+        self.PreviousButton.setEnabled(False)
+        self.NextButton.setEnabled(False)
+        self.ButtonBox.rejected.connect(self.close)
+        self.Layout.addWidget(self.ButtonBox)
+
+        self.Job = DiffJob(file, encoding, text)
+        self.Job.finished.connect(self.JobFinished)
+        self.Job.Start()
+
+    def JobFinished(self, error: str):
+        if error:
+            self.SummaryLabel.setText(f"Couldn't compare with the saved file:\n{error}")
+            return
+        hunks = self.Job.Hunks
+        removed = sum(a2 - a1 for hunk in hunks for tag, a1, a2, _, _ in hunk if tag != "equal")
+        added = sum(b2 - b1 for hunk in hunks for tag, _, _, b1, b2 in hunk if tag != "equal")
+        if hunks:
+            self.SummaryLabel.setText(f"{len(hunks):,} changes: {removed:,} lines removed and {added:,} added since the file was saved.")
+        else:
+            self.SummaryLabel.setText("No changes since the file was saved.")
+        self.View.SetDiff(self.Job.OldLines, self.Job.NewLines, hunks)
+        self.PreviousButton.setEnabled(bool(hunks))
+        self.NextButton.setEnabled(bool(hunks))
+        self.View.setFocus()
+
+
+class GoToDialog(QDialog):
+    """Asks for a line number or an offset to jump to."""
+
+    def __init__(self, parent, lineCount: int, offsetCount: int, currentLine: int, offsetName: str = "Offset"):
+        super().__init__(parent, Qt.WindowType.Dialog | Qt.WindowType.WindowCloseButtonHint)
+        self.setWindowTitle("Go To")
+        self.LineCount = lineCount
+        self.OffsetCount = offsetCount
+        self.ByLine = True
+        self.Value = currentLine
+
+        self.Layout = QVBoxLayout(self)
+
+        self.LineButton = QRadioButton(f"Line (1 - {lineCount:,})", self)
+        self.LineButton.setChecked(True)
+        self.Layout.addWidget(self.LineButton)
+        self.OffsetButton = QRadioButton(f"{offsetName} (0 - {offsetCount:,})", self)
+        self.Layout.addWidget(self.OffsetButton)
+
+        # A line edit rather than a spin box, since offsets in big files go past what a spin box holds
+        self.ValueBox = QLineEdit(str(currentLine + 1), self)
+        self.ValueBox.selectAll()
+        self.Layout.addWidget(self.ValueBox)
+
+        self.Buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel, self)
+        self.Buttons.accepted.connect(self.accept)
+        self.Buttons.rejected.connect(self.reject)
+        self.Layout.addWidget(self.Buttons)
+
+        self.ValueBox.textChanged.connect(self.Validate)
+        self.LineButton.toggled.connect(self.Validate)
+        self.Validate()
+
+    def Validate(self):
+        self.ByLine = self.LineButton.isChecked()
+        text = self.ValueBox.text().strip().replace(",", "")
+        valid = text.isascii() and text.isdigit()  # isdigit alone passes digits like "²" that int() rejects
+        if valid:
+            value = int(text)
+            valid = 1 <= value <= self.LineCount if self.ByLine else value <= self.OffsetCount
+            if valid:
+                self.Value = value - 1 if self.ByLine else value
+        self.Buttons.button(QDialogButtonBox.StandardButton.Ok).setEnabled(valid)
 
 class FindReplaceDialog(QDialog):
     def __init__(self, parent, editor: QPlainTextEdit, cursor: QTextCursor):
@@ -1441,49 +5248,24 @@ class FindReplaceDialog(QDialog):
         # Adjust the current cursor position
         StartIndex = self.CurrentCursorPosition
 
-        if not MatchCase:
-            FindText = FindText.lower()
-            Text = Text.lower()
-
-        if UseRegex:
-            pattern = FindText
-            if MatchWholeWord:
-                pattern = r'\b' + pattern + r'\b'  # Match whole words using word boundaries
-            try:
-                Match = re.search(pattern, Text[StartIndex:])
-                if Match:
-                    Index = StartIndex + Match.start()
-                else:
-                    Index = -1
-            except re.error:
-                Index = -1  # Invalid regex
-                msg = QMessageBox(self)
-                msg.setText("Please enter a valid regular expression.")
-                msg.setWindowTitle("Invalid Regular Expression")
-                msg.setIconPixmap(GetIconForResource("imgs", "warn.svg").pixmap(QSize(64, 64), 1.0, QIcon.Mode.Normal, QIcon.State.On))
-                msg.exec()
-        else:
-            if MatchWholeWord:
-                # Manually match whole words by checking boundaries
-                Index = -1
-                while StartIndex < len(Text):
-                    Index = Text.find(FindText, StartIndex)
-                    if Index == -1:
-                        break
-                    before_char = Text[Index - 1] if Index > 0 else ' '
-                    after_char = Text[Index + len(FindText)] if Index + len(FindText) < len(Text) else ' '
-                    if not before_char.isalnum() and not after_char.isalnum():  # Check boundaries
-                        break
-                    StartIndex = Index + len(FindText)
-            else:
-                Index = Text.find(FindText, StartIndex)
+        try:
+            Match = CompileSearchPattern(FindText, MatchCase, MatchWholeWord, UseRegex).search(Text, StartIndex)
+            Index = Match.start() if Match else -1
+        except re.error:
+            Index = -1  # Invalid regex
+            msg = QMessageBox(self)
+            msg.setText("Please enter a valid regular expression.")
+            msg.setWindowTitle("Invalid Regular Expression")
+            msg.setIconPixmap(GetIconForResource("imgs", "warn.svg", QSize(64, 64)).pixmap(QSize(64, 64), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
+            msg.exec()
+            return
 
         if Index != -1:
             cursor = self.Editor.textCursor()
             cursor.setPosition(Index)  # Move cursor to the start of the found text
-            cursor.movePosition(QTextCursor.MoveOperation.Right, QTextCursor.MoveMode.KeepAnchor, len(FindText))  # Select the found text
+            cursor.setPosition(Match.end(), QTextCursor.MoveMode.KeepAnchor)  # Select the found text
             self.Editor.setTextCursor(cursor)  # Update the editor with the new cursor
-            self.CurrentCursorPosition = Index + len(FindText)  # Update the current cursor position
+            self.CurrentCursorPosition = max(Match.end(), Index + 1)  # Update the current cursor position
         else:
             # If not found, check if we should wrap around
             if StartIndex > 0:
@@ -1491,7 +5273,7 @@ class FindReplaceDialog(QDialog):
                 msg.setText("Find/Replace has reached the end of the document.\nDo you want to continue searching at the beginning of the document?")
                 msg.setWindowTitle("Reached End of Document")
                 msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
-                msg.setIconPixmap(GetIconForResource("imgs", "help.svg").pixmap(QSize(64, 64), 1.0, QIcon.Mode.Normal, QIcon.State.On))
+                msg.setIconPixmap(GetIconForResource("imgs", "help.svg", QSize(64, 64)).pixmap(QSize(64, 64), app.devicePixelRatio(), QIcon.Mode.Normal, QIcon.State.On))
                 reply = msg.exec()
                 if reply == QMessageBox.StandardButton.Yes:
                     self.CurrentCursorPosition = 0
@@ -1526,36 +5308,12 @@ class FindReplaceDialog(QDialog):
         MatchWholeWord = self.MatchWordCheckbox.isChecked()
         UseRegex = self.MatchRegExCheckbox.isChecked()
 
-        if not MatchCase:
-            FindText = FindText.lower()
-            Text = Text.lower()
-
-        if UseRegex:
-            pattern = FindText
-            if MatchWholeWord:
-                pattern = r'\b' + pattern + r'\b'  # Match whole words using word boundaries
-            try:
-                NewText = re.sub(pattern, ReplaceText, Text, flags=re.IGNORECASE if not MatchCase else 0)
-            except re.error:
-                return  # Invalid regex, skip replacement
-        else:
-            if MatchWholeWord:
-                # Manually replace whole words by checking boundaries
-                NewText = Text
-                StartIndex = 0
-                while StartIndex < len(NewText):
-                    Index = NewText.find(FindText, StartIndex)
-                    if Index == -1:
-                        break
-                    before_char = NewText[Index - 1] if Index > 0 else ' '
-                    after_char = NewText[Index + len(FindText)] if Index + len(FindText) < len(NewText) else ' '
-                    if not before_char.isalnum() and not after_char.isalnum():  # Check boundaries
-                        NewText = NewText[:Index] + ReplaceText + NewText[Index + len(FindText):]
-                        StartIndex = Index + len(ReplaceText)
-                    else:
-                        StartIndex = Index + len(FindText)
-            else:
-                NewText = Text.replace(FindText, ReplaceText)
+        try:
+            pattern = CompileSearchPattern(FindText, MatchCase, MatchWholeWord, UseRegex)
+        except re.error:
+            return  # Invalid regex, skip replacement
+        # Plain text replacements are inserted as they are, backslashes included
+        NewText = pattern.sub(ReplaceText if UseRegex else lambda m: ReplaceText, Text)
 
         self.Editor.setPlainText(NewText)
 
@@ -1563,7 +5321,39 @@ class FindReplaceDialog(QDialog):
         self.CurrentCursorPosition = 0
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+    parser = CreateArgParser()
+    args = ParseArguments(parser)
+    if args.replace:
+        sys.exit(ReplaceBatch(args, parser))
+    if args.spellcheck:
+        sys.exit(SpellCheckBatch(args, parser))
+    if args.convert:
+        sys.exit(ConvertBatch(args, parser))
+    for filename in args.filename:
+        if not os.path.exists(filename):
+            parser.error(f"The file {filename} doesn't exist.")
+    if args.pdf:
+        sys.exit(ExportPdfBatch(args, parser))
+
     app = QApplication(sys.argv)
-    window = MainWindow()
+    app.setApplicationName("WriteBox")
+    if args.timeline:
+        startup_timeline = StartupTimeline()
+        startup_timeline.Mark("QApplication created")
+    if not args.newinstance and InstanceServer.Forward(args):
+        sys.exit(0)
+
+    window = MainWindow(args)
+    # A window opened with /newinstance leaves later launches to the one that was already running
+    if not args.newinstance:
+        instance_server = InstanceServer(window)
+        instance_server.fileRequested.connect(window.OpenForwardedFile)
+    if startup_timeline:
+        startup_timeline.Mark("window constructed")
     window.show()
+    if startup_timeline:
+        startup_timeline.Mark("window shown")
     sys.exit(app.exec())